@@ -1,26 +1,33 @@
 from django.contrib import admin
-from .models import FraudAnalysis, Claim
+from .models import FraudAnalysis, Claim, QuarantinedClaim, UploadSession
 
 @admin.register(FraudAnalysis)
 class FraudAnalysisAdmin(admin.ModelAdmin):
-    list_display = ['id', 'uploaded_at', 'processed_at', 'total_claims', 
+    list_display = ['id', 'uploaded_at', 'status', 'processed_at', 'total_claims', 
                    'high_risk_count', 'critical_risk_count', 'user']
-    list_filter = ['uploaded_at', 'processed_at']
-    search_fields = ['user__username']
-    readonly_fields = ['uploaded_at', 'processed_at', 'visualizations']
+    list_filter = ['status', 'uploaded_at', 'processed_at']
+    search_fields = ['user__username', 'content_hash']
+    readonly_fields = ['uploaded_at', 'content_hash', 'ruleset_version', 'started_at', 'heartbeat_at', 'processed_at', 'visualizations', 'malformed_values', 'checkpoint']
+    actions = ['requeue_analyses']
     
     fieldsets = (
         ('Upload Information', {
-            'fields': ('uploaded_file', 'uploaded_at', 'user')
+            'fields': ('uploaded_file', 'uploaded_at', 'user', 'content_hash', 'ruleset_version')
         }),
         ('Processing Results', {
-            'fields': ('processed_at', 'total_claims', 'low_risk_count', 
-                      'medium_risk_count', 'high_risk_count', 'critical_risk_count')
+            'fields': ('status', 'started_at', 'heartbeat_at', 'error_message', 'processed_at', 'total_claims', 'low_risk_count', 
+                      'medium_risk_count', 'high_risk_count', 'critical_risk_count',
+                      'rejected_count', 'malformed_values', 'checkpoint')
         }),
         ('Generated Files', {
             'fields': ('output_csv_path', 'high_risk_csv_path', 'visualizations')
         }),
     )
+    
+    @admin.action(description='Requeue failed analyses (resumes from the last checkpoint)')
+    def requeue_analyses(self, request, queryset):
+        requeued = queryset.filter(status='failed').update(status='queued', error_message='')
+        self.message_user(request, f'{requeued} analyses requeued')
 
 @admin.register(Claim)
 class ClaimAdmin(admin.ModelAdmin):
@@ -41,4 +48,18 @@ class ClaimAdmin(admin.ModelAdmin):
         ('Financial', {
             'fields': ('claim_amount',)
         }),
-    )
\ No newline at end of file
+    )
+
+@admin.register(QuarantinedClaim)
+class QuarantinedClaimAdmin(admin.ModelAdmin):
+    list_display = ['analysis', 'row_number', 'claim_number', 'error', 'created_at']
+    list_filter = ['analysis']
+    search_fields = ['claim_number', 'error']
+    readonly_fields = ['data', 'created_at']
+
+@admin.register(UploadSession)
+class UploadSessionAdmin(admin.ModelAdmin):
+    list_display = ['file_name', 'status', 'received_bytes', 'file_size', 'analysis', 'user', 'updated_at']
+    list_filter = ['status', 'created_at']
+    search_fields = ['file_name', 'sha256']
+    readonly_fields = ['id', 'received_bytes', 'partial_file', 'created_at', 'updated_at']
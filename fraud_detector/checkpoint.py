@@ -0,0 +1,87 @@
+"""
+Checkpoints of a running analysis, stored in FraudAnalysis.checkpoint.
+
+write_analysis_outputs commits each chunk's claims in the same transaction as a
+checkpoint holding the rows done so far, the running risk counts and the sizes the
+output CSVs had at that point. A restarted run truncates the CSVs back to those
+sizes and skips the committed rows, so every row is written and saved exactly once.
+"""
+
+import os
+
+import pandas as pd
+
+from .models import FraudAnalysis, QuarantinedClaim
+
+# Pipeline stages recorded in the checkpoint: claims are still being saved, or all
+# rows are committed and only the charts and summary remain
+PERSIST_STAGE = 'persist'
+FINALIZE_STAGE = 'finalize'
+
+
+def initial_checkpoint():
+    """Checkpoint of an analysis with no committed rows"""
+    return {
+        'stage': PERSIST_STAGE,
+        'rows_done': 0,
+        'high_risk_rows': 0,
+        'risk_counts': {},
+        'file_sizes': {},
+    }
+
+
+def load_checkpoint(analysis, output_paths):
+    """Return the checkpoint to resume analysis from, with its output files restored to match.
+
+    Bytes written after the last committed chunk are cut off. If an output file is
+    missing or shorter than recorded, the committed rows cannot be resumed and the
+    analysis starts over from an empty checkpoint.
+    """
+    checkpoint = dict(initial_checkpoint(), **(analysis.checkpoint or {}))
+    if not checkpoint['rows_done']:
+        return initial_checkpoint()
+
+    sizes = checkpoint['file_sizes']
+    for path in output_paths:
+        size = sizes.get(os.path.basename(path), 0)
+        if size and (not os.path.exists(path) or os.path.getsize(path) < size):
+            print(f"Checkpoint of analysis {analysis.id} does not match {path} - starting over")
+            reset_checkpoint(analysis)
+            return initial_checkpoint()
+
+    for path in output_paths:
+        if os.path.exists(path):
+            with open(path, 'r+b') as output_file:
+                output_file.truncate(sizes.get(os.path.basename(path), 0))
+
+    print(f"Resuming analysis {analysis.id} after {checkpoint['rows_done']} committed rows "
+          f"({checkpoint['stage']} stage)")
+    return checkpoint
+
+
+def save_checkpoint(analysis, checkpoint, output_paths):
+    """Record checkpoint with the current output file sizes.
+
+    Call inside the transaction that saves the chunk's claims, so the two commit together.
+    """
+    checkpoint['file_sizes'] = {
+        os.path.basename(path): os.path.getsize(path) for path in output_paths if os.path.exists(path)
+    }
+    analysis.checkpoint = checkpoint
+    FraudAnalysis.objects.filter(pk=analysis.pk).update(
+        checkpoint=checkpoint, rejected_count=analysis.rejected_count)
+
+
+def reset_checkpoint(analysis):
+    """Drop everything an earlier run committed"""
+    analysis.claims.all().delete()
+    analysis.carried_claims.clear()
+    QuarantinedClaim.objects.filter(analysis=analysis).delete()
+    analysis.rejected_count = 0
+    analysis.checkpoint = {}
+    FraudAnalysis.objects.filter(pk=analysis.pk).update(checkpoint={}, rejected_count=0)
+
+
+def read_committed_rows(path, rows, columns):
+    """Read columns of the first rows of an output CSV back (the rows of earlier runs)"""
+    return pd.read_csv(path, usecols=lambda col: col in columns, nrows=rows)
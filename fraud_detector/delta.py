@@ -0,0 +1,281 @@
+"""
+Delta re-analysis of an extract against an earlier analysis (FraudAnalysis.base_analysis).
+
+Every finished analysis leaves a row index next to its results CSV, holding the
+content hash of each row (ingest.row_hashes), the id of the Claim saved for it and
+the claimant/location/month keys behind the cross-row aggregates. A delta analysis
+matches its rows to the base's by hash:
+
+- unchanged rows are carried forward - their CSV lines are copied from the base
+  results and their claims referenced through carried_claims, not inserted again;
+- the base aggregates are updated with only the removed and added rows;
+- new or changed rows, and unchanged rows whose multiple_claims,
+  high_claim_rate_location or seasonal_spike inputs moved with the aggregates,
+  are scored and saved.
+"""
+
+import os
+from collections import deque
+
+import numpy as np
+import pandas as pd
+from django.db import transaction
+
+from .checkpoint import save_checkpoint
+from .utils.bulk_load import bulk_load_claim_references, bulk_load_session
+from .utils.fraud_detector import CLAIMANT_KEY_COLUMNS, FraudDetector
+from .utils.ingest import (
+    ROW_HASH_VERSION, join_passthrough, passthrough_columns, read_claims_csv, read_header, resolve_columns,
+    row_hashes, split_passthrough,
+)
+from .utils.rules import high_claim_locations, spike_months
+
+ROW_INDEX_FILE = 'row_index.pkl'
+
+# Aggregate -> row index column it counts
+AGGREGATE_KEYS = {
+    'claimant_counts': 'claimant',
+    'location_counts': 'location',
+    'monthly_counts': 'month',
+}
+
+# Rows per chunk when copying carried rows out of the base results CSV
+CARRY_CHUNK_ROWS = 100000
+
+
+def row_index_path(output_csv_path):
+    return os.path.join(os.path.dirname(output_csv_path), ROW_INDEX_FILE)
+
+
+def index_keys(df, claimant_column):
+    """Claimant, location and month of loss of each row of df (the keys of the aggregates)"""
+    keys = pd.DataFrame(index=df.index)
+    keys['claimant'] = _key_values(df, claimant_column)
+    keys['location'] = _key_values(df, 'Location Name (Claim Level)')
+    if 'Date of Loss' in df.columns:
+        keys['month'] = pd.to_datetime(df['Date of Loss'], errors='coerce').dt.month.astype('float64')
+    else:
+        keys['month'] = np.nan
+    return keys
+
+
+def save_row_index(analysis, output_csv_path):
+    """Write the row index of analysis from its results CSV and its (visible) claims"""
+    header = read_header(output_csv_path)
+    if 'row_hash' not in header:
+        return
+    claimant_column = next((col for col in CLAIMANT_KEY_COLUMNS if col in header), None)
+    key_columns = [col for col in [claimant_column, 'Location Name (Claim Level)', 'Date of Loss'] if col in header]
+    results = pd.read_csv(output_csv_path, usecols=['row_hash'] + key_columns,
+                          dtype={col: str for col in key_columns})
+
+    rows = index_keys(results, claimant_column)
+    rows['row_hash'] = results['row_hash'].astype('int64')
+    rows['occurrence'] = rows.groupby('row_hash').cumcount()
+
+    # Claims are matched to rows by hash, in order of occurrence (quarantined rows get no claim)
+    claims = pd.DataFrame(list(analysis.visible_claims().filter(row_hash__isnull=False)
+                               .order_by('id').values_list('row_hash', 'id')),
+                          columns=['row_hash', 'claim_id'])
+    claims['occurrence'] = claims.groupby('row_hash').cumcount()
+    rows = rows.merge(claims, on=['row_hash', 'occurrence'], how='left')
+
+    pd.to_pickle({
+        'row_hash_version': ROW_HASH_VERSION,
+        'columns': list(resolve_columns(read_header(analysis.uploaded_file.path), passthrough=True).values()),
+        'ruleset_version': analysis.ruleset_version,
+        'claimant_column': claimant_column,
+        'aggregates': _aggregates_from_keys(rows, claimant_column),
+        'rows': rows,
+    }, row_index_path(output_csv_path))
+    print(f"Row index saved for {len(rows)} rows")
+
+
+def load_row_index(analysis):
+    """Row index of a finished analysis, or None if it has none"""
+    if not analysis.output_csv_path:
+        return None
+    path = row_index_path(os.path.join('media', analysis.output_csv_path))
+    return pd.read_pickle(path) if os.path.exists(path) else None
+
+
+def prepare_delta(analysis, file_path, output_paths, checkpoint, progress, chunk_rows, malformed_counts=None):
+    """Carry the unchanged rows of analysis.base_analysis forward and score the rest.
+
+    Returns the scored chunks for write_analysis_outputs (rows indexed by position in
+    the upload), or None when the base cannot be used and the file must be analyzed in
+    full. The carried rows are committed with the checkpoint as its first rows, so a
+    resumed run skips this step.
+    """
+    base = analysis.base_analysis
+    index = load_row_index(base)
+    reason = _unusable_reason(analysis, base, index, file_path)
+    if reason:
+        print(f"Delta analysis against #{base.id} not possible ({reason}) - analyzing the full file")
+        return None
+    claimant_column = index['claimant_column']
+
+    # Pass 1: hash every row of the upload and collect its aggregate keys
+    parts = []
+    for chunk in _positioned_chunks(file_path, chunk_rows, malformed_counts):
+        keys = index_keys(chunk, claimant_column)
+        keys['row_hash'] = row_hashes(chunk)
+        parts.append(keys)
+        progress.advance('ingest', len(chunk))
+    if not parts:
+        print("The upload has no rows - analyzing the full file")
+        return None
+    rows = pd.concat(parts)
+    progress.set_total(len(rows))
+
+    # Match rows to base rows by content (duplicate rows pair up in order)
+    base_rows = index['rows'].assign(base_row=np.arange(len(index['rows'])))
+    rows['occurrence'] = rows.groupby('row_hash').cumcount()
+    rows = rows.merge(base_rows[['row_hash', 'occurrence', 'base_row', 'claim_id']],
+                      on=['row_hash', 'occurrence'], how='left')
+    unchanged = rows['base_row'].notna()
+    removed = base_rows[~base_rows['base_row'].isin(rows.loc[unchanged, 'base_row'])]
+
+    aggregates = _update_aggregates(index['aggregates'], removed, rows[~unchanged])
+    kept = rows[unchanged]
+    affected = _aggregate_changes(index['aggregates'], aggregates, kept) | kept['claim_id'].isna()
+    carried = kept[~affected]
+    rescore = rows.index[~unchanged].union(kept.index[affected])
+    print(f"Delta against analysis #{base.id}: {len(carried)} rows carried forward, "
+          f"{int((~unchanged).sum())} new or changed, {int(affected.sum())} rescored for aggregate changes, "
+          f"{len(removed)} removed")
+
+    if 'carried_rows' not in checkpoint:
+        _carry_rows(analysis, base, carried, output_paths, checkpoint)
+    # Rescored rows committed by an interrupted earlier run are not scored again
+    rescore = rescore[checkpoint['rows_done'] - checkpoint['carried_rows']:]
+
+    # Pass 2: score only the rows that were not carried, streamed in chunks of up to chunk_rows rows
+    if rescore.empty:
+        return []
+    header = read_header(file_path)
+    extra_columns = passthrough_columns(header)
+    source_columns = list(resolve_columns(header, passthrough=True).values())
+    set_aside = deque()
+
+    def read_chunks(usecols):
+        pending = []
+        for chunk in _positioned_chunks(file_path, chunk_rows):
+            pending.append(chunk[chunk.index.isin(rescore)])
+            done = chunk.index[-1] >= rescore[-1]  # no rows to rescore further down the file
+            if done or sum(map(len, pending)) >= chunk_rows:
+                selected = pd.concat(pending)
+                pending = []
+                selected['row_hash'] = rows.loc[selected.index, 'row_hash']
+                selected, extra = split_passthrough(selected, extra_columns)
+                set_aside.append(extra)
+                yield selected
+            if done:
+                return
+
+    scored_chunks = FraudDetector().detect_fraud_streaming(read_chunks, aggregates=aggregates)
+    # Scored chunks come back in file order, so each matches the oldest set-aside columns
+    return (join_passthrough(scored, set_aside.popleft(), source_columns) for scored in scored_chunks)
+
+
+def _unusable_reason(analysis, base, index, file_path):
+    if base.status != 'done':
+        return 'the base analysis has not finished'
+    if index is None:
+        return 'the base analysis has no row index'
+    if index['ruleset_version'] != analysis.ruleset_version:
+        return 'the detection rules changed since the base analysis'
+    if index.get('row_hash_version') != ROW_HASH_VERSION:
+        return 'the base row index was hashed by an older version'
+    if index['columns'] != list(resolve_columns(read_header(file_path), passthrough=True).values()):
+        return 'the columns differ from the base extract'
+    if not os.path.exists(os.path.join('media', base.output_csv_path)):
+        return 'the base results file is missing'
+    return None
+
+
+def _positioned_chunks(file_path, chunk_rows, malformed_counts=None):
+    """Chunks of the upload (all columns) indexed by row position in the file"""
+    position = 0
+    for chunk in read_claims_csv(file_path, chunksize=chunk_rows, malformed_counts=malformed_counts,
+                                 passthrough=True):
+        chunk.index = pd.RangeIndex(position, position + len(chunk))
+        position += len(chunk)
+        yield chunk
+
+
+def _key_values(df, column):
+    if column is None or column not in df.columns:
+        return pd.Series(None, index=df.index, dtype=object)
+    values = df[column].astype(object)
+    return values.where(values.notna(), None)
+
+
+def _counts(keys, aggregate):
+    values = keys[AGGREGATE_KEYS[aggregate]].dropna()
+    if aggregate == 'monthly_counts':
+        values = values.astype('int64')
+    return values.value_counts()
+
+
+def _aggregates_from_keys(rows, claimant_column):
+    """The aggregates of FraudDetector.collect_aggregates, counted from row index keys"""
+    aggregates = {'claimant_column': claimant_column}
+    for aggregate in AGGREGATE_KEYS:
+        aggregates[aggregate] = _counts(rows, aggregate).astype('int64')
+    return aggregates
+
+
+def _update_aggregates(aggregates, removed, added):
+    """Base aggregates with the removed rows' keys subtracted and the added rows' keys counted"""
+    updated = dict(aggregates)
+    for aggregate in AGGREGATE_KEYS:
+        counts = (aggregates[aggregate]
+                  .sub(_counts(removed, aggregate), fill_value=0)
+                  .add(_counts(added, aggregate), fill_value=0))
+        updated[aggregate] = counts[counts > 0].astype('int64')
+    return updated
+
+
+def _aggregate_changes(before, after, rows):
+    """Rows whose aggregate-driven features differ between two sets of aggregates"""
+    claimant_counts = rows['claimant'].map(before['claimant_counts']).fillna(0)
+    changed = claimant_counts.ne(rows['claimant'].map(after['claimant_counts']).fillna(0))
+    changed |= rows['location'].isin(
+        high_claim_locations(before).symmetric_difference(high_claim_locations(after)))
+    changed |= rows['month'].isin(spike_months(before).symmetric_difference(spike_months(after)))
+    return changed
+
+
+def _carry_rows(analysis, base, carried, output_paths, checkpoint):
+    """Copy the carried rows' results into the output CSVs and reference their claims"""
+    output_csv_path, high_risk_csv_path = output_paths
+    wanted = np.sort(carried['base_row'].to_numpy(dtype='int64'))
+    written = 0
+    high_risk_rows = 0
+    risk_counts = {}
+
+    # Values are copied as text, exactly as the base analysis wrote them
+    base_csv = pd.read_csv(os.path.join('media', base.output_csv_path), dtype=str,
+                           keep_default_na=False, chunksize=CARRY_CHUNK_ROWS)
+    for chunk in base_csv:
+        picked = chunk[chunk.index.isin(wanted)]
+        if picked.empty:
+            continue
+        picked.to_csv(output_csv_path, mode='a' if written else 'w', header=not written, index=False)
+        written += len(picked)
+
+        high_risk_df = picked[picked['risk_level'].isin(['High', 'Critical'])]
+        if not high_risk_df.empty:
+            high_risk_df.to_csv(high_risk_csv_path, mode='a' if high_risk_rows else 'w',
+                                header=not high_risk_rows, index=False)
+            high_risk_rows += len(high_risk_df)
+        for level, count in picked['risk_level'].value_counts().items():
+            risk_counts[level] = risk_counts.get(level, 0) + int(count)
+
+    checkpoint.update(rows_done=written, carried_rows=written, high_risk_rows=high_risk_rows,
+                      risk_counts=risk_counts)
+    with bulk_load_session(), transaction.atomic():
+        bulk_load_claim_references(analysis, carried['claim_id'])
+        save_checkpoint(analysis, checkpoint, output_paths)
+    print(f"Carried {written} rows forward from analysis #{base.id}")
@@ -1,30 +1,54 @@
 from django import forms
+from django.conf import settings
 from .models import FraudAnalysis
+from .utils.ingest import UPLOAD_EXTENSIONS
 
 class UploadFileForm(forms.ModelForm):
-    """Form for uploading CSV files for fraud analysis"""
+    """Form for uploading CSV (plain or compressed) or Excel files for fraud analysis"""
     
     class Meta:
         model = FraudAnalysis
-        fields = ['uploaded_file']
+        fields = ['uploaded_file', 'base_analysis']
         widgets = {
             'uploaded_file': forms.FileInput(attrs={
                 'class': 'form-control',
-                'accept': '.csv',
+                'accept': ','.join(UPLOAD_EXTENSIONS),
                 'required': True
-            })
+            }),
+            'base_analysis': forms.Select(attrs={'class': 'form-select'}),
         }
+        labels = {
+            'base_analysis': 'Compare with a previous analysis (delta mode)',
+        }
+        help_texts = {
+            'base_analysis': 'Only claims that are new or changed since that analysis are rescored and saved.',
+        }
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['base_analysis'].queryset = FraudAnalysis.objects.filter(status='done')
+        self.fields['base_analysis'].required = False
+        self.fields['base_analysis'].empty_label = 'None - analyze the full file'
     
     def clean_uploaded_file(self):
         uploaded_file = self.cleaned_data.get('uploaded_file')
         
         if uploaded_file:
-            # Check file extension
-            if not uploaded_file.name.lower().endswith('.csv'):
-                raise forms.ValidationError("Please upload a CSV file only.")
-            
-            # Check file size (max 50MB)
-            if uploaded_file.size > 500 * 1024 * 1024:
-                raise forms.ValidationError("File size must be under 500MB.")
+            validate_upload(uploaded_file.name, uploaded_file.size)
         
-        return uploaded_file
\ No newline at end of file
+        return uploaded_file
+
+
+def validate_upload(file_name, file_size):
+    """Check the type and size of an upload (form or chunked upload API)"""
+    # Check file extension
+    if not file_name.lower().endswith(UPLOAD_EXTENSIONS):
+        raise forms.ValidationError(
+            "Please upload a CSV (optionally as .csv.gz, .zip or .zst) or Excel (.xlsx) file only.")
+    
+    # Check file size
+    max_upload_mb = settings.FRAUD_DETECTION_SETTINGS.get('MAX_UPLOAD_MB', 500)
+    if file_size > max_upload_mb * 1024 * 1024:
+        raise forms.ValidationError(f"File size must be under {max_upload_mb}MB.")
+    if file_size <= 0:
+        raise forms.ValidationError("The file is empty.")
\ No newline at end of file
@@ -0,0 +1,146 @@
+"""
+Database-backed job queue for fraud analyses.
+
+Uploads are saved as queued FraudAnalysis rows and return immediately. Worker
+processes (manage.py run_analysis_worker) claim the oldest queued analysis,
+move it to running and run process_fraud_analysis, ending in done or failed.
+
+A running analysis is kept alive by a heartbeat. If its worker dies, the heartbeat
+goes stale and the next free worker claims the analysis again; processing resumes
+from its last checkpoint (see checkpoint.py). Each claim is identified by its
+started_at, and the heartbeat and the final status are only written while the
+analysis still carries the worker's own claim - a worker whose analysis was claimed
+again cannot overwrite the newer run.
+"""
+
+import threading
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, connection
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import FraudAnalysis
+
+
+def claimable_analyses():
+    """Queued analyses, plus running ones whose worker stopped sending heartbeats"""
+    stale_seconds = settings.FRAUD_DETECTION_SETTINGS.get('STALE_JOB_SECONDS', 120)
+    stale_before = timezone.now() - timedelta(seconds=stale_seconds)
+    return FraudAnalysis.objects.filter(
+        Q(status='queued') |
+        Q(status='running', heartbeat_at__lt=stale_before) |
+        Q(status='running', heartbeat_at__isnull=True)
+    )
+
+
+def claim_next_analysis():
+    """Move the oldest claimable analysis to running and return it (None if the queue is empty).
+
+    The claim is a conditional UPDATE, so concurrent workers never run the same analysis.
+    """
+    while True:
+        analysis_id = (claimable_analyses().order_by('uploaded_at', 'id')
+                       .values_list('id', flat=True).first())
+        if analysis_id is None:
+            return None
+
+        now = timezone.now()
+        claimed = claimable_analyses().filter(id=analysis_id).update(
+            status='running', started_at=now, heartbeat_at=now, error_message='')
+        if claimed:
+            return FraudAnalysis.objects.get(id=analysis_id)
+        # Another worker claimed it first - try the next one
+
+
+def current_claim(analysis):
+    """analysis as a queryset, empty once it is no longer running under the claim it was returned with"""
+    return FraudAnalysis.objects.filter(id=analysis.id, status='running', started_at=analysis.started_at)
+
+
+class Heartbeat(threading.Thread):
+    """Refreshes heartbeat_at of a running analysis from a background thread.
+
+    A failed beat (e.g. SQLite's "database is locked") is logged and retried on the
+    next interval. Beating stops once another worker has claimed the analysis.
+    """
+
+    def __init__(self, analysis, interval):
+        super().__init__(daemon=True)
+        self.analysis = analysis
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self):
+        try:
+            while not self.stopped.wait(self.interval):
+                now = timezone.now()
+                try:
+                    beat = current_claim(self.analysis).update(heartbeat_at=now)
+                except DatabaseError as e:
+                    print(f"Warning: Heartbeat of analysis {self.analysis.id} failed ({e}) - retrying")
+                    connection.close_if_unusable_or_obsolete()
+                    continue
+                if not beat:
+                    print(f"Analysis {self.analysis.id} was claimed by another worker - heartbeat stopped")
+                    return
+                # Keep the in-memory copy current too, so a full save() does not roll it back
+                self.analysis.heartbeat_at = now
+        finally:
+            # Django connections are per thread
+            connection.close()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+def run_analysis(analysis):
+    """Process a claimed analysis and record whether it finished.
+
+    Returns the recorded status, or None if the analysis was claimed by another
+    worker in the meantime (that run records its own).
+    """
+    from .views import process_fraud_analysis
+
+    print(f"Worker running analysis {analysis.id}")
+    heartbeat = Heartbeat(analysis, settings.FRAUD_DETECTION_SETTINGS.get('JOB_HEARTBEAT_SECONDS', 15))
+    heartbeat.start()
+    try:
+        result = process_fraud_analysis(analysis)
+    except Exception as e:
+        print(f"Analysis {analysis.id} crashed: {traceback.format_exc()}")
+        result = {'success': False, 'error': str(e)}
+    finally:
+        heartbeat.stop()
+
+    if result['success']:
+        status, error_message = 'done', ''
+    else:
+        # Committed chunks are kept, so requeueing the analysis resumes from its checkpoint
+        status, error_message = 'failed', result.get('error', 'Unknown error')
+    if not current_claim(analysis).update(status=status, error_message=error_message):
+        print(f"Analysis {analysis.id} was claimed by another worker - its {status} status is not recorded")
+        return None
+    analysis.status = status
+    analysis.error_message = error_message
+    print(f"Analysis {analysis.id} finished with status {analysis.status}")
+    return analysis.status
+
+
+def work(poll_seconds=2, once=False):
+    """Run queued analyses one after another, polling while the queue is empty.
+
+    With once=True the loop returns as soon as the queue is empty.
+    """
+    while True:
+        analysis = claim_next_analysis()
+        if analysis is None:
+            if once:
+                return
+            time.sleep(poll_seconds)
+            continue
+        run_analysis(analysis)
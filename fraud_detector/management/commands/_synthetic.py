@@ -0,0 +1,50 @@
+"""
+Synthetic claim extracts for the benchmark commands.
+Column names match the carrier exports handled by process_fraud_analysis.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def synthetic_claims(rows, seed=0):
+    """Build a claims DataFrame with realistic column names and value spreads"""
+    rng = np.random.default_rng(seed)
+    
+    loss_dates = pd.Timestamp('2020-01-01') + pd.to_timedelta(rng.integers(0, 4 * 365, rows), unit='D')
+    birth_dates = pd.Timestamp('1960-01-01') + pd.to_timedelta(rng.integers(0, 40 * 365, rows), unit='D')
+    hire_dates = loss_dates - pd.to_timedelta(rng.integers(0, 3 * 365, rows), unit='D')
+    report_dates = loss_dates + pd.to_timedelta(rng.integers(0, 60, rows), unit='D')
+    
+    # Roughly one claimant in four files more than one claim
+    claimant_ids = rng.integers(0, max(rows * 3 // 4, 1), rows)
+    
+    injuries = np.array(['Strain', 'Sprain', 'Contusion', 'Laceration', 'Fracture', 'Back Pain'])
+    body_parts = np.array(['Lower Back', 'Neck', 'Hand', 'Knee', 'Shoulder', 'Multiple Body Parts'])
+    locations = np.array([f'Location {i}' for i in range(50)])
+    states = np.array(['CA', 'TX', 'NY', 'FL', 'IL', 'PA', 'OH', 'GA'])
+    
+    df = pd.DataFrame({
+        'Claim Number': [f'CLM{i:08d}' for i in range(rows)],
+        'Claimant Full Name': [f'Claimant {i}' for i in claimant_ids],
+        'Claimant SSN (Masked)': [f'XXX-XX-{i % 10000:04d}' for i in claimant_ids],
+        'Date of Loss': loss_dates,
+        'Date Claim Reported to Client': report_dates,
+        'Date Of Hire': hire_dates,
+        'Claimant Date of Birth': birth_dates,
+        'Injury Type Description': injuries[rng.integers(0, len(injuries), rows)],
+        'Target/Part of Body Description': body_parts[rng.integers(0, len(body_parts), rows)],
+        'Location Name (Claim Level)': locations[rng.integers(0, len(locations), rows)],
+        'State': states[rng.integers(0, len(states), rows)],
+        'Event Time': [f'{h:02d}:{m:02d}:00' for h, m in zip(rng.integers(0, 24, rows), rng.integers(0, 60, rows))],
+        'Claim Incurred - Total': np.round(rng.gamma(2.0, 5000.0, rows), 2),
+    })
+    
+    # Witness contact is missing on roughly a third of claims
+    witness = report_dates.to_series(index=df.index).where(rng.random(rows) > 0.33)
+    df['Date Witness Contacted'] = witness
+    
+    # A few claims arrive without a date of birth
+    df.loc[rng.random(rows) < 0.05, 'Claimant Date of Birth'] = pd.NaT
+    
+    return df
@@ -0,0 +1,61 @@
+import contextlib
+import io
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+
+from fraud_detector.models import Claim, FraudAnalysis
+from fraud_detector.utils.bulk_load import bulk_load_claims
+from fraud_detector.utils.fraud_detector import FraudDetector, decode_red_flags
+from fraud_detector.views import claim_field_values
+from ._synthetic import synthetic_claims
+
+
+class Command(BaseCommand):
+    help = 'Compare Claim insert throughput of bulk_create and the native bulk loader'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000,
+                            help='Number of synthetic claims to insert')
+        parser.add_argument('--database', default='default',
+                            help='Database alias to benchmark (run once per backend)')
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        using = options['database']
+        vendor = connections[using].vendor
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            df = FraudDetector().detect_fraud(synthetic_claims(rows))
+        df['red_flags'] = decode_red_flags(df['red_flags_mask'])
+        fields = claim_field_values(df)
+        field_names = list(fields)
+
+        analysis = FraudAnalysis.objects.using(using).create(uploaded_file='benchmark/claims.csv')
+        self.stdout.write(f'Inserting {rows:,} claims into {vendor} ({using})')
+        try:
+            # The path save_claims_to_db used before the native loader
+            start = time.perf_counter()
+            claims = [Claim(analysis=analysis, **dict(zip(field_names, values))) for values in zip(*fields.values())]
+            with transaction.atomic(using=using):
+                Claim.objects.using(using).bulk_create(claims, batch_size=500)
+            orm_time = time.perf_counter() - start
+            self._check_count(analysis, using, rows)
+            Claim.objects.using(using).filter(analysis=analysis).delete()
+
+            start = time.perf_counter()
+            bulk_load_claims(analysis, fields, using=using)
+            native_time = time.perf_counter() - start
+            self._check_count(analysis, using, rows)
+        finally:
+            analysis.delete()
+
+        self.stdout.write(f'  bulk_create (500/batch) : {rows / orm_time:10,.0f} rows/s')
+        self.stdout.write(f'  native bulk load        : {rows / native_time:10,.0f} rows/s  '
+                          f'({orm_time / native_time:4.2f}x)')
+
+    def _check_count(self, analysis, using, rows):
+        loaded = Claim.objects.using(using).filter(analysis=analysis).count()
+        if loaded != rows:
+            raise CommandError(f'Expected {rows:,} claims, found {loaded:,}')
@@ -0,0 +1,114 @@
+import contextlib
+import io
+import time
+
+import numpy as np
+import pandas as pd
+from django.core.management.base import BaseCommand, CommandError
+
+from fraud_detector.utils import rules
+from fraud_detector.utils.fraud_detector import FLAG_COUNT_COLUMNS, RED_FLAG_REGISTRY, FraudDetector
+from ._synthetic import synthetic_claims
+
+
+def _legacy_near_birthday(df):
+    """Original row-by-row near-birthday loop, kept as the benchmark baseline"""
+    near_birthday = pd.Series(False, index=df.index)
+    for idx in df.index:
+        if pd.notna(df.loc[idx, 'Date of Loss']) and pd.notna(df.loc[idx, 'Claimant Date of Birth']):
+            try:
+                loss_day = df.loc[idx, 'Date of Loss'].timetuple().tm_yday
+                birth_day = df.loc[idx, 'Claimant Date of Birth'].timetuple().tm_yday
+                diff = abs(loss_day - birth_day)
+                near_birthday.loc[idx] = diff <= 30 or diff >= 335
+            except Exception:
+                near_birthday.loc[idx] = False
+    return near_birthday
+
+
+def _legacy_scores_and_counts(df, fraud_weights):
+    """Original per-indicator score loop and row-wise category counts"""
+    score = pd.Series(0.0, index=df.index)
+    for indicator, weight in fraud_weights.items():
+        if indicator in df.columns:
+            score += df[indicator].fillna(False).astype(bool).astype(float) * weight
+    
+    categories = {}
+    for indicator, category, _ in RED_FLAG_REGISTRY:
+        categories.setdefault(category, []).append(indicator)
+    counts = {
+        column: df.apply(lambda row: sum(row.get(flag, False) for flag in categories[category]), axis=1)
+        for column, category in FLAG_COUNT_COLUMNS.items()
+    }
+    return score, counts
+
+
+class Command(BaseCommand):
+    help = 'Benchmark FraudDetector stages against their original row-wise implementations'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=20000,
+                            help='Number of synthetic claims to generate')
+        parser.add_argument('--repeat', type=int, default=3,
+                            help='Timed runs per implementation (best run is reported)')
+        parser.add_argument('--min-speedup', type=float, default=100.0,
+                            help='Fail if the vectorized path is not at least this much faster')
+    
+    def handle(self, *args, **options):
+        rows = options['rows']
+        repeat = max(options['repeat'], 1)
+        
+        df = synthetic_claims(rows)
+        detector = FraudDetector()
+        
+        legacy_result, legacy_time = self._best_of(lambda: _legacy_near_birthday(df), 1)
+        birthday_inputs = {'loss_date': df['Date of Loss'], 'birth_date': df['Claimant Date of Birth']}
+        vector_result, vector_time = self._best_of(lambda: rules.near_birthday(birthday_inputs, None), repeat)
+        
+        if not np.array_equal(legacy_result.to_numpy(dtype=bool), vector_result.to_numpy(dtype=bool)):
+            raise CommandError('Vectorized near_birthday flags differ from the row-wise baseline')
+        
+        speedup = legacy_time / vector_time if vector_time > 0 else float('inf')
+        self.stdout.write(f'near_birthday on {rows:,} rows')
+        self.stdout.write(f'  row-wise loop : {legacy_time * 1000:10.1f} ms')
+        self.stdout.write(f'  vectorized    : {vector_time * 1000:10.1f} ms')
+        self.stdout.write(f'  speedup       : {speedup:10.0f}x')
+        
+        if speedup < options['min_speedup']:
+            raise CommandError(f'Speedup {speedup:.0f}x is below the required {options["min_speedup"]:.0f}x')
+        self.stdout.write(self.style.SUCCESS('Vectorized near_birthday matches baseline flags'))
+        
+        # Scoring and category counts: indicator loop + three df.apply passes vs one matrix product
+        with contextlib.redirect_stdout(io.StringIO()):
+            flagged = detector.detect_fraud(df)
+        (legacy_score, legacy_counts), legacy_time = self._best_of(
+            lambda: _legacy_scores_and_counts(flagged, detector.fraud_weights), 1)
+        (products, _), matrix_time = self._best_of(lambda: detector._score_indicator_matrix(flagged), repeat)
+        
+        if not np.allclose(legacy_score.to_numpy(), products[:, 0]):
+            raise CommandError('Matrix fraud scores differ from the per-indicator baseline')
+        for j, column in enumerate(FLAG_COUNT_COLUMNS):
+            if not np.array_equal(legacy_counts[column].to_numpy(dtype=np.int64), products[:, 1 + j].astype(np.int64)):
+                raise CommandError(f'Matrix {column} differs from the row-wise baseline')
+        
+        speedup = legacy_time / matrix_time if matrix_time > 0 else float('inf')
+        self.stdout.write(f'scoring + category counts on {rows:,} rows')
+        self.stdout.write(f'  loop + apply  : {legacy_time * 1000:10.1f} ms')
+        self.stdout.write(f'  matrix product: {matrix_time * 1000:10.1f} ms')
+        self.stdout.write(f'  speedup       : {speedup:10.0f}x')
+        
+        # Per-rule cost from the last detect_fraud run
+        self.stdout.write(f'rule evaluation cost on {rows:,} rows')
+        for name, seconds in sorted(detector.rule_costs.items(), key=lambda item: item[1], reverse=True):
+            self.stdout.write(f'  {name:<28}: {seconds * 1000:10.2f} ms')
+    
+    def _best_of(self, func, repeat):
+        """Run func repeat times and return its result with the fastest wall time"""
+        best = None
+        result = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = func()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return result, best
@@ -0,0 +1,61 @@
+import os
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from fraud_detector.utils import ingest
+from fraud_detector.utils.ingest import read_claims_csv
+from ._synthetic import synthetic_claims
+
+
+class Command(BaseCommand):
+    help = 'Compare claim CSV load time for the pandas C and pyarrow ingest engines'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=500000,
+                            help='Number of synthetic claims to write')
+        parser.add_argument('--repeat', type=int, default=3,
+                            help='Loads per engine (the best time is reported)')
+        parser.add_argument('--chunksize', type=int, default=None,
+                            help='Also read in chunks of this many rows (streaming mode)')
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        engines = ['c', 'pyarrow']
+        if ingest.pa_csv is None:
+            raise CommandError('pyarrow is not installed - nothing to compare against')
+
+        df = synthetic_claims(rows)
+        # Carrier extracts format amounts as currency text
+        df['Claim Incurred - Total'] = df['Claim Incurred - Total'].map('${:,.2f}'.format)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'claims.csv')
+            df.to_csv(path, index=False)
+            size_mb = os.path.getsize(path) / 1024 / 1024
+            self.stdout.write(f'Loading {rows:,} rows ({size_mb:.1f} MB) on a machine with {os.cpu_count()} CPUs')
+
+            baseline_time = None
+            for engine in engines:
+                best = None
+                for _ in range(options['repeat']):
+                    start = time.perf_counter()
+                    if options['chunksize']:
+                        loaded_rows = sum(len(chunk) for chunk in
+                                          read_claims_csv(path, chunksize=options['chunksize'], engine=engine))
+                        memory_mb = 0
+                    else:
+                        loaded = read_claims_csv(path, engine=engine)
+                        loaded_rows = len(loaded)
+                        memory_mb = loaded.memory_usage(deep=True).sum() / 1024 / 1024
+                    elapsed = time.perf_counter() - start
+                    best = elapsed if best is None else min(best, elapsed)
+
+                if loaded_rows != rows:
+                    raise CommandError(f'{engine} engine loaded {loaded_rows:,} of {rows:,} rows')
+
+                baseline_time = baseline_time or best
+                memory = f'  {memory_mb:7.1f} MB in memory' if memory_mb else ''
+                self.stdout.write(f'  {engine:8s}: {best:7.2f} s  {size_mb / best:7.1f} MB/s  '
+                                  f'({baseline_time / best:4.2f}x){memory}')
@@ -0,0 +1,56 @@
+import contextlib
+import io
+import os
+import time
+
+import pandas as pd
+from django.core.management.base import BaseCommand, CommandError
+
+from fraud_detector.utils.fraud_detector import MIN_PARALLEL_ROWS, FraudDetector
+from ._synthetic import synthetic_claims
+
+# Columns compared against the single-process reference run
+RESULT_COLUMNS = ['fraud_score', 'risk_level', 'red_flags_mask', 'claimant_claim_count',
+                  'timing_flags_count', 'behavioral_flags_count', 'reporting_flags_count']
+
+
+class Command(BaseCommand):
+    help = 'Measure FraudDetector.detect_fraud_parallel scaling across worker counts'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=400000,
+                            help='Number of synthetic claims to generate')
+        parser.add_argument('--workers', default='1,2,4,8',
+                            help='Comma-separated worker counts to benchmark')
+    
+    def handle(self, *args, **options):
+        rows = options['rows']
+        worker_counts = [int(count) for count in options['workers'].split(',') if count.strip()]
+        if rows < MIN_PARALLEL_ROWS:
+            raise CommandError(f'Use at least {MIN_PARALLEL_ROWS} rows; smaller inputs skip the process pool')
+        
+        df = synthetic_claims(rows)
+        detector = FraudDetector()
+        self.stdout.write(f'Scoring {rows:,} rows on a machine with {os.cpu_count()} CPUs')
+        
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            reference = detector.detect_fraud(df)
+        baseline_time = time.perf_counter() - start
+        self.stdout.write(f'  single process : {baseline_time:8.2f} s')
+        
+        for workers in worker_counts:
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                result = detector.detect_fraud_parallel(df, workers=workers)
+            elapsed = time.perf_counter() - start
+            
+            try:
+                pd.testing.assert_frame_equal(reference[RESULT_COLUMNS], result[RESULT_COLUMNS])
+            except AssertionError as error:
+                raise CommandError(f'{workers} workers produced different results: {error}')
+            
+            self.stdout.write(f'  {workers:2d} worker(s)    : {elapsed:8.2f} s  '
+                              f'({baseline_time / elapsed:4.2f}x)')
+        
+        self.stdout.write(self.style.SUCCESS('All worker counts match the single-process results'))
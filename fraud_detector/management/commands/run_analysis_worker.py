@@ -0,0 +1,54 @@
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from fraud_detector.jobs import work
+
+
+class Command(BaseCommand):
+    help = 'Process queued fraud analyses (run separately from the web server)'
+
+    def add_arguments(self, parser):
+        fraud_settings = settings.FRAUD_DETECTION_SETTINGS
+        parser.add_argument('--workers', type=int, default=fraud_settings.get('ANALYSIS_WORKERS', 1),
+                            help='Worker processes, each running one analysis at a time')
+        parser.add_argument('--poll', type=float, default=fraud_settings.get('JOB_POLL_SECONDS', 2),
+                            help='Seconds to wait between checks of an empty queue')
+        parser.add_argument('--once', action='store_true',
+                            help='Exit when the queue is empty instead of polling')
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        if workers < 1:
+            raise CommandError('--workers must be at least 1')
+
+        if workers == 1:
+            self.stdout.write(f"Analysis worker started (polling every {options['poll']}s)")
+            try:
+                work(poll_seconds=options['poll'], once=options['once'])
+            except KeyboardInterrupt:
+                self.stdout.write('Analysis worker stopped')
+            return
+
+        # Each worker is its own process with its own database connection
+        command = [sys.executable, sys.argv[0], 'run_analysis_worker', '--workers', '1',
+                   '--poll', str(options['poll'])]
+        if options['once']:
+            command.append('--once')
+
+        self.stdout.write(f'Starting {workers} analysis workers')
+        processes = [subprocess.Popen(command) for _ in range(workers)]
+        try:
+            failures = sum(process.wait() != 0 for process in processes)
+        except KeyboardInterrupt:
+            for process in processes:
+                process.terminate()
+            for process in processes:
+                process.wait()
+            self.stdout.write('Analysis workers stopped')
+            return
+
+        if failures:
+            raise CommandError(f'{failures} of {workers} workers exited with an error')
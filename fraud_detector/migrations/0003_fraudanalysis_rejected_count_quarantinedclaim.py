@@ -0,0 +1,35 @@
+# Generated by Django 4.2.7 on 2026-10-17 17:49
+
+import django.core.serializers.json
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("fraud_detector", "0002_alter_claim_options_claim_attorney_involved_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="fraudanalysis",
+            name="rejected_count",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name="QuarantinedClaim",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("row_number", models.IntegerField(help_text="Row index in the uploaded file")),
+                ("claim_number", models.CharField(blank=True, max_length=100)),
+                ("data", models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ("error", models.TextField()),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("analysis", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="quarantined_claims", to="fraud_detector.fraudanalysis")),
+            ],
+            options={
+                "ordering": ["analysis", "row_number"],
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-17 17:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("fraud_detector", "0003_fraudanalysis_rejected_count_quarantinedclaim"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="fraudanalysis",
+            name="error_message",
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name="fraudanalysis",
+            name="started_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        # Analyses uploaded before the queue existed were processed synchronously
+        migrations.AddField(
+            model_name="fraudanalysis",
+            name="status",
+            field=models.CharField(choices=[("queued", "Queued"), ("running", "Running"), ("done", "Done"), ("failed", "Failed")], db_index=True, default="done", max_length=10),
+        ),
+        migrations.AlterField(
+            model_name="fraudanalysis",
+            name="status",
+            field=models.CharField(choices=[("queued", "Queued"), ("running", "Running"), ("done", "Done"), ("failed", "Failed")], db_index=True, default="queued", max_length=10),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 17:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("fraud_detector", "0004_fraudanalysis_job_status"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="fraudanalysis",
+            name="progress",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-17 17:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("fraud_detector", "0005_fraudanalysis_progress"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="fraudanalysis",
+            name="checkpoint",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name="fraudanalysis",
+            name="heartbeat_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
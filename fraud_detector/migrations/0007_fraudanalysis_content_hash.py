@@ -0,0 +1,27 @@
+# Generated by Django 4.2.7 on 2026-10-17 18:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("fraud_detector", "0006_fraudanalysis_checkpoint"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="fraudanalysis",
+            name="content_hash",
+            field=models.CharField(blank=True, help_text="SHA-256 of the uploaded file", max_length=64),
+        ),
+        migrations.AddField(
+            model_name="fraudanalysis",
+            name="ruleset_version",
+            field=models.CharField(blank=True, max_length=32),
+        ),
+        migrations.AddIndex(
+            model_name="fraudanalysis",
+            index=models.Index(fields=["content_hash", "ruleset_version"], name="fraud_detec_content_dd3c5d_idx"),
+        ),
+    ]
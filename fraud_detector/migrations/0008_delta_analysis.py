@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-17 18:07
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("fraud_detector", "0007_fraudanalysis_content_hash"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="claim",
+            name="row_hash",
+            field=models.BigIntegerField(blank=True, help_text="Hash of the source row (see ingest.row_hashes)", null=True),
+        ),
+        migrations.AddField(
+            model_name="fraudanalysis",
+            name="base_analysis",
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name="delta_analyses", to="fraud_detector.fraudanalysis"),
+        ),
+        migrations.AddField(
+            model_name="fraudanalysis",
+            name="carried_claims",
+            field=models.ManyToManyField(blank=True, help_text="Unchanged claims referenced from the base analysis", related_name="carried_into", to="fraud_detector.claim"),
+        ),
+    ]
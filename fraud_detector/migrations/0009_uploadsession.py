@@ -0,0 +1,38 @@
+# Generated by Django 4.2.7 on 2026-10-17 18:24
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("fraud_detector", "0008_delta_analysis"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UploadSession",
+            fields=[
+                ("id", models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ("file_name", models.CharField(max_length=255)),
+                ("file_size", models.BigIntegerField(help_text="Declared size of the whole file in bytes")),
+                ("received_bytes", models.BigIntegerField(default=0, help_text="Bytes verified and written so far")),
+                ("sha256", models.CharField(blank=True, help_text="Expected SHA-256 of the whole file, if the client sent one", max_length=64)),
+                ("partial_file", models.CharField(help_text="Storage name of the file being assembled", max_length=500)),
+                ("status", models.CharField(choices=[("open", "Open"), ("complete", "Complete"), ("failed", "Failed")], default="open", max_length=10)),
+                ("error_message", models.TextField(blank=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("analysis", models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name="upload_sessions", to="fraud_detector.fraudanalysis")),
+                ("base_analysis", models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name="+", to="fraud_detector.fraudanalysis")),
+                ("user", models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                "ordering": ["-created_at"],
+            },
+        ),
+    ]
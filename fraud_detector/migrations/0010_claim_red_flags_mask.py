@@ -0,0 +1,88 @@
+# Generated by Django 4.2.7 on 2026-10-17 18:26
+
+from django.db import migrations, models
+
+BACKFILL_BATCH = 5000
+
+# Red flag labels in RED_FLAG_REGISTRY order as of this migration - label i is bit i.
+# Frozen here so later registry changes do not alter what the backfill writes.
+RED_FLAG_LABELS = [
+    "[REPORTING] Delayed reporting (>30 days)",
+    "[REPORTING] No witness contacted",
+    "[TIMING] Claim near birthday",
+    "[TIMING] New employee (<30 days)",
+    "[TIMING] Relatively new employee (<90 days)",
+    "[TIMING] Claim near holiday",
+    "[TIMING] Claim shortly before termination",
+    "[TIMING] Weekend injury",
+    "[TIMING] Unusual time of injury",
+    "[TIMING] Summer claim",
+    "[TIMING] Monday morning injury",
+    "[TIMING] Friday afternoon injury",
+    "[TIMING] End of month claim",
+    "[TIMING] Seasonal spike period",
+    "[TIMING] Injury during shift change",
+    "[TIMING] Lunch break injury",
+    "[TIMING] Claim before vacation",
+    "[TIMING] First day back from holiday",
+    "[BEHAVIORAL] Multiple claims from same person",
+    "[BEHAVIORAL] Multiple treatment facilities",
+    "[BEHAVIORAL] Avoiding recommended treatment",
+    "[BEHAVIORAL] Frequent doctor changes",
+    "[BEHAVIORAL] Unusually long treatment",
+    "[BEHAVIORAL] Pushing for quick settlement",
+    "[BEHAVIORAL] Attorney involved immediately",
+    "[BEHAVIORAL] Pattern of suspicious claims",
+    "[BEHAVIORAL] Refused modified work",
+    "[BEHAVIORAL] No prior medical records",
+    "[BEHAVIORAL] Inconsistent injury description",
+    "[INJURY] Soft tissue injury",
+    "[INJURY] Suspicious body part injured",
+    "[INJURY] High claim rate location",
+    "[INJURY] Injury at home address",
+]
+RED_FLAG_LABEL_BITS = {label: bit for bit, label in enumerate(RED_FLAG_LABELS)}
+
+
+def mask_from_red_flags(red_flags):
+    """red_flags_mask of a red flag label list, by the frozen table above"""
+    mask = 0
+    for label in red_flags:
+        if label in RED_FLAG_LABEL_BITS:
+            mask |= 1 << RED_FLAG_LABEL_BITS[label]
+    return mask
+
+
+def backfill_red_flags_mask(apps, schema_editor):
+    """Encode the red flag lists of existing claims (labels outside the registry are left out)"""
+    Claim = apps.get_model("fraud_detector", "Claim")
+    batch = []
+    for claim in Claim.objects.only("id", "red_flags").iterator(chunk_size=BACKFILL_BATCH):
+        if not claim.red_flags:
+            continue
+        claim.red_flags_mask = mask_from_red_flags(claim.red_flags)
+        batch.append(claim)
+        if len(batch) == BACKFILL_BATCH:
+            Claim.objects.bulk_update(batch, ["red_flags_mask"])
+            batch = []
+    Claim.objects.bulk_update(batch, ["red_flags_mask"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("fraud_detector", "0009_uploadsession"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="claim",
+            name="red_flags_mask",
+            field=models.BigIntegerField(default=0, help_text="red_flags as RED_FLAG_REGISTRY bits (see fraud_detector/red_flags.py)"),
+        ),
+        migrations.RunPython(backfill_red_flags_mask, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="claim",
+            index=models.Index(fields=["analysis", "red_flags_mask"], name="fraud_detec_analysi_dd06c1_idx"),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-17 18:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("fraud_detector", "0010_claim_red_flags_mask"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AnalysisRollup",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("kind", models.CharField(max_length=20)),
+                ("key", models.CharField(blank=True, max_length=255)),
+                ("count", models.IntegerField(default=0)),
+                ("avg_fraud_score", models.FloatField(default=0)),
+                ("high_risk_count", models.IntegerField(default=0)),
+                ("analysis", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="rollups", to="fraud_detector.fraudanalysis")),
+            ],
+            options={
+                "indexes": [models.Index(fields=["analysis", "kind"], name="fraud_detec_analysi_2ef4d3_idx")],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 19:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("fraud_detector", "0011_analysisrollup"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="uploadsession",
+            name="status",
+            field=models.CharField(choices=[("open", "Open"), ("finalizing", "Finalizing"), ("complete", "Complete"), ("failed", "Failed")], default="open", max_length=10),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 19:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("fraud_detector", "0012_alter_uploadsession_status"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="fraudanalysis",
+            name="malformed_values",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
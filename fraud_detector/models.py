@@ -1,6 +1,8 @@
 from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
 from django.contrib.auth.models import User
 import json
+import uuid
 
 class UploadedFile(models.Model):
     """Track all uploaded files"""
@@ -13,11 +15,36 @@ class UploadedFile(models.Model):
         return f"{self.file_name} - {self.uploaded_at.strftime('%Y-%m-%d %H:%M')}"
 
 class FraudAnalysis(models.Model):
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+    
     uploaded_file = models.FileField(upload_to='uploads/')
     uploaded_at = models.DateTimeField(auto_now_add=True)
     processed_at = models.DateTimeField(null=True, blank=True)
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
     
+    # Delta analyses rescore only the rows that changed since base_analysis (see fraud_detector/delta.py)
+    base_analysis = models.ForeignKey('self', on_delete=models.PROTECT, null=True, blank=True,
+                                      related_name='delta_analyses')
+    carried_claims = models.ManyToManyField('Claim', blank=True, related_name='carried_into',
+                                            help_text="Unchanged claims referenced from the base analysis")
+    
+    # Identical uploads scored by the same rules reuse this analysis (see find_reusable_analysis)
+    content_hash = models.CharField(max_length=64, blank=True, help_text="SHA-256 of the uploaded file")
+    ruleset_version = models.CharField(max_length=32, blank=True)
+    
+    # Job queue state (see fraud_detector/jobs.py)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued', db_index=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    error_message = models.TextField(blank=True)
+    progress = models.JSONField(default=dict, blank=True)  # per-stage row counts (see fraud_detector/progress.py)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)  # refreshed by the worker while running
+    checkpoint = models.JSONField(default=dict, blank=True)  # last committed chunk, for resuming (see fraud_detector/checkpoint.py)
+    
     # Summary statistics
     total_claims = models.IntegerField(default=0)
     low_risk_count = models.IntegerField(default=0)
@@ -32,11 +59,25 @@ class FraudAnalysis(models.Model):
     # Visualization paths
     visualizations = models.JSONField(default=dict, blank=True)
     
+    # Rows that could not be saved (see QuarantinedClaim)
+    rejected_count = models.IntegerField(default=0)
+    
+    # Currency values that could not be parsed and were scored as missing, per column
+    malformed_values = models.JSONField(default=dict, blank=True)
+    
     class Meta:
         ordering = ['-uploaded_at']
+        indexes = [
+            models.Index(fields=['content_hash', 'ruleset_version']),
+        ]
         
     def __str__(self):
         return f"Analysis {self.id} - {self.uploaded_at.strftime('%Y-%m-%d %H:%M')}"
+    
+    def visible_claims(self):
+        """Claims of this analysis, including the ones a delta analysis carried forward from its base"""
+        carried = FraudAnalysis.carried_claims.through.objects.filter(fraudanalysis=self).values('claim')
+        return Claim.objects.filter(models.Q(analysis=self) | models.Q(pk__in=carried))
 
 #Updated
 
@@ -58,8 +99,10 @@ class Claim(models.Model):
     fraud_score = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     risk_level = models.CharField(max_length=20, choices=RISK_LEVELS, default='Low')
     red_flags = models.JSONField(default=list, blank=True)
+    red_flags_mask = models.BigIntegerField(default=0, help_text="red_flags as RED_FLAG_REGISTRY bits (see fraud_detector/red_flags.py)")
     days_to_report = models.IntegerField(null=True, blank=True)
     claim_amount = models.DecimalField(max_digits=15, decimal_places=2, null=True, blank=True)
+    row_hash = models.BigIntegerField(null=True, blank=True, help_text="Hash of the source row (see ingest.row_hashes)")
     
     # NEW FIELDS for enhanced functionality
     # Geographic information
@@ -101,6 +144,7 @@ class Claim(models.Model):
             models.Index(fields=['date_of_loss']),
             models.Index(fields=['state']),
             models.Index(fields=['claimant_name']),
+            models.Index(fields=['analysis', 'red_flags_mask']),
         ]
     
     def __str__(self):
@@ -124,4 +168,71 @@ class Claim(models.Model):
     def age_at_incident(self):
         if self.claimant_dob and self.date_of_loss:
             return (self.date_of_loss - self.claimant_dob).days // 365
-        return None
\ No newline at end of file
+        return None
+
+
+class AnalysisRollup(models.Model):
+    """One group of a per-analysis rollup, e.g. the claims of one state (see fraud_detector/rollups.py)"""
+    analysis = models.ForeignKey(FraudAnalysis, on_delete=models.CASCADE, related_name='rollups')
+    kind = models.CharField(max_length=20)
+    key = models.CharField(max_length=255, blank=True)
+    count = models.IntegerField(default=0)
+    avg_fraud_score = models.FloatField(default=0)
+    high_risk_count = models.IntegerField(default=0)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['analysis', 'kind']),
+        ]
+    
+    def __str__(self):
+        return f"{self.kind} {self.key!r} of analysis {self.analysis_id}: {self.count} claims"
+
+
+class QuarantinedClaim(models.Model):
+    """A row that failed to insert as a Claim, kept with the database error for review"""
+    analysis = models.ForeignKey(FraudAnalysis, on_delete=models.CASCADE, related_name='quarantined_claims')
+    row_number = models.IntegerField(help_text="Row index in the uploaded file")
+    claim_number = models.CharField(max_length=100, blank=True)
+    data = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    error = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['analysis', 'row_number']
+    
+    def __str__(self):
+        return f"Row {self.row_number} of analysis {self.analysis_id}: {self.error[:50]}"
+
+
+class UploadSession(models.Model):
+    """A file arriving in chunks over the upload API (see fraud_detector/uploads.py)"""
+    STATUS_CHOICES = [
+        ('open', 'Open'),
+        ('finalizing', 'Finalizing'),
+        ('complete', 'Complete'),
+        ('failed', 'Failed'),
+    ]
+    
+    # Random id - it is the only credential a client needs to append to the upload
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    file_name = models.CharField(max_length=255)
+    file_size = models.BigIntegerField(help_text="Declared size of the whole file in bytes")
+    received_bytes = models.BigIntegerField(default=0, help_text="Bytes verified and written so far")
+    sha256 = models.CharField(max_length=64, blank=True, help_text="Expected SHA-256 of the whole file, if the client sent one")
+    partial_file = models.CharField(max_length=500, help_text="Storage name of the file being assembled")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='open')
+    error_message = models.TextField(blank=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
+    base_analysis = models.ForeignKey(FraudAnalysis, on_delete=models.SET_NULL, null=True, blank=True,
+                                      related_name='+')
+    analysis = models.ForeignKey(FraudAnalysis, on_delete=models.SET_NULL, null=True, blank=True,
+                                 related_name='upload_sessions')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.file_name} ({self.received_bytes}/{self.file_size} bytes, {self.status})"
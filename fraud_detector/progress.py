@@ -0,0 +1,98 @@
+"""
+Per-stage progress of a running analysis, stored in FraudAnalysis.progress.
+
+The pipeline reports rows as each stage handles them; writes are throttled so
+chunked stages do not issue one UPDATE per chunk. The progress API reads the
+stored value back with progress_payload.
+"""
+
+import time
+
+from django.utils import timezone
+
+from .models import FraudAnalysis
+
+# Pipeline stages in the order they are shown (name, label)
+PIPELINE_STAGES = [
+    ('ingest', 'Reading file'),
+    ('indicators', 'Evaluating fraud indicators'),
+    ('scoring', 'Scoring claims'),
+    ('export', 'Writing CSV results'),
+    ('db_save', 'Saving claims'),
+    ('visualizations', 'Building charts'),
+]
+
+# Minimum seconds between progress writes (stage completions are always written)
+PROGRESS_WRITE_INTERVAL = 1.0
+
+
+def initial_progress():
+    """Progress value of an analysis that has not started"""
+    return {
+        'stage': None,
+        'total_rows': None,
+        'updated_at': None,
+        'stages': {name: {'status': 'pending', 'rows': 0} for name, _ in PIPELINE_STAGES},
+    }
+
+
+def progress_payload(analysis):
+    """JSON-ready status and stage progress of an analysis"""
+    progress = analysis.progress or initial_progress()
+    stages = progress.get('stages', {})
+    return {
+        'analysis_id': analysis.id,
+        'status': analysis.status,
+        'error_message': analysis.error_message,
+        'stage': progress.get('stage'),
+        'total_rows': progress.get('total_rows'),
+        'updated_at': progress.get('updated_at'),
+        'malformed_values': analysis.malformed_values,
+        'stages': [
+            dict({'name': name, 'label': label, 'status': 'pending', 'rows': 0}, **stages.get(name, {}))
+            for name, label in PIPELINE_STAGES
+        ],
+    }
+
+
+class ProgressTracker:
+    """Records per-stage row counts of one analysis run"""
+
+    def __init__(self, analysis, write_interval=PROGRESS_WRITE_INTERVAL):
+        self.analysis = analysis
+        self.write_interval = write_interval
+        self._last_write = 0.0
+        analysis.progress = initial_progress()
+        self._write(force=True)
+
+    def set_total(self, rows):
+        """Record the number of rows in the file once it is known"""
+        self.analysis.progress['total_rows'] = int(rows)
+        self._write(force=True)
+
+    def advance(self, stage, rows):
+        """Record that stage has handled rows more rows"""
+        state = self.analysis.progress['stages'][stage]
+        state['status'] = 'running'
+        state['rows'] += int(rows)
+        self.analysis.progress['stage'] = stage
+        self._write()
+
+    def start(self, stage):
+        """Mark a stage without row counts (e.g. visualizations) as running"""
+        self.analysis.progress['stages'][stage]['status'] = 'running'
+        self.analysis.progress['stage'] = stage
+        self._write(force=True)
+
+    def finish(self, *stages):
+        for stage in stages:
+            self.analysis.progress['stages'][stage]['status'] = 'done'
+        self._write(force=True)
+
+    def _write(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._last_write < self.write_interval:
+            return
+        self._last_write = now
+        self.analysis.progress['updated_at'] = timezone.now().isoformat()
+        FraudAnalysis.objects.filter(pk=self.analysis.pk).update(progress=self.analysis.progress)
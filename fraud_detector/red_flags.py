@@ -0,0 +1,65 @@
+"""
+Red flag queries run in the database.
+
+Claim.red_flags_mask holds a claim's flags as RED_FLAG_REGISTRY bits, indexed
+together with the analysis. An analysis has far fewer distinct masks than claims,
+so per-flag counts and average scores come from one GROUP BY red_flags_mask
+(expanded to flags here). "Claims with flag X" is a red_flags_mask & bits test in
+the WHERE clause - no index can look a bit up, so it scans the analysis' entries of
+the (analysis, red_flags_mask) index. No claim rows are loaded into Python.
+"""
+
+from django.db.models import Count, F, Sum
+
+from .utils.fraud_detector import RED_FLAG_REGISTRY
+
+
+def mask_groups(claims):
+    """(mask, claim count, fraud score sum) of each distinct red_flags_mask among claims"""
+    # order_by() drops Claim's default ordering, which would otherwise join the GROUP BY
+    groups = claims.order_by().values('red_flags_mask').annotate(count=Count('id'), score_sum=Sum('fraud_score'))
+    return [(group['red_flags_mask'], group['count'], float(group['score_sum'] or 0)) for group in groups]
+
+
+def mask_bits(mask):
+    """Registry bits set in a red_flags_mask value"""
+    return [bit for bit in range(len(RED_FLAG_REGISTRY)) if mask >> bit & 1]
+
+
+def flag_statistics(claims, groups=None):
+    """Claim count and average fraud score of each red flag present among claims, most frequent first.
+
+    Each entry has the registry bit, category, message ('Weekend injury'), count and avg_fraud_score.
+    """
+    totals = {}
+    for mask, count, score_sum in mask_groups(claims) if groups is None else groups:
+        for bit in mask_bits(mask):
+            flag_count, flag_score = totals.get(bit, (0, 0.0))
+            totals[bit] = (flag_count + count, flag_score + score_sum)
+
+    statistics = []
+    for bit, (count, score_sum) in totals.items():
+        _, category, message = RED_FLAG_REGISTRY[bit]
+        statistics.append({
+            'bit': bit,
+            'category': category,
+            'message': message,
+            'count': count,
+            'avg_fraud_score': score_sum / count,
+        })
+    statistics.sort(key=lambda entry: (-entry['count'], entry['bit']))
+    return statistics
+
+
+def bits_matching(text):
+    """Registry bits whose message contains text (case-insensitive)"""
+    text = text.lower()
+    return [bit for bit, (_, _, message) in enumerate(RED_FLAG_REGISTRY) if text in message.lower()]
+
+
+def claims_with_flags(claims, bits):
+    """The claims carrying any of the registry bits"""
+    wanted = 0
+    for bit in bits:
+        wanted |= 1 << bit
+    return claims.alias(hit=F('red_flags_mask').bitand(wanted)).exclude(hit=0)
@@ -0,0 +1,118 @@
+"""
+Per-analysis rollups, materialized once the claims are saved.
+
+A processed analysis never changes, yet the dashboard APIs ran the same GROUP BYs
+over Claim on every page load. build_rollups runs them once at the end of
+process_fraud_analysis and stores one AnalysisRollup row per group; the APIs read
+those few rows instead. Analyses processed before rollups existed get theirs built
+on first request.
+"""
+
+from django.db import transaction
+from django.db.models import Avg, Count, F, Q
+from django.db.models.functions import Floor, TruncMonth
+
+from .models import AnalysisRollup
+from .red_flags import flag_statistics
+
+# Rollup kinds: claims per state, injury type, month of loss ('YYYY-MM'), repeat claimant,
+# red flag message and fraud score bin (lower bound). TOTAL holds all claims and marks
+# the rollups of an analysis as built.
+STATE = 'state'
+INJURY_TYPE = 'injury_type'
+MONTH = 'month'
+CLAIMANT = 'claimant'
+FLAG = 'flag'
+SCORE_BIN = 'score_bin'
+TOTAL = 'total'
+
+# Width of the fraud score histogram bins (scores run from 0 to 100)
+SCORE_BIN_WIDTH = 5
+
+# Repeat claimants kept, most claims first
+TOP_CLAIMANTS = 1000
+
+HIGH_RISK_LEVELS = ['High', 'Critical']
+
+
+def compute_rollups(analysis):
+    """Unsaved AnalysisRollup rows of every kind, from the analysis' (visible) claims"""
+    claims = analysis.visible_claims().order_by()  # no default ordering in the GROUP BYs
+    stats = group_stats()
+    groups = [
+        (TOTAL, [dict(claims.aggregate(**stats), key='')]),
+        (STATE, claims.values(key=F('state')).annotate(**stats)),
+        (INJURY_TYPE, claims.exclude(injury_type='').values(key=F('injury_type')).annotate(**stats)),
+        (MONTH, claims.filter(date_of_loss__isnull=False)
+            .values(key=TruncMonth('date_of_loss')).annotate(**stats)),
+        (CLAIMANT, claims.values(key=F('claimant_name')).annotate(**stats)
+            .filter(count__gt=1).order_by('-count', 'claimant_name')[:TOP_CLAIMANTS]),
+        (SCORE_BIN, _score_bins(claims)),
+    ]
+
+    rows = []
+    for kind, stats_rows in groups:
+        for stat in stats_rows:
+            rows.append(AnalysisRollup(
+                analysis=analysis,
+                kind=kind,
+                key=_rollup_key(kind, stat['key']),
+                count=stat['count'],
+                avg_fraud_score=float(stat['avg_fraud_score'] or 0),
+                high_risk_count=stat['high_risk_count'],
+            ))
+    for flag in flag_statistics(claims):
+        rows.append(AnalysisRollup(analysis=analysis, kind=FLAG, key=flag['message'],
+                                   count=flag['count'], avg_fraud_score=flag['avg_fraud_score']))
+    return rows
+
+
+def group_stats():
+    """Aggregates stored for every rollup group"""
+    return {
+        'count': Count('id'),
+        'avg_fraud_score': Avg('fraud_score'),
+        'high_risk_count': Count('id', filter=Q(risk_level__in=HIGH_RISK_LEVELS)),
+    }
+
+
+def score_histogram(claims):
+    """SCORE_BIN rollup rows (unsaved) for any claims queryset, e.g. a filtered one"""
+    return [AnalysisRollup(kind=SCORE_BIN, key=_rollup_key(SCORE_BIN, stat['key']), count=stat['count'],
+                           avg_fraud_score=float(stat['avg_fraud_score'] or 0), high_risk_count=stat['high_risk_count'])
+            for stat in _score_bins(claims.order_by())]
+
+
+def build_rollups(analysis):
+    """Compute the rollups of analysis and replace any stored ones; returns the rows"""
+    rows = compute_rollups(analysis)
+    with transaction.atomic():
+        AnalysisRollup.objects.filter(analysis=analysis).delete()
+        AnalysisRollup.objects.bulk_create(rows)
+    print(f"Rollups saved: {len(rows)} groups")
+    return rows
+
+
+def analysis_rollups(analysis, kind):
+    """Rollup rows of one kind for analysis.
+
+    Rollups missing from the database are built - and stored once the analysis is done.
+    """
+    rows = list(AnalysisRollup.objects.filter(analysis=analysis, kind__in=[kind, TOTAL]))
+    if not any(row.kind == TOTAL for row in rows):
+        rows = build_rollups(analysis) if analysis.status == 'done' else compute_rollups(analysis)
+    return [row for row in rows if row.kind == kind]
+
+
+def _score_bins(claims):
+    return claims.values(key=Floor(F('fraud_score') / SCORE_BIN_WIDTH)).annotate(**group_stats())
+
+
+def _rollup_key(kind, value):
+    if value is None:
+        return ''
+    if kind == MONTH:
+        return value.strftime('%Y-%m')
+    if kind == SCORE_BIN:
+        return str(int(value) * SCORE_BIN_WIDTH)
+    return str(value)
@@ -27,7 +27,12 @@ class FraudChartsManager {
         try {
             // Use the base URL if defined, otherwise default to current path
             const baseUrl = window.API_BASE_URL || '';
-            const response = await fetch(`${baseUrl}/api/charts-data/${this.analysisId}/`);
+            // Filters are applied by the server, which bins and samples the filtered claims
+            const params = new URLSearchParams({
+                risk_level: this.currentFilters.riskLevel,
+                days: this.currentFilters.dateRange
+            });
+            const response = await fetch(`${baseUrl}/api/charts-data/${this.analysisId}/?${params}`);
             if (!response.ok) throw new Error(`HTTP ${response.status}`);
             this.chartsData = await response.json();
             console.log('Charts data loaded:', this.chartsData);
@@ -41,8 +46,9 @@ class FraudChartsManager {
         // Date range filter
         const dateRangeSelect = document.getElementById('dateRange');
         if (dateRangeSelect) {
-            dateRangeSelect.addEventListener('change', (e) => {
+            dateRangeSelect.addEventListener('change', async (e) => {
                 this.currentFilters.dateRange = e.target.value;
+                await this.loadChartsData();
                 this.refreshAllCharts();
             });
         }
@@ -50,8 +56,9 @@ class FraudChartsManager {
         // Risk level filter
         const riskFilterSelect = document.getElementById('riskFilter');
         if (riskFilterSelect) {
-            riskFilterSelect.addEventListener('change', (e) => {
+            riskFilterSelect.addEventListener('change', async (e) => {
                 this.currentFilters.riskLevel = e.target.value;
+                await this.loadChartsData();
                 this.refreshAllCharts();
             });
         }
@@ -103,19 +110,20 @@ class FraudChartsManager {
     }
 
     renderFraudScoreChart() {
-        const filteredData = this.applyFilters(this.chartsData.fraudScores || []);
+        const bins = this.chartsData.scoreHistogram || [];
         
-        if (filteredData.length === 0) {
+        if (bins.length === 0) {
             this.showEmptyChart('fraudScoreChart', 'No data available for current filters');
             return;
         }
 
-        const scores = filteredData.map(d => d.score);
-        
+        // Bins are counted by the server
         const trace1 = {
-            x: scores,
-            type: 'histogram',
-            nbinsx: 30,
+            x: bins.map(d => (d.bin_start + d.bin_end) / 2),
+            y: bins.map(d => d.count),
+            width: bins.map(d => d.bin_end - d.bin_start),
+            customdata: bins.map(d => `${d.bin_start}-${d.bin_end}`),
+            type: 'bar',
             opacity: 0.7,
             marker: {
                 color: 'rgba(66, 165, 245, 0.7)',
@@ -125,7 +133,7 @@ class FraudChartsManager {
                 }
             },
             name: 'Claims Count',
-            hovertemplate: 'Score Range: %{x}<br>Count: %{y}<extra></extra>'
+            hovertemplate: 'Score Range: %{customdata}<br>Count: %{y}<extra></extra>'
         };
 
         const shapes = [
@@ -190,33 +198,17 @@ class FraudChartsManager {
     }
 
     renderTimelineChart() {
-        const filteredData = this.applyFilters(this.chartsData.timeline || []);
+        const timelineData = this.chartsData.timeline || [];
         
-        if (filteredData.length === 0) {
+        if (timelineData.length === 0) {
             this.showEmptyChart('timelineChart', 'No timeline data available');
             return;
         }
 
-        // Group by date and calculate statistics
-        const timelineData = {};
-        filteredData.forEach(d => {
-            const date = d.date_of_loss;
-            if (!timelineData[date]) {
-                timelineData[date] = { scores: [], count: 0, highRiskCount: 0 };
-            }
-            timelineData[date].scores.push(d.fraud_score);
-            timelineData[date].count++;
-            if (d.risk_level === 'High' || d.risk_level === 'Critical') {
-                timelineData[date].highRiskCount++;
-            }
-        });
-
-        const dates = Object.keys(timelineData).sort();
-        const avgScores = dates.map(date => {
-            const scores = timelineData[date].scores;
-            return scores.reduce((a, b) => a + b, 0) / scores.length;
-        });
-        const counts = dates.map(date => timelineData[date].count);
+        // One point per day of loss, downsampled by the server for long timelines
+        const dates = timelineData.map(d => d.date_of_loss);
+        const avgScores = timelineData.map(d => d.avg_fraud_score);
+        const counts = timelineData.map(d => d.count);
 
         const trace1 = {
             x: dates,
@@ -271,7 +263,7 @@ class FraudChartsManager {
 
     renderClaimantsChart() {
         const limit = parseInt(document.getElementById('claimantLimit')?.value || 10);
-        const filteredData = this.applyFilters(this.chartsData.claimants || []);
+        const filteredData = this.chartsData.claimants || [];
 
         if (filteredData.length === 0) {
             this.showEmptyChart('claimantsChart', 'No claimant data available');
@@ -339,7 +331,7 @@ class FraudChartsManager {
     }
 
     renderIndicatorsChart() {
-        const filteredData = this.applyFilters(this.chartsData.indicators || []);
+        const filteredData = this.chartsData.indicators || [];
 
         if (filteredData.length === 0) {
             this.showEmptyChart('indicatorsChart', 'No indicators data available');
@@ -426,7 +418,7 @@ class FraudChartsManager {
 }
 
     renderInjuryChart() {
-        const filteredData = this.applyFilters(this.chartsData.injuries || []);
+        const filteredData = this.chartsData.injuries || [];
 
         if (filteredData.length === 0) {
             this.showEmptyChart('injuryChart', 'No injury data available');
@@ -512,7 +504,7 @@ class FraudChartsManager {
     }
 
     renderTimeLagChart() {
-        const filteredData = this.applyFilters(this.chartsData.timeLag || [])
+        const filteredData = (this.chartsData.timeLag || [])
             .filter(d => d.days_to_report !== null && d.days_to_report !== undefined);
 
         if (filteredData.length === 0) {
@@ -568,7 +560,7 @@ class FraudChartsManager {
 
     renderMapChart() {
         const metric = document.getElementById('mapMetric')?.value || 'count';
-        const filteredData = this.applyFilters(this.chartsData.geographic || []);
+        const filteredData = this.chartsData.geographic || [];
 
         if (filteredData.length === 0) {
             this.showEmptyChart('mapChart', 'No geographic data available');
@@ -662,30 +654,6 @@ class FraudChartsManager {
     }
 
     // Utility methods
-    applyFilters(data) {
-        let filtered = [...data];
-
-        // Apply date range filter
-        if (this.currentFilters.dateRange !== 'all') {
-            const daysAgo = parseInt(this.currentFilters.dateRange);
-            const cutoffDate = new Date();
-            cutoffDate.setDate(cutoffDate.getDate() - daysAgo);
-
-            filtered = filtered.filter(d => {
-                if (!d.date_of_loss) return false;
-                const claimDate = new Date(d.date_of_loss);
-                return claimDate >= cutoffDate;
-            });
-        }
-
-        // Apply risk level filter
-        if (this.currentFilters.riskLevel !== 'all') {
-            filtered = filtered.filter(d => d.risk_level === this.currentFilters.riskLevel);
-        }
-
-        return filtered;
-    }
-
     showEmptyChart(chartId, message) {
         const element = document.getElementById(chartId);
         if (element) {
@@ -1,3 +1,1264 @@
-from django.test import TestCase
+import contextlib
+import datetime
+import gzip
+import hashlib
+import io
+import json
+import os
+import tempfile
+import zipfile
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+import zstandard
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import DatabaseError, IntegrityError
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import jobs, views
+from .checkpoint import PERSIST_STAGE, load_checkpoint
+from .delta import row_index_path
+from .management.commands._synthetic import synthetic_claims
+from .models import AnalysisRollup, Claim, FraudAnalysis, QuarantinedClaim, UploadSession
+from .red_flags import bits_matching, claims_with_flags, flag_statistics, mask_bits
+from .rollups import CLAIMANT, FLAG, INJURY_TYPE, MONTH, SCORE_BIN, STATE, TOTAL, analysis_rollups, build_rollups
+from .utils.bulk_load import bulk_load_claims, insert_claims_bisecting, quarantine_claims
+from .utils.downsampling import MIN_POINTS, downsample, lttb, minmax_envelope
+from .utils.fraud_detector import (
+    FLAG_COUNT_COLUMNS, RED_FLAG_BITS, RED_FLAG_REGISTRY, FraudDetector, decode_red_flags, mask_from_red_flags,
+    red_flag_counts, red_flag_label, red_flags_from_mask,
+)
+from .utils.ingest import (
+    join_passthrough, parse_currency, read_claims_csv, resolve_columns, resolve_engine, row_hashes, split_passthrough,
+)
+from .utils.rules import Feature, Rule, RuleEvaluator
+
+
+def quietly(function, *args, **kwargs):
+    """Call function with its progress prints discarded"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return function(*args, **kwargs)
+
+
+class RedFlagMaskTests(SimpleTestCase):
+    def test_every_bit_round_trips(self):
+        for bit in range(len(RED_FLAG_REGISTRY)):
+            self.assertEqual(red_flags_from_mask(1 << bit), [red_flag_label(bit)])
+            self.assertEqual(mask_from_red_flags([red_flag_label(bit)]), 1 << bit)
+        everything = (1 << len(RED_FLAG_REGISTRY)) - 1
+        self.assertEqual(mask_from_red_flags(red_flags_from_mask(everything)), everything)
+
+    def test_labels_outside_the_registry_are_ignored(self):
+        labels = ['[TIMING] Weekend injury', '[CUSTOM] Not a registry flag']
+        self.assertEqual(mask_from_red_flags(labels), 1 << RED_FLAG_BITS['weekend_injury'])
+        self.assertEqual(mask_from_red_flags(None), 0)
+
+    def test_decode_series(self):
+        weekend = 1 << RED_FLAG_BITS['weekend_injury']
+        witness = 1 << RED_FLAG_BITS['no_witness']
+        masks = pd.Series([weekend | witness, None, 0], index=[7, 8, 9])
+
+        decoded = decode_red_flags(masks)
+        self.assertEqual(decoded.index.tolist(), [7, 8, 9])
+        self.assertEqual(decoded.tolist(), [['[REPORTING] No witness contacted', '[TIMING] Weekend injury'], [], []])
+        self.assertEqual(red_flag_counts(masks), {'[REPORTING] No witness contacted': 1, '[TIMING] Weekend injury': 1})
+        self.assertEqual(red_flags_from_mask(np.nan), [])
+
+
+class ScoringMatrixTests(SimpleTestCase):
+    def setUp(self):
+        self.detector = FraudDetector()
+        self.claims = synthetic_claims(300, seed=3)
+
+    def test_matrix_layout(self):
+        matrix = self.detector.scoring_matrix
+        self.assertEqual(matrix.shape, (len(self.detector.indicator_columns), 2 + len(FLAG_COUNT_COLUMNS)))
+        for row, indicator in enumerate(self.detector.indicator_columns):
+            self.assertEqual(matrix[row, 0], self.detector.fraud_weights[indicator])
+            self.assertEqual(matrix[row, -1], 2.0 ** row)
+
+    def test_products_match_indicator_columns(self):
+        scored = quietly(self.detector.detect_fraud, self.claims)
+        weights = self.detector.fraud_weights
+        raw_score = sum(scored[indicator].astype(float) * weight for indicator, weight in weights.items())
+        expected_scores = (raw_score / sum(weights.values()) * 100).round(2)
+
+        np.testing.assert_allclose(scored['fraud_score'], expected_scores)
+        for column, category in FLAG_COUNT_COLUMNS.items():
+            indicators = [indicator for indicator, flag_category, _ in RED_FLAG_REGISTRY if flag_category == category]
+            self.assertEqual(scored[column].tolist(), scored[indicators].sum(axis=1).tolist())
+        masks = scored['red_flags_mask'].to_numpy()
+        for bit, (indicator, _, _) in enumerate(RED_FLAG_REGISTRY):
+            self.assertEqual((masks >> bit & 1).astype(bool).tolist(), scored[indicator].tolist())
+
+    def test_ruleset_version_follows_weights(self):
+        other = FraudDetector()
+        self.assertEqual(other.ruleset_version(), self.detector.ruleset_version())
+        other.fraud_weights['weekend_injury'] += 1
+        self.assertNotEqual(other.ruleset_version(), self.detector.ruleset_version())
+
+
+def baseline_detection(detector, df):
+    """Scores, risk levels and red flag lists of df computed row by row, as the detector did
+    before the rule registry and the scoring matrix (for the columns synthetic_claims writes).
+    """
+    claimant_counts = df['Claimant SSN (Masked)'].value_counts()
+    location_counts = df['Location Name (Claim Level)'].value_counts()
+    high_claim_locations = set(location_counts[location_counts > location_counts.mean() * 1.5].index)
+    monthly_counts = df['Date of Loss'].dt.month.value_counts()
+    spike_months = set(monthly_counts[monthly_counts > monthly_counts.mean() + 2 * monthly_counts.std()].index)
+    holidays = [(1, 1), (7, 4), (12, 25), (11, 24)]
+    max_possible = sum(detector.fraud_weights.values())
+
+    scores, risk_levels, red_flags = [], [], []
+    for row in df.to_dict('records'):
+        loss, birth = row['Date of Loss'], row['Claimant Date of Birth']
+        days_to_report = (row['Date Claim Reported to Client'] - loss).days
+        days_employed = (loss - row['Date Of Hire']).days
+        hour = int(row['Event Time'][:2])
+        birthday_gap = abs(loss.timetuple().tm_yday - birth.timetuple().tm_yday) if pd.notna(birth) else None
+        injury = row['Injury Type Description'].lower()
+        body_part = row['Target/Part of Body Description'].lower()
+        flags = {
+            'delayed_reporting': days_to_report > 30,
+            'no_witness': pd.isna(row['Date Witness Contacted']),
+            'near_birthday': birthday_gap is not None and (birthday_gap <= 30 or birthday_gap >= 335),
+            'new_employee_30d': days_employed <= 30,
+            'new_employee_90d': days_employed <= 90,
+            'near_holiday': any(loss.month == month and abs(loss.day - day) <= 7 for month, day in holidays),
+            'weekend_injury': loss.dayofweek in (5, 6),
+            'unusual_time': hour < 6 or hour > 18,
+            'summer_claim': loss.month in (6, 7, 8),
+            'monday_morning_claim': loss.dayofweek == 0 and hour < 10,
+            'friday_afternoon_claim': loss.dayofweek == 4 and hour >= 14,
+            'end_of_month_claim': loss.day >= 25,
+            'seasonal_spike': loss.month in spike_months,
+            'shift_change_injury': hour in (6, 7, 8, 14, 15, 16, 22, 23, 0),
+            'lunch_break_injury': hour in (11, 12, 13),
+            'post_holiday_claim': loss.dayofweek == 0,
+            'multiple_claims': claimant_counts[row['Claimant SSN (Masked)']] > 1,
+            'quick_settlement': days_to_report < 2,
+            'soft_tissue_injury': any(word in injury for word in ['strain', 'sprain', 'soft tissue', 'back pain', 'neck pain']),
+            'suspicious_body_part': any(word in body_part for word in ['back', 'neck', 'soft tissue', 'multiple body parts']),
+            'high_claim_rate_location': row['Location Name (Claim Level)'] in high_claim_locations,
+        }
+        score = round(sum(weight for indicator, weight in detector.fraud_weights.items()
+                          if flags.get(indicator)) / max_possible * 100, 2)
+        scores.append(score)
+        risk_levels.append('Low' if score < 30 else 'Medium' if score < 50 else 'High' if score < 70 else 'Critical')
+        red_flags.append([f"[{category}] {message}" for indicator, category, message in RED_FLAG_REGISTRY
+                          if flags.get(indicator)])
+    return scores, risk_levels, red_flags
+
+
+class ScoringParityTests(SimpleTestCase):
+    """Every detection path agrees with the row-by-row baseline"""
+
+    def setUp(self):
+        self.claims = synthetic_claims(400, seed=11)
+        self.detector = FraudDetector()
+        self.expected = baseline_detection(self.detector, self.claims)
+
+    def assertMatchesBaseline(self, scored):
+        scores, risk_levels, red_flags = self.expected
+        self.assertEqual(scored['fraud_score'].tolist(), scores)
+        self.assertEqual(scored['risk_level'].tolist(), risk_levels)
+        self.assertEqual(decode_red_flags(scored['red_flags_mask']).tolist(), red_flags)
+
+    def test_in_memory(self):
+        self.assertMatchesBaseline(quietly(self.detector.detect_fraud, self.claims))
+
+    def test_streaming(self):
+        def read_chunks(usecols):
+            frame = self.claims if usecols is None else self.claims[usecols]
+            return (frame.iloc[start:start + 70] for start in range(0, len(frame), 70))
+
+        for workers in [1, 2]:
+            with self.subTest(workers=workers):
+                chunks = quietly(lambda: list(self.detector.detect_fraud_streaming(read_chunks, workers=workers)))
+                self.assertMatchesBaseline(pd.concat(chunks))
+
+    def test_flag_labels_follow_registry_order(self):
+        scored = quietly(self.detector.detect_fraud, self.claims)
+        mask = int(scored['red_flags_mask'].max())
+        labels = decode_red_flags(pd.Series([mask])).iloc[0]
+        self.assertEqual(labels, [red_flag_label(bit) for bit in range(len(RED_FLAG_REGISTRY)) if mask >> bit & 1])
+
+
+class RuleEvaluatorTests(SimpleTestCase):
+    def test_dependency_cycle_is_rejected(self):
+        rules = [Rule('a', ['b'], lambda values, aggregates: values['b']),
+                 Rule('b', ['a'], lambda values, aggregates: values['a'])]
+        with self.assertRaisesMessage(ValueError, 'a -> b -> a'):
+            RuleEvaluator(rules=rules, features=[])
+
+    def test_shared_feature_is_computed_once(self):
+        calls = []
+
+        def doubled(values, aggregates):
+            calls.append(1)
+            return values['x'] * 2
+
+        evaluator = RuleEvaluator(
+            rules=[Rule('big', ['double'], lambda values, aggregates: values['double'] > 4),
+                   Rule('small', ['double'], lambda values, aggregates: values['double'] < 4)],
+            features=[Feature('double', ['x'], doubled, column='x2')],
+        )
+        df = pd.DataFrame({'x': [1, 3]})
+        costs = quietly(evaluator.evaluate, df, {})
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(list(costs), ['double', 'big', 'small'])
+        self.assertEqual(df['x2'].tolist(), [2, 6])
+        self.assertEqual(df['big'].tolist(), [False, True])
+        self.assertEqual(df['small'].tolist(), [True, False])
+
+    def test_missing_inputs_fall_back_to_defaults(self):
+        df = pd.DataFrame({'Claim Number': ['A', 'B']})
+        quietly(RuleEvaluator().evaluate, df, {'claimant_column': None})
+
+        self.assertTrue(df['no_witness'].all())  # default when the file has no witness column
+        self.assertFalse(df['delayed_reporting'].any())
+        self.assertFalse(df['injury_at_home'].any())  # placeholder rule
+
+    def test_supplied_feature_column_is_used_when_inputs_are_missing(self):
+        df = pd.DataFrame({'days_to_report': [45, 1]})
+        quietly(RuleEvaluator().evaluate, df, {'claimant_column': None})
+
+        self.assertEqual(df['delayed_reporting'].tolist(), [True, False])
+        self.assertEqual(df['quick_settlement'].tolist(), [False, True])
+
+    def test_failing_rule_keeps_its_default(self):
+        def broken(values, aggregates):
+            raise KeyError('boom')
+
+        df = pd.DataFrame({'x': [1]})
+        costs = quietly(RuleEvaluator(rules=[Rule('flag', ['x'], broken, default=True)], features=[]).evaluate, df, {})
+        self.assertTrue(df['flag'].iloc[0])
+        self.assertIn('flag', costs)
+
+    def test_required_columns_are_raw_columns_only(self):
+        columns = RuleEvaluator().required_columns()
+        self.assertIn('Date of Loss', columns)
+        self.assertIn('Event Time', columns)
+        self.assertNotIn('loss_date', columns)
+        self.assertNotIn('delayed_reporting', columns)
+
+
+class PassthroughColumnTests(SimpleTestCase):
+    """Columns the detector does not read are only loaded for the export, and come back in file order"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.claims = synthetic_claims(120, seed=9)
+        self.claims.insert(2, 'Adjuster Notes', [f'note, {i}' for i in range(120)])
+        self.paths = [os.path.join(directory.name, 'claims.csv'), os.path.join(directory.name, 'claims.xlsx')]
+        self.claims.to_csv(self.paths[0], index=False)
+        self.claims.to_excel(self.paths[1], index=False)
+
+    def test_projection_skips_unused_columns(self):
+        for path in self.paths:
+            with self.subTest(path=path):
+                self.assertNotIn('Adjuster Notes', read_claims_csv(path).columns)
+                self.assertEqual(read_claims_csv(path, passthrough=True)['Adjuster Notes'].tolist(),
+                                 self.claims['Adjuster Notes'].tolist())
+
+    def test_scored_frame_gets_columns_back_in_file_order(self):
+        for engine in ['c', 'pyarrow']:
+            with self.subTest(engine=engine):
+                chunks = read_claims_csv(self.paths[0], chunksize=50, engine=engine, passthrough=True)
+                source_columns = list(resolve_columns(list(self.claims.columns), passthrough=True).values())
+                exported = []
+                for chunk in chunks:
+                    chunk, extra = split_passthrough(chunk, ['Adjuster Notes'])
+                    self.assertNotIn('Adjuster Notes', chunk.columns)
+                    exported.append(join_passthrough(chunk.assign(fraud_score=1.0), extra, source_columns))
+                exported = pd.concat(exported)
+                self.assertEqual(list(exported.columns), list(self.claims.columns) + ['fraud_score'])
+                self.assertEqual(exported['Adjuster Notes'].tolist(), self.claims['Adjuster Notes'].tolist())
+
+
+class CsvEngineTests(SimpleTestCase):
+    """The Arrow engine scores an upload exactly like the C engine"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.claims = synthetic_claims(400, seed=12).astype({'Claim Incurred - Total': object})
+        self.claims.loc[::7, 'Claim Incurred - Total'] = self.claims['Claim Incurred - Total'].map('${:,.2f}'.format)
+        self.path = os.path.join(directory.name, 'claims.csv')
+        self.claims.to_csv(self.path, index=False)
+
+    def scored(self, **read_options):
+        df = read_claims_csv(self.path, **read_options)
+        if read_options.get('chunksize'):
+            df = pd.concat(df)
+        return quietly(FraudDetector().detect_fraud, df)
+
+    def test_engines_agree(self):
+        expected = self.scored(engine='c')
+        for read_options in [{'engine': 'pyarrow'}, {'engine': 'pyarrow', 'chunksize': 90}]:
+            with self.subTest(**read_options):
+                scored = self.scored(**read_options)
+                for col in ['fraud_score', 'risk_level', 'red_flags_mask', 'Claim Incurred - Total', 'days_to_report']:
+                    self.assertEqual(scored[col].tolist(), expected[col].tolist(), col)
+
+    def test_engine_follows_setting(self):
+        with self.settings(FRAUD_DETECTION_SETTINGS={'CSV_ENGINE': 'pyarrow'}):
+            self.assertEqual(resolve_engine(path=self.path), 'pyarrow')
+            self.assertEqual(resolve_engine(path='claims.zip'), 'c')
+            self.assertEqual(resolve_engine(path='claims.xlsx'), 'openpyxl')
+        self.assertEqual(resolve_engine('c', self.path), 'c')
+
+
+class CurrencyParsingTests(SimpleTestCase):
+    def test_parse_currency(self):
+        values, malformed = parse_currency(pd.Series(['$1,234.50', ' 12 ', '-5', 'n/a', '', None, '1.2.3']))
+        np.testing.assert_array_equal(values.to_numpy(), [1234.5, 12.0, -5.0, np.nan, np.nan, np.nan, np.nan])
+        self.assertEqual(values.dtype, 'float64')
+        self.assertEqual(malformed, 2)  # blanks are missing, not malformed
+
+    def test_numeric_columns_are_left_alone(self):
+        numbers = pd.Series([1.5, np.nan])
+        values, malformed = parse_currency(numbers)
+        self.assertIs(values, numbers)
+        self.assertEqual(malformed, 0)
+
+    def test_malformed_values_are_counted_while_reading(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        claims = synthetic_claims(100, seed=5).astype({'Claim Incurred - Total': object})
+        claims['Claim Amount'] = '$1,000'
+        claims.loc[[3, 40, 77], 'Claim Incurred - Total'] = 'TBD'
+        claims.loc[[60, 61], 'Claim Amount'] = 'pending'
+        path = os.path.join(directory.name, 'claims.csv')
+        claims.to_csv(path, index=False)
+
+        for engine in ['c', 'pyarrow']:
+            for chunksize in [None, 30]:
+                with self.subTest(engine=engine, chunksize=chunksize):
+                    malformed_counts = {}
+                    df = read_claims_csv(path, chunksize=chunksize, engine=engine, malformed_counts=malformed_counts)
+                    if chunksize:
+                        df = pd.concat(df)
+                    self.assertEqual(malformed_counts, {'Claim Incurred - Total': 3, 'Claim Amount': 2})
+                    self.assertEqual(df['Claim Incurred - Total'].isna().sum(), 3)
+                    self.assertEqual(df['Claim Amount'].sum(), 98000.0)
+
+
+class MalformedValueStorageTests(TestCase):
+    """Malformed value counts are stored on the analysis and shown with its progress and dashboard"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        # process_fraud_analysis writes its outputs under media/ in the working directory
+        cwd = os.getcwd()
+        os.chdir(directory.name)
+        self.addCleanup(os.chdir, cwd)
+        media = override_settings(MEDIA_ROOT=os.path.join(directory.name, 'media'))
+        media.enable()
+        self.addCleanup(media.disable)
+        self.claims = synthetic_claims(120, seed=10).astype({'Claim Incurred - Total': object})
+        self.claims.loc[[3, 40, 77, 119], 'Claim Incurred - Total'] = 'TBD'
+
+    def analyze(self):
+        analysis = FraudAnalysis(status='running')
+        analysis.uploaded_file.save('claims.csv', ContentFile(self.claims.to_csv(index=False).encode()), save=True)
+        result = quietly(views.process_fraud_analysis, analysis)
+        self.assertTrue(result['success'], result.get('error'))
+        return FraudAnalysis.objects.get(id=analysis.id)
+
+    def test_counts_are_stored(self):
+        streaming = dict(settings.FRAUD_DETECTION_SETTINGS, STREAMING_THRESHOLD_MB=0, STREAMING_CHUNK_ROWS=50)
+        for fraud_settings in [settings.FRAUD_DETECTION_SETTINGS, streaming]:
+            with self.subTest(streaming=fraud_settings is streaming), \
+                    self.settings(FRAUD_DETECTION_SETTINGS=fraud_settings):
+                self.assertEqual(self.analyze().malformed_values, {'Claim Incurred - Total': 4})
+
+    def test_counts_are_shown(self):
+        analysis = self.analyze()
+        payload = self.client.get(reverse('fraud_detector:analysis_progress_api', args=[analysis.id])).json()
+        self.assertEqual(payload['malformed_values'], {'Claim Incurred - Total': 4})
+
+        analysis.status = 'done'
+        analysis.save(update_fields=['status'])
+        response = self.client.get(reverse('fraud_detector:dashboard', args=[analysis.id]))
+        self.assertContains(response, '4 in Claim Incurred - Total')
+
+    def test_clean_upload_stores_no_counts(self):
+        self.claims = synthetic_claims(50, seed=10)
+        analysis = self.analyze()
+        self.assertEqual(analysis.malformed_values, {})
+        analysis.status = 'done'
+        analysis.save(update_fields=['status'])
+        response = self.client.get(reverse('fraud_detector:dashboard', args=[analysis.id]))
+        self.assertNotContains(response, 'could not be parsed')
+
+
+class ClaimFieldValuesTests(SimpleTestCase):
+    def test_values_per_field(self):
+        df = pd.DataFrame({
+            'Event Number': ['E1', None, 'E3'],
+            'Claim ID': ['ID1', 'ID2', None],
+            'Claimant Name': ['Ann', None, 'C' * 250],
+            'Loss Date': ['2024-03-05', 'not a date', None],
+            'Claim State': pd.Categorical(['CA', None, 'Texas']),
+            'Structure Level Name 01': ['NV', 'OR', 'WA'],
+            'Claim Paid - Total': [None, 250.0, None],
+            'Claim Amount': [1000.456, 300.0, None],
+            'Date Of Attorney Representation': [None, '2024-04-01', None],
+            'days_to_report': [3.7, np.nan, 12.0],
+            'fraud_score': [12.5, None, 80.0],
+            'risk_level': ['Low', None, ''],
+            'red_flags': [['[TIMING] Weekend injury'], None, []],
+        }, index=[10, 11, 12])
+        fields = views.claim_field_values(df)
+
+        self.assertEqual(fields['claim_number'], ['E1', 'ID2', 'E3'])
+        self.assertEqual(fields['claimant_name'], ['Ann', 'Unknown', 'C' * 200])
+        self.assertEqual(fields['date_of_loss'], [datetime.date(2024, 3, 5), None, None])
+        self.assertEqual(fields['state'], ['CA', 'OR', 'Te'])
+        self.assertEqual(fields['city'], ['', '', ''])
+        self.assertEqual(fields['claim_amount'], [1000.456, 250.0, None])
+        self.assertEqual(fields['medical_costs'], [None, None, None])
+        self.assertEqual(fields['days_to_report'], [3, None, 12])
+        self.assertEqual(fields['attorney_involved'], [False, True, False])
+        self.assertEqual(fields['witness_available'], [False, False, False])
+        self.assertEqual(fields['fraud_score'], [12.5, 0.0, 80.0])
+        self.assertEqual(fields['risk_level'], ['Low', 'Low', 'Low'])
+        self.assertEqual(fields['red_flags'], [['[TIMING] Weekend injury'], [], []])
+        self.assertEqual(fields['red_flags_mask'], [1 << RED_FLAG_BITS['weekend_injury'], 0, 0])
+        self.assertNotIn('row_hash', fields)
+
+    def test_claim_number_falls_back_to_row_position(self):
+        df = pd.DataFrame({'Claim Number': ['A', None], 'fraud_score': [1.0, 2.0], 'risk_level': ['Low', 'High']})
+        self.assertEqual(views.claim_field_values(df)['claim_number'], ['A', 'CLAIM_2'])
+        self.assertEqual(views.claim_field_values(df)['claimant_name'], ['Unknown', 'Unknown'])
+
+
+class BulkLoadTests(TestCase):
+    """bulk_load_claims (executemany on SQLite) stores the same claims as the ORM"""
+
+    def setUp(self):
+        self.analysis = FraudAnalysis.objects.create(uploaded_file='uploads/claims.csv')
+        scored = quietly(FraudDetector().detect_fraud, synthetic_claims(150, seed=13))
+        self.fields = views.claim_field_values(scored)
+
+    def stored(self, analysis):
+        fields = [field for field in self.fields if field != 'row_hash']
+        return list(analysis.claims.order_by('claim_number').values_list(*fields))
+
+    def test_matches_bulk_create(self):
+        self.assertEqual(bulk_load_claims(self.analysis, self.fields), 150)
+
+        reference = FraudAnalysis.objects.create(uploaded_file='uploads/claims.csv')
+        names = list(self.fields)
+        Claim.objects.bulk_create([Claim(analysis=reference, **dict(zip(names, values)))
+                                   for values in zip(*self.fields.values())])
+        self.assertEqual(self.stored(self.analysis), self.stored(reference))
+        self.assertFalse(self.analysis.claims.filter(created_at__isnull=True).exists())
+
+    def test_failed_load_leaves_no_rows(self):
+        out_of_range = dict(self.fields, claim_amount=[1e14] + self.fields['claim_amount'][1:])
+        with self.assertRaisesMessage(ValueError, 'claim_amount'):
+            bulk_load_claims(self.analysis, out_of_range)
+
+        missing_number = dict(self.fields, claim_number=self.fields['claim_number'][:-1] + [None])
+        with self.assertRaises(IntegrityError):
+            bulk_load_claims(self.analysis, missing_number)
+        self.assertEqual(self.analysis.claims.count(), 0)
+
+
+class BisectingInsertTests(TestCase):
+    def setUp(self):
+        self.analysis = FraudAnalysis.objects.create(uploaded_file='uploads/claims.csv')
+
+    def rows(self, count, bad):
+        rows = []
+        for row_number in range(count):
+            # claim_number is NOT NULL, so these rows fail on their own
+            values = {'claim_number': None if row_number in bad else f'CLM{row_number}',
+                      'claimant_name': f'Claimant {row_number}', 'fraud_score': row_number}
+            rows.append((row_number, values, Claim(analysis=self.analysis, **values)))
+        return rows
+
+    def test_bad_rows_are_isolated(self):
+        rejected = []
+        inserted = insert_claims_bisecting(self.rows(37, bad={0, 17, 18, 36}), rejected)
+
+        self.assertEqual(inserted, 33)
+        self.assertEqual([row_number for row_number, _, _ in rejected], [0, 17, 18, 36])
+        self.assertEqual(self.analysis.claims.count(), 33)
+        self.assertFalse(self.analysis.claims.filter(claim_number__in=['CLM0', 'CLM17', 'CLM18', 'CLM36']).exists())
+
+    def test_clean_batch_is_inserted_whole(self):
+        rejected = []
+        self.assertEqual(insert_claims_bisecting(self.rows(10, bad=set()), rejected), 10)
+        self.assertEqual(rejected, [])
+
+    def test_rejected_rows_are_quarantined(self):
+        rejected = []
+        insert_claims_bisecting(self.rows(8, bad={3, 5}), rejected)
+        quarantine_claims(self.analysis, rejected)
+
+        quarantined = list(QuarantinedClaim.objects.filter(analysis=self.analysis))
+        self.assertEqual([claim.row_number for claim in quarantined], [3, 5])
+        self.assertEqual(quarantined[0].data['claimant_name'], 'Claimant 3')
+        self.assertTrue(quarantined[0].error.startswith('IntegrityError'))
+        self.assertEqual(self.analysis.rejected_count, 2)
+
+
+class AnalysisQueueTests(TestCase):
+    def setUp(self):
+        self.long_ago = timezone.now() - datetime.timedelta(hours=1)
+
+    def analysis(self, status='queued', **fields):
+        return FraudAnalysis.objects.create(uploaded_file='uploads/claims.csv', status=status, **fields)
+
+    def beat(self, analysis, beats):
+        heartbeat = jobs.Heartbeat(analysis, interval=0)
+        heartbeat.stopped = mock.Mock(**{'wait.side_effect': [False] * beats + [True]})
+        quietly(heartbeat.run)
+
+    def test_claims_queued_and_stale_analyses_oldest_first(self):
+        self.analysis('running', started_at=self.long_ago, heartbeat_at=timezone.now())
+        stale = self.analysis('running', started_at=self.long_ago, heartbeat_at=self.long_ago)
+        orphaned = self.analysis('running', started_at=self.long_ago)
+        queued = self.analysis()
+        self.analysis('done')
+
+        claimed = [jobs.claim_next_analysis() for _ in range(4)]
+        self.assertEqual([analysis and analysis.id for analysis in claimed], [stale.id, orphaned.id, queued.id, None])
+        for analysis in claimed[:3]:
+            self.assertEqual(analysis.status, 'running')
+            self.assertEqual(analysis.heartbeat_at, analysis.started_at)
+            self.assertGreater(analysis.started_at, self.long_ago)
+
+    def test_claim_taken_by_another_worker_moves_on(self):
+        first, second = self.analysis(), self.analysis()
+        claimable = jobs.claimable_analyses
+        calls = []
+
+        def racing_claimable():
+            calls.append(1)
+            if len(calls) == 2:  # another worker claims first between the lookup and the UPDATE
+                FraudAnalysis.objects.filter(id=first.id).update(status='running', started_at=timezone.now(),
+                                                                 heartbeat_at=timezone.now())
+            return claimable()
+
+        with mock.patch.object(jobs, 'claimable_analyses', racing_claimable):
+            self.assertEqual(jobs.claim_next_analysis().id, second.id)
+        self.assertIsNone(jobs.claim_next_analysis())
+
+    def test_run_analysis_records_done_and_failed(self):
+        for result, status, error in [({'success': True}, 'done', ''),
+                                      ({'success': False, 'error': 'No rows'}, 'failed', 'No rows'),
+                                      (ValueError('bad file'), 'failed', 'bad file')]:
+            with self.subTest(status=status, error=error):
+                analysis = self.analysis()
+                claimed = jobs.claim_next_analysis()
+                with mock.patch.object(views, 'process_fraud_analysis', side_effect=[result]):
+                    self.assertEqual(quietly(jobs.run_analysis, claimed), status)
+                analysis.refresh_from_db()
+                self.assertEqual((analysis.status, analysis.error_message), (status, error))
+
+    def test_reclaimed_analysis_keeps_the_newer_run(self):
+        self.analysis()
+        first = jobs.claim_next_analysis()
+        # The first worker's heartbeat went stale an hour ago and a second worker claimed the analysis
+        FraudAnalysis.objects.filter(id=first.id).update(started_at=self.long_ago, heartbeat_at=self.long_ago)
+        first.started_at = self.long_ago
+        second = jobs.claim_next_analysis()
+        self.assertEqual(second.id, first.id)
+
+        self.beat(first, beats=2)
+        with mock.patch.object(views, 'process_fraud_analysis', return_value={'success': False, 'error': 'late'}):
+            self.assertIsNone(quietly(jobs.run_analysis, first))
+        current = FraudAnalysis.objects.get(id=first.id)
+        self.assertEqual((current.status, current.started_at, current.heartbeat_at),
+                         ('running', second.started_at, second.heartbeat_at))
+
+        FraudAnalysis.objects.filter(id=second.id).update(heartbeat_at=self.long_ago)
+        self.beat(second, beats=1)
+        self.assertGreater(FraudAnalysis.objects.get(id=second.id).heartbeat_at, self.long_ago)
+
+    def test_heartbeat_survives_database_errors(self):
+        self.analysis()
+        analysis = jobs.claim_next_analysis()
+        claim = jobs.current_claim(analysis)
+        FraudAnalysis.objects.filter(id=analysis.id).update(heartbeat_at=self.long_ago)
+
+        locked = DatabaseError('database is locked')
+        with mock.patch.object(jobs, 'current_claim', side_effect=[locked, locked, claim]) as current_claim:
+            self.beat(analysis, beats=3)
+        self.assertEqual(current_claim.call_count, 3)
+        self.assertGreater(FraudAnalysis.objects.get(id=analysis.id).heartbeat_at, self.long_ago)
+
+
+class CheckpointResumeTests(TestCase):
+    """A run that crashes mid-way and is resumed ends up with exactly the claims and files of a clean run"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        # process_fraud_analysis writes its outputs under media/ in the working directory
+        cwd = os.getcwd()
+        os.chdir(directory.name)
+        self.addCleanup(os.chdir, cwd)
+        media = override_settings(MEDIA_ROOT=os.path.join(directory.name, 'media'))
+        media.enable()
+        self.addCleanup(media.disable)
+        self.claims = synthetic_claims(250, seed=16)
+
+    def fraud_settings(self, **overrides):
+        return self.settings(FRAUD_DETECTION_SETTINGS=dict(settings.FRAUD_DETECTION_SETTINGS, CHECKPOINT_ROWS=60,
+                                                           **overrides))
+
+    def analysis(self):
+        analysis = FraudAnalysis(status='running')
+        analysis.uploaded_file.save('claims.csv', ContentFile(self.claims.to_csv(index=False).encode()), save=True)
+        return analysis
+
+    def process(self, analysis, crash_on_chunk=None):
+        """Run process_fraud_analysis, with save_claims_to_db raising on the given chunk"""
+        save_claims_to_db = views.save_claims_to_db
+        chunks = []
+
+        def crashing_save(analysis, df):
+            chunks.append(len(df))
+            if len(chunks) == crash_on_chunk:
+                raise RuntimeError('worker died')
+            save_claims_to_db(analysis, df)
+
+        with mock.patch.object(views, 'save_claims_to_db', crashing_save):
+            result = quietly(views.process_fraud_analysis, analysis)
+        analysis.refresh_from_db()
+        return result
+
+    def outputs(self, analysis):
+        claims = sorted(analysis.claims.values_list('claim_number', 'fraud_score', 'risk_level', 'red_flags_mask',
+                                                    'row_hash'))
+        files = []
+        for path in views.analysis_output_paths(os.path.join('media', 'outputs', f'analysis_{analysis.id}')):
+            if os.path.exists(path):
+                with open(path, 'rb') as output_file:
+                    files.append(output_file.read())
+        summary = (analysis.total_claims, analysis.high_risk_count, analysis.critical_risk_count)
+        return claims, files, summary
+
+    def test_resume_after_crash_matches_clean_run(self):
+        for streaming in [False, True]:
+            overrides = {'STREAMING_THRESHOLD_MB': 0, 'STREAMING_CHUNK_ROWS': 120} if streaming else {}
+            with self.subTest(streaming=streaming), self.fraud_settings(**overrides):
+                clean = self.analysis()
+                self.assertTrue(self.process(clean)['success'])
+
+                resumed = self.analysis()
+                self.assertFalse(self.process(resumed, crash_on_chunk=3)['success'])
+                self.assertEqual(resumed.checkpoint['rows_done'], 120)
+                self.assertEqual(resumed.claims.count(), 120)
+                self.assertTrue(self.process(resumed)['success'])
+                self.assertEqual(self.outputs(resumed), self.outputs(clean))
+
+    def test_files_are_truncated_to_the_checkpoint(self):
+        with self.fraud_settings():
+            analysis = self.analysis()
+            self.process(analysis, crash_on_chunk=3)
+        paths = views.analysis_output_paths(os.path.join('media', 'outputs', f'analysis_{analysis.id}'))
+        sizes = analysis.checkpoint['file_sizes']
+        # The third chunk reached the CSVs before its claims failed to save
+        self.assertGreater(os.path.getsize(paths[0]), sizes['fraud_analysis_results.csv'])
+
+        checkpoint = quietly(load_checkpoint, analysis, paths)
+        self.assertEqual((checkpoint['stage'], checkpoint['rows_done']), (PERSIST_STAGE, 120))
+        self.assertEqual(os.path.getsize(paths[0]), sizes['fraud_analysis_results.csv'])
+        self.assertEqual(len(pd.read_csv(paths[0])), 120)
+
+    def test_files_shorter_than_the_checkpoint_start_over(self):
+        with self.fraud_settings():
+            analysis = self.analysis()
+            self.process(analysis, crash_on_chunk=3)
+            paths = views.analysis_output_paths(os.path.join('media', 'outputs', f'analysis_{analysis.id}'))
+            with open(paths[0], 'r+b') as output_file:
+                output_file.truncate(100)
+
+            self.assertEqual(quietly(load_checkpoint, analysis, paths)['rows_done'], 0)
+            analysis.refresh_from_db()
+            self.assertEqual(analysis.checkpoint, {})
+            self.assertEqual(analysis.claims.count(), 0)
+
+            self.process(analysis, crash_on_chunk=2)
+            os.remove(paths[0])
+            self.assertTrue(self.process(analysis)['success'])
+            clean = self.analysis()
+            self.process(clean)
+        self.assertEqual(self.outputs(analysis), self.outputs(clean))
+
+
+class UploadDeduplicationTests(TestCase):
+    """Uploading a file again reuses its analysis, as long as the rules have not changed"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        media = override_settings(MEDIA_ROOT=directory.name)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.data = synthetic_claims(50, seed=17).to_csv(index=False).encode()
+
+    def upload(self, name='claims.csv'):
+        return self.client.post(reverse('fraud_detector:upload'), {'uploaded_file': SimpleUploadedFile(name, self.data)})
+
+    def progress_url(self, analysis):
+        return f"{reverse('fraud_detector:upload')}?analysis={analysis.id}"
+
+    def test_identical_upload_reuses_the_analysis(self):
+        response = self.upload()
+        analysis = FraudAnalysis.objects.get()
+        self.assertEqual(analysis.content_hash, hashlib.sha256(self.data).hexdigest())
+        self.assertEqual(analysis.ruleset_version, FraudDetector().ruleset_version())
+        self.assertRedirects(response, self.progress_url(analysis), fetch_redirect_response=False)
+
+        self.assertRedirects(self.upload('renamed.csv'), self.progress_url(analysis), fetch_redirect_response=False)
+        FraudAnalysis.objects.update(status='done')
+        self.assertRedirects(self.upload(), reverse('fraud_detector:dashboard', args=[analysis.id]),
+                             fetch_redirect_response=False)
+        self.assertEqual(FraudAnalysis.objects.count(), 1)
+
+    def test_changed_ruleset_version_is_analyzed_again(self):
+        self.upload()
+        FraudAnalysis.objects.update(status='done', ruleset_version='rules-before-a-weight-change')
+        self.upload()
+        self.assertEqual(FraudAnalysis.objects.count(), 2)
+        latest = FraudAnalysis.objects.latest('id')
+        self.assertEqual((latest.status, latest.ruleset_version), ('queued', FraudDetector().ruleset_version()))
+
+    def test_failed_analysis_is_not_reused(self):
+        self.upload()
+        FraudAnalysis.objects.update(status='failed')
+        self.upload()
+        self.assertEqual(FraudAnalysis.objects.filter(status='queued').count(), 1)
+
+
+class RowHashTests(SimpleTestCase):
+    def setUp(self):
+        self.claims = synthetic_claims(200, seed=4)
+
+    def test_hashes_do_not_depend_on_chunking(self):
+        chunked = pd.concat([row_hashes(self.claims.iloc[start:start + 33]) for start in range(0, 200, 33)])
+        self.assertEqual(chunked.tolist(), row_hashes(self.claims).tolist())
+
+    def test_hashes_ignore_dtype_variations(self):
+        varied = self.claims.astype({'State': 'category', 'Injury Type Description': 'category'})
+        whole = self.claims.assign(count=np.arange(200))
+        self.assertEqual(row_hashes(varied).tolist(), row_hashes(self.claims).tolist())
+        self.assertEqual(row_hashes(whole.astype({'count': 'float64'})).tolist(), row_hashes(whole).tolist())
+
+    def test_hashes_follow_values(self):
+        hashes = row_hashes(self.claims)
+        witnessed = self.claims.index[self.claims['Date Witness Contacted'].notna()][-1]
+        changed = self.claims.copy()
+        changed.loc[5, 'Claim Incurred - Total'] += 1
+        changed.loc[witnessed, 'Date Witness Contacted'] = pd.NaT
+
+        differs = row_hashes(changed).ne(hashes)
+        self.assertEqual(list(differs[differs].index), [5, witnessed])
+        self.assertEqual(hashes.dtype, 'int64')
+
+    def test_hashes_do_not_depend_on_engine(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'claims.csv')
+        for date_format in ['%Y-%m-%d', '%m/%d/%Y', '%Y-%m-%d %H:%M:%S']:
+            claims = self.claims.copy()
+            for col in claims.select_dtypes('datetime').columns:
+                claims[col] = claims[col].dt.strftime(date_format)
+            claims.to_csv(path, index=False)
+            expected = row_hashes(read_claims_csv(path, engine='c', passthrough=True))
+            for chunksize in [None, 70]:
+                with self.subTest(date_format=date_format, chunksize=chunksize):
+                    df = read_claims_csv(path, engine='pyarrow', chunksize=chunksize, passthrough=True)
+                    if chunksize:
+                        df = pd.concat(df)
+                    self.assertEqual(row_hashes(df).tolist(), expected.tolist())
+                    # Like the C reader, Arrow only parses the date columns the rules read
+                    self.assertEqual(df['Date Witness Contacted'].dropna().iloc[0],
+                                     claims['Date Witness Contacted'].dropna().iloc[0])
+
+
+class DeltaAnalysisTests(TestCase):
+    """A delta analysis carries forward exactly the unchanged rows and ends up with the full analysis' results"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        # process_fraud_analysis writes its outputs under media/ in the working directory
+        cwd = os.getcwd()
+        os.chdir(directory.name)
+        self.addCleanup(os.chdir, cwd)
+        media = override_settings(MEDIA_ROOT=os.path.join(directory.name, 'media'))
+        media.enable()
+        self.addCleanup(media.disable)
+
+        self.base_claims = synthetic_claims(300, seed=6)
+        revised = self.base_claims.drop(index=range(0, 300, 30)).copy()
+        self.changed = revised.index[::20]
+        revised.loc[self.changed, 'Claim Incurred - Total'] += 100
+        added = synthetic_claims(30, seed=8).assign(**{'Claim Number': lambda df: 'NEW' + df['Claim Number']})
+        self.revised = pd.concat([revised, added], ignore_index=True)
+        self.revised_numbers = set(self.revised['Claim Number'])
+        self.changed_numbers = set(self.base_claims.loc[self.changed, 'Claim Number']) | set(added['Claim Number'])
+
+    def analyze(self, claims, base_analysis=None):
+        analysis = FraudAnalysis(base_analysis=base_analysis)
+        analysis.uploaded_file.save('claims.csv', ContentFile(claims.to_csv(index=False).encode()), save=True)
+        result = quietly(views.process_fraud_analysis, analysis)
+        self.assertTrue(result['success'], result.get('error'))
+        analysis.status = 'done'
+        analysis.save(update_fields=['status'])
+        return analysis
+
+    def results(self, analysis):
+        fields = ['claim_number', 'fraud_score', 'risk_level', 'red_flags_mask', 'row_hash']
+        return sorted(analysis.visible_claims().values_list(*fields))
+
+    def test_delta_matches_full_analysis(self):
+        base = self.analyze(self.base_claims)
+        delta = self.analyze(self.revised, base)
+        full = self.analyze(self.revised)
+
+        carried = set(delta.carried_claims.values_list('claim_number', flat=True))
+        scored = set(delta.claims.values_list('claim_number', flat=True))
+        self.assertTrue(carried)
+        self.assertFalse(carried & self.changed_numbers)  # changed and new rows are always rescored
+        self.assertLessEqual(self.changed_numbers, scored)
+        self.assertEqual(carried | scored, self.revised_numbers)
+        self.assertEqual(len(carried) + len(scored), len(self.revised))
+
+        self.assertEqual(self.results(delta), self.results(full))
+        self.assertEqual(delta.total_claims, full.total_claims)
+        self.assertEqual(delta.high_risk_count, full.high_risk_count)
+
+    def test_different_columns_fall_back_to_full_analysis(self):
+        base = self.analyze(self.base_claims)
+        delta = self.analyze(self.revised.drop(columns=['State']), base)
+
+        self.assertEqual(delta.carried_claims.count(), 0)
+        self.assertEqual(delta.claims.count(), len(self.revised))
+
+    def test_older_row_index_falls_back_to_full_analysis(self):
+        base = self.analyze(self.base_claims)
+        path = row_index_path(os.path.join('media', base.output_csv_path))
+        index = pd.read_pickle(path)
+        index['row_hash_version'] -= 1
+        pd.to_pickle(index, path)
+        delta = self.analyze(self.revised, base)
+
+        self.assertEqual(delta.carried_claims.count(), 0)
+        self.assertEqual(delta.claims.count(), len(self.revised))
+
+
+class UploadFormatTests(SimpleTestCase):
+    """Workbooks and compressed CSVs are read exactly like the plain CSV they hold"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.claims = synthetic_claims(250, seed=14)
+        self.csv_path = self.path('claims.csv')
+        self.claims.to_csv(self.csv_path, index=False)
+        self.expected = self.scored(self.csv_path, engine='c')
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def scored(self, path, **read_options):
+        df = read_claims_csv(path, **read_options)
+        if read_options.get('chunksize'):
+            df = pd.concat(df)
+        return quietly(FraudDetector().detect_fraud, df)
+
+    def assertScoredLikeCsv(self, path, **read_options):
+        scored = self.scored(path, **read_options)
+        self.assertEqual(list(scored.columns), list(self.expected.columns))
+        for col in ['Claim Number', 'Claim Incurred - Total', 'days_to_report', 'fraud_score', 'red_flags_mask']:
+            self.assertEqual(scored[col].tolist(), self.expected[col].tolist(), col)
+
+    def test_excel_matches_csv(self):
+        path = self.path('claims.xlsx')
+        self.claims.to_excel(path, index=False)
+        for chunksize in [None, 60]:
+            with self.subTest(chunksize=chunksize):
+                self.assertScoredLikeCsv(path, chunksize=chunksize)
+
+    def test_compressed_csv_matches_csv(self):
+        with open(self.csv_path, 'rb') as source:
+            data = source.read()
+        with gzip.open(self.path('claims.csv.gz'), 'wb') as target:
+            target.write(data)
+        with zipfile.ZipFile(self.path('claims.zip'), 'w', zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr('claims.csv', data)
+        with open(self.path('claims.csv.zst'), 'wb') as target:
+            target.write(zstandard.ZstdCompressor().compress(data))
+
+        for name in ['claims.csv.gz', 'claims.zip', 'claims.csv.zst']:
+            for engine in ['c', 'pyarrow']:
+                for chunksize in [None, 60]:
+                    with self.subTest(name=name, engine=engine, chunksize=chunksize):
+                        self.assertScoredLikeCsv(self.path(name), engine=engine, chunksize=chunksize)
+
+
+def sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+class ChunkedUploadTests(TestCase):
+    """The chunked upload API, driven through the test client"""
+
+    CHUNK = 10000
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.media = directory.name
+        media = override_settings(MEDIA_ROOT=directory.name)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.data = synthetic_claims(300, seed=21).to_csv(index=False).encode()
+
+    def start(self, **fields):
+        fields = dict({'file_name': 'claims.csv', 'file_size': len(self.data), 'sha256': sha256(self.data)}, **fields)
+        response = self.client.post(reverse('fraud_detector:upload_session_create'), fields)
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.json()['upload_id']
+
+    def put(self, upload_id, offset, body=None, checksum=None):
+        body = self.data[offset:offset + self.CHUNK] if body is None else body
+        return self.client.put(reverse('fraud_detector:upload_session_chunk', args=[upload_id, offset]), body,
+                               content_type='application/octet-stream',
+                               HTTP_X_CHUNK_SHA256=sha256(body) if checksum is None else checksum)
+
+    def send(self, upload_id, offset=0):
+        while offset < len(self.data):
+            response = self.put(upload_id, offset)
+            self.assertEqual(response.status_code, 200, response.content)
+            offset = response.json()['offset']
+
+    def finalize(self, upload_id):
+        return self.client.post(reverse('fraud_detector:upload_session_finalize', args=[upload_id]))
+
+    def test_finalized_upload_queues_its_analysis(self):
+        upload_id = self.start()
+        self.send(upload_id)
+        status = self.client.get(reverse('fraud_detector:upload_session_status', args=[upload_id])).json()
+        self.assertEqual((status['offset'], status['status']), (len(self.data), 'open'))
+
+        response = self.finalize(upload_id)
+        self.assertEqual(response.status_code, 200)
+        analysis = FraudAnalysis.objects.get(id=response.json()['analysis_id'])
+        self.assertEqual((analysis.status, analysis.content_hash), ('queued', sha256(self.data)))
+        with analysis.uploaded_file.open('rb') as uploaded:
+            self.assertEqual(uploaded.read(), self.data)
+        self.assertEqual(os.listdir(os.path.join(self.media, 'uploads', 'partial')), [])
+
+        # A repeated finalize (e.g. after a lost response) returns the same analysis
+        again = self.finalize(upload_id)
+        self.assertEqual(again.status_code, 200)
+        self.assertEqual(again.json(), response.json())
+        self.assertEqual(FraudAnalysis.objects.count(), 1)
+
+    def test_checksum_mismatch_is_rejected(self):
+        upload_id = self.start()
+        body = self.data[:self.CHUNK]
+        response = self.put(upload_id, 0, body[:-1] + b'#', checksum=sha256(body))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Checksum mismatch', response.json()['error'])
+        self.assertEqual(response.json()['offset'], 0)
+        self.assertEqual(self.put(upload_id, 0).json()['offset'], self.CHUNK)
+
+        self.assertEqual(self.put(upload_id, self.CHUNK, checksum='').status_code, 400)
+
+    def test_wrong_offset_and_duplicate_chunks_conflict(self):
+        upload_id = self.start()
+        self.put(upload_id, 0)
+
+        wrong_offset = self.put(upload_id, 5)
+        self.assertEqual(wrong_offset.status_code, 409)
+        self.assertEqual(wrong_offset.json()['offset'], self.CHUNK)
+        self.assertEqual(self.put(upload_id, 0).status_code, 409)
+
+        # A duplicate request that passed the offset check while the first one was being written
+        write_upload_chunk = views.write_upload_chunk
+
+        def racing_write(session, offset, stream, length):
+            digest = write_upload_chunk(session, offset, stream, length)
+            UploadSession.objects.filter(id=session.id).update(received_bytes=offset + length)
+            return digest
+
+        with mock.patch.object(views, 'write_upload_chunk', racing_write):
+            duplicate = self.put(upload_id, self.CHUNK)
+        self.assertEqual(duplicate.status_code, 409)
+        self.assertEqual(duplicate.json()['offset'], 2 * self.CHUNK)
+
+        self.send(upload_id, 2 * self.CHUNK)
+        analysis = FraudAnalysis.objects.get(id=self.finalize(upload_id).json()['analysis_id'])
+        with analysis.uploaded_file.open('rb') as uploaded:
+            self.assertEqual(uploaded.read(), self.data)
+
+    def test_finalize_before_the_last_chunk_conflicts(self):
+        upload_id = self.start()
+        self.put(upload_id, 0)
+        response = self.finalize(upload_id)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['error'], 'The upload is not complete')
+        self.assertEqual(response.json()['status'], 'open')
+
+        self.send(upload_id, self.CHUNK)
+        self.assertEqual(self.finalize(upload_id).status_code, 200)
+
+    def test_file_not_matching_its_sha256_fails(self):
+        upload_id = self.start(sha256=sha256(b'another file'))
+        self.send(upload_id)
+        response = self.finalize(upload_id)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['status'], 'failed')
+        self.assertFalse(FraudAnalysis.objects.exists())
+        self.assertEqual(os.listdir(os.path.join(self.media, 'uploads', 'partial')), [])
+        self.assertEqual(self.put(upload_id, 0).status_code, 409)
+
+    def test_identical_upload_reuses_the_analysis(self):
+        first = self.start()
+        self.send(first)
+        analysis_id = self.finalize(first).json()['analysis_id']
+
+        second = self.start(file_name='renamed.csv')
+        self.send(second)
+        response = self.finalize(second)
+        self.assertEqual(response.json()['analysis_id'], analysis_id)
+        self.assertEqual(FraudAnalysis.objects.count(), 1)
+        self.assertFalse(os.path.exists(os.path.join(self.media, 'uploads', second)))
+        self.assertEqual(os.listdir(os.path.join(self.media, 'uploads', 'partial')), [])
+
+
+class RedFlagQueryTests(TestCase):
+    def setUp(self):
+        self.analysis = FraudAnalysis.objects.create(uploaded_file='uploads/claims.csv')
+        other = FraudAnalysis.objects.create(uploaded_file='uploads/other.csv')
+        self.weekend = 1 << RED_FLAG_BITS['weekend_injury']
+        self.witness = 1 << RED_FLAG_BITS['no_witness']
+        self.multiple = 1 << RED_FLAG_BITS['multiple_claims']
+        for number, mask, score in [('A', self.weekend, 20), ('B', self.weekend | self.witness, 40),
+                                    ('C', self.witness, 60), ('D', 0, 10), ('E', self.multiple | self.weekend, 90)]:
+            Claim.objects.create(analysis=self.analysis, claim_number=number, claimant_name=number,
+                                 fraud_score=score, red_flags_mask=mask)
+        Claim.objects.create(analysis=other, claim_number='X', claimant_name='X', red_flags_mask=self.weekend)
+
+    def claim_numbers(self, bits):
+        return sorted(claims_with_flags(self.analysis.visible_claims(), bits).values_list('claim_number', flat=True))
+
+    def test_claims_with_flags(self):
+        self.assertEqual(self.claim_numbers([RED_FLAG_BITS['weekend_injury']]), ['A', 'B', 'E'])
+        self.assertEqual(self.claim_numbers([RED_FLAG_BITS['no_witness'], RED_FLAG_BITS['multiple_claims']]),
+                         ['B', 'C', 'E'])
+        self.assertEqual(self.claim_numbers([RED_FLAG_BITS['near_holiday']]), [])
+        self.assertEqual(self.claim_numbers([]), [])
+
+    def test_flag_statistics(self):
+        statistics = {entry['message']: entry for entry in flag_statistics(self.analysis.visible_claims())}
+
+        self.assertEqual(set(statistics), {'Weekend injury', 'No witness contacted', 'Multiple claims from same person'})
+        self.assertEqual(statistics['Weekend injury']['count'], 3)
+        self.assertAlmostEqual(statistics['Weekend injury']['avg_fraud_score'], 50.0)
+        self.assertEqual(statistics['No witness contacted']['count'], 2)
+        self.assertAlmostEqual(statistics['No witness contacted']['avg_fraud_score'], 50.0)
+        self.assertEqual(statistics['Multiple claims from same person']['category'], 'BEHAVIORAL')
+        self.assertEqual([entry['count'] for entry in flag_statistics(self.analysis.visible_claims())], [3, 2, 1])
+
+    def test_queries_match_decoded_flags(self):
+        claims = self.analysis.visible_claims()
+        decoded = decode_red_flags(pd.Series(list(claims.values_list('red_flags_mask', flat=True))))
+        for entry in flag_statistics(claims):
+            label = red_flag_label(entry['bit'])
+            self.assertEqual(entry['count'], sum(label in flags for flags in decoded))
+            self.assertEqual(claims_with_flags(claims, [entry['bit']]).count(), entry['count'])
+
+    def test_mask_bits_and_message_search(self):
+        self.assertEqual(mask_bits(0b1010), [1, 3])
+        self.assertEqual(bits_matching('WEEKEND'), [RED_FLAG_BITS['weekend_injury']])
+        self.assertEqual(bits_matching('new employee'), [RED_FLAG_BITS['new_employee_30d'], RED_FLAG_BITS['new_employee_90d']])
+        self.assertEqual(bits_matching('no such flag'), [])
+
+
+class RollupTests(TestCase):
+    """Stored rollups hold the same numbers as aggregating the claims directly"""
+
+    def setUp(self):
+        self.analysis = FraudAnalysis.objects.create(uploaded_file='uploads/claims.csv', status='done')
+        rng = np.random.default_rng(15)
+        states, injuries = ['CA', 'TX', 'NY'], ['Strain', 'Sprain', '']
+        masks = [1 << RED_FLAG_BITS['weekend_injury'], 1 << RED_FLAG_BITS['no_witness'], 0]
+        Claim.objects.bulk_create([
+            Claim(analysis=self.analysis, claim_number=f'CLM{i}', claimant_name=f'Claimant {i % 70}',
+                  state=states[i % 3], injury_type=injuries[i % 3 if i % 4 else 0],
+                  date_of_loss=datetime.date(2024, 1 + i % 12, 1) if i % 10 else None,
+                  fraud_score=round(float(rng.uniform(0, 100)), 2), red_flags_mask=masks[i % 3] | masks[i % 2],
+                  risk_level=['Low', 'Medium', 'High', 'Critical'][i % 4])
+            for i in range(200)
+        ])
+        Claim.objects.create(analysis=FraudAnalysis.objects.create(uploaded_file='uploads/other.csv'),
+                             claim_number='X', claimant_name='Claimant 1', state='CA', fraud_score=99)
+        self.claims = pd.DataFrame(list(self.analysis.claims.values(
+            'claimant_name', 'state', 'injury_type', 'date_of_loss', 'fraud_score', 'risk_level', 'red_flags_mask')))
+        self.claims['fraud_score'] = self.claims['fraud_score'].astype(float)
+        self.claims['high_risk'] = self.claims['risk_level'].isin(['High', 'Critical'])
+
+    def stored(self, kind):
+        return {row.key: (row.count, round(row.avg_fraud_score, 6), row.high_risk_count)
+                for row in AnalysisRollup.objects.filter(analysis=self.analysis, kind=kind)}
+
+    def expected(self, keys, claims=None):
+        claims = self.claims if claims is None else claims
+        groups = claims.groupby(keys)
+        return {str(key): (int(count), round(avg, 6), int(high))
+                for key, count, avg, high in zip(groups.size().index, groups.size(), groups['fraud_score'].mean(),
+                                                 groups['high_risk'].sum())}
+
+    def test_rollups_match_direct_aggregation(self):
+        quietly(build_rollups, self.analysis)
+        claims = self.claims
+
+        self.assertEqual(self.stored(TOTAL), {'': (200, round(claims['fraud_score'].mean(), 6),
+                                                   int(claims['high_risk'].sum()))})
+        self.assertEqual(self.stored(STATE), self.expected(claims['state']))
+        injured = claims[claims['injury_type'] != '']
+        self.assertEqual(self.stored(INJURY_TYPE), self.expected(injured['injury_type'], injured))
+        dated = claims[claims['date_of_loss'].notna()]
+        months = pd.to_datetime(dated['date_of_loss']).dt.strftime('%Y-%m')
+        self.assertEqual(self.stored(MONTH), self.expected(months, dated))
+        repeat = {key: stats for key, stats in self.expected(claims['claimant_name']).items() if stats[0] > 1}
+        self.assertEqual(self.stored(CLAIMANT), repeat)
+        self.assertEqual(self.stored(SCORE_BIN), self.expected((claims['fraud_score'] // 5 * 5).astype(int)))
+
+        for bit, message in [(RED_FLAG_BITS['weekend_injury'], 'Weekend injury'),
+                             (RED_FLAG_BITS['no_witness'], 'No witness contacted')]:
+            flagged = claims[claims['red_flags_mask'].to_numpy() >> bit & 1 == 1]
+            count, avg, _ = self.stored(FLAG)[message]
+            self.assertEqual((count, avg), (len(flagged), round(flagged['fraud_score'].mean(), 6)))
+
+    def test_missing_rollups_are_built_on_request(self):
+        rows = quietly(analysis_rollups, self.analysis, STATE)
+        self.assertEqual({row.key: row.count for row in rows}, {'CA': 67, 'TX': 67, 'NY': 66})
+        self.assertTrue(AnalysisRollup.objects.filter(analysis=self.analysis, kind=TOTAL).exists())
+
+
+class ChartSeriesTests(TestCase):
+    def setUp(self):
+        self.analysis = FraudAnalysis.objects.create(uploaded_file='uploads/claims.csv')
+        start = datetime.date(2024, 1, 1)
+        Claim.objects.bulk_create([
+            Claim(analysis=self.analysis, claim_number=f'CLM{i}', claimant_name=f'Claimant {i}',
+                  date_of_loss=start + datetime.timedelta(days=i), days_to_report=i % 40,
+                  fraud_score=(i * 37) % 100, risk_level='High' if i % 3 else 'Low')
+            for i in range(300)
+        ])
+
+    def charts(self, **params):
+        request = RequestFactory().get('/', params)
+        return quietly(views.charts_data_api, request, self.analysis.id)
+
+    def test_risk_level_filter(self):
+        data = json.loads(self.charts(risk_level='Low').content)
+        self.assertEqual(sum(point['count'] for point in data['scoreHistogram']), 100)
+        self.assertEqual(sum(point['high_risk_count'] for point in data['scoreHistogram']), 0)
+        self.assertEqual(self.charts(risk_level='Severe').status_code, 400)
+
+    def test_series_respect_max_points(self):
+        data = json.loads(self.charts(max_points='50').content)
+        self.assertLessEqual(len(data['timeline']), 50)
+        self.assertLessEqual(len(data['timeLag']), 50)
+        self.assertEqual(sum(point['count'] for point in data['scoreHistogram']), 300)
+
+    def test_max_points_is_clamped(self):
+        data = json.loads(self.charts(max_points='1').content)
+        # Raised to MIN_POINTS (points picked by both LTTB and the envelope count once)
+        self.assertGreater(len(data['timeline']), MIN_POINTS // 2)
+        self.assertLessEqual(len(data['timeline']), MIN_POINTS)
+        self.assertLessEqual(len(data['timeLag']), MIN_POINTS)
+        self.assertEqual(self.charts(max_points='-5').status_code, 400)
+
+
+def reference_lttb(x, y, n_out):
+    """Largest-Triangle-Three-Buckets as published (Steinarsson, 2013), one point at a time"""
+    n = len(x)
+    every = (n - 2) / (n_out - 2)
+    selected = [0]
+    previous = 0
+    for bucket in range(n_out - 2):
+        next_start = int((bucket + 1) * every) + 1
+        next_end = min(int((bucket + 2) * every) + 1, n)
+        if bucket == n_out - 3:
+            next_start, next_end = n - 1, n
+        average_x = sum(x[next_start:next_end]) / (next_end - next_start)
+        average_y = sum(y[next_start:next_end]) / (next_end - next_start)
+
+        best, best_area = None, -1.0
+        for index in range(int(bucket * every) + 1, int((bucket + 1) * every) + 1):
+            area = abs((x[previous] - average_x) * (y[index] - y[previous])
+                       - (x[previous] - x[index]) * (average_y - y[previous]))
+            if area > best_area:
+                best, best_area = index, area
+        selected.append(best)
+        previous = best
+    selected.append(n - 1)
+    return selected
+
+
+class DownsamplingTests(SimpleTestCase):
+    def setUp(self):
+        rng = np.random.default_rng(2)
+        self.x = np.cumsum(rng.integers(1, 4, 5000)).astype(float)
+        self.y = np.cumsum(rng.normal(size=5000))
+
+    def test_lttb_matches_reference(self):
+        for n_out in [3, 4, 10, 137, 1000, 4999]:
+            with self.subTest(n_out=n_out):
+                self.assertEqual(lttb(self.x, self.y, n_out).tolist(), reference_lttb(self.x, self.y, n_out))
+
+    def test_lttb_small_budgets(self):
+        self.assertEqual(lttb(self.x, self.y, 6000).tolist(), list(range(5000)))
+        self.assertEqual(lttb(self.x, self.y, 2).tolist(), [0, 4999])
+        self.assertEqual(lttb(self.x, self.y, 1).tolist(), [0])
+        self.assertEqual(lttb(self.x, self.y, 0).tolist(), [])
+
+    def test_envelope_keeps_each_bucket_extremes(self):
+        kept = minmax_envelope(self.y, 50)
+        for bucket in np.array_split(np.arange(5000), 50):
+            self.assertIn(bucket[np.argmin(self.y[bucket])], kept)
+            self.assertIn(bucket[np.argmax(self.y[bucket])], kept)
+        self.assertLessEqual(len(kept), 100)
+        self.assertEqual(minmax_envelope(self.y, 0).tolist(), [])
+
+    def test_downsample_stays_within_budget(self):
+        for max_points in [0, 1, 2, MIN_POINTS - 1, MIN_POINTS, 11, 500, 4999]:
+            with self.subTest(max_points=max_points):
+                kept = downsample(self.x, self.y, max_points)
+                self.assertLessEqual(len(kept), max_points)
+                self.assertEqual(kept.tolist(), sorted(set(kept.tolist())))
+        self.assertEqual(downsample(self.x, self.y, 5000).tolist(), list(range(5000)))
+
+    def test_downsample_keeps_spikes(self):
+        y = self.y.copy()
+        y[1234], y[3210] = 1000.0, -1000.0
+        kept = downsample(self.x, y, 100)
+        self.assertIn(1234, kept)
+        self.assertIn(3210, kept)
+        self.assertIn(0, kept)
+        self.assertIn(4999, kept)
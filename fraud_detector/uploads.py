@@ -0,0 +1,172 @@
+"""
+Content hashing of uploaded files, and chunked uploads.
+
+HashingUploadHandler sits ahead of Django's storing handlers (FILE_UPLOAD_HANDLERS)
+and hashes each chunk as it streams past, so the digest is ready when the upload
+is, without reading the file a second time.
+
+Large files can also arrive in pieces through the upload API (UploadSession):
+each chunk is written at its offset of a partial file once its SHA-256 checks
+out, a client that lost its connection asks for the offset and carries on from
+there, and the finished file is moved into place rather than copied. Finalizing
+is repeatable: the upload only becomes complete together with its analysis.
+"""
+
+import hashlib
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db.models import F, Q
+from django.core.files.uploadhandler import FileUploadHandler
+from django.utils import timezone
+
+from .models import UploadSession
+
+# Read size when a file has to be hashed after the fact
+HASH_READ_BYTES = 1024 * 1024
+
+# Where chunked uploads are assembled (storage name prefix)
+PARTIAL_UPLOAD_DIR = 'uploads/partial'
+
+# A finalize claim this old belongs to a request that died, and is taken over
+FINALIZE_STALE_SECONDS = 300
+
+
+class HashingUploadHandler(FileUploadHandler):
+    """SHA-256 of each uploaded file, left in request.upload_hashes (field name -> hex digest).
+
+    Chunks are passed on unchanged to the next handler, which stores the file.
+    """
+
+    def new_file(self, field_name, *args, **kwargs):
+        super().new_file(field_name, *args, **kwargs)
+        self.hasher = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.hasher.update(raw_data)
+        return raw_data
+
+    def file_complete(self, file_size):
+        if not hasattr(self.request, 'upload_hashes'):
+            self.request.upload_hashes = {}
+        self.request.upload_hashes[self.field_name] = self.hasher.hexdigest()
+        return None
+
+
+def uploaded_file_hash(request, field_name, uploaded_file):
+    """Hex SHA-256 of an uploaded file - from the upload handler, or by reading the file"""
+    digest = getattr(request, 'upload_hashes', {}).get(field_name)
+    if digest:
+        return digest
+    hasher = hashlib.sha256()
+    for chunk in uploaded_file.chunks(HASH_READ_BYTES):
+        hasher.update(chunk)
+    uploaded_file.seek(0)
+    return hasher.hexdigest()
+
+
+def file_hash(path):
+    """Hex SHA-256 of the file at path"""
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as source:
+        for chunk in iter(lambda: source.read(HASH_READ_BYTES), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def start_upload_session(file_name, file_size, sha256='', user=None, base_analysis=None):
+    """Create an UploadSession with an empty partial file to append chunks to"""
+    session = UploadSession(file_name=os.path.basename(file_name), file_size=file_size,
+                            sha256=sha256.lower(), user=user, base_analysis=base_analysis)
+    session.partial_file = f"{PARTIAL_UPLOAD_DIR}/{session.id}.part"
+    os.makedirs(os.path.dirname(default_storage.path(session.partial_file)), exist_ok=True)
+    open(default_storage.path(session.partial_file), 'wb').close()
+    session.save()
+    return session
+
+
+def write_upload_chunk(session, offset, stream, length):
+    """Write length bytes read from stream at offset of the partial file, and return their hex SHA-256.
+    
+    The chunk is streamed to disk, never held in memory. Returns None if the stream
+    ended early. Bytes past received_bytes only count once the caller has checked the
+    digest and advanced received_bytes - until then the next attempt overwrites them.
+    """
+    hasher = hashlib.sha256()
+    remaining = length
+    with open(default_storage.path(session.partial_file), 'r+b') as partial:
+        partial.seek(offset)
+        while remaining:
+            data = stream.read(min(remaining, HASH_READ_BYTES))
+            if not data:
+                return None
+            hasher.update(data)
+            partial.write(data)
+            remaining -= len(data)
+    return hasher.hexdigest()
+
+
+def claim_upload_finalize(session):
+    """Move a fully received upload to 'finalizing'; returns whether this request claimed it.
+    
+    A conditional UPDATE, so only one request finalizes an upload. Claims older than
+    FINALIZE_STALE_SECONDS, and complete uploads whose analysis is missing, are taken over.
+    """
+    stale_before = timezone.now() - timedelta(seconds=FINALIZE_STALE_SECONDS)
+    claimed = UploadSession.objects.filter(id=session.id, received_bytes=F('file_size')).filter(
+        Q(status='open') |
+        Q(status='finalizing', updated_at__lt=stale_before) |
+        Q(status='complete', analysis__isnull=True)
+    ).update(status='finalizing', updated_at=timezone.now())
+    if claimed:
+        session.status = 'finalizing'
+    return bool(claimed)
+
+
+def assembled_name(session):
+    """Storage name the completed upload is moved to (fixed per upload, so a retry finds it)"""
+    return default_storage.generate_filename(f"uploads/{session.id}/{session.file_name}")
+
+
+def received_file_path(session):
+    """Path of the received file - partial, or already moved by an interrupted finalize (None if gone)"""
+    for name in (session.partial_file, assembled_name(session)):
+        path = default_storage.path(name)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def assemble_upload(session):
+    """Move the completed partial file to its final upload name and return that storage name.
+    
+    A rename within the media directory - the file is not copied. Repeating it after the
+    move only returns the name.
+    """
+    name = assembled_name(session)
+    partial_path = default_storage.path(session.partial_file)
+    if os.path.exists(partial_path):
+        with open(partial_path, 'r+b') as partial:
+            partial.truncate(session.file_size)  # drop bytes of a rejected last attempt
+        os.makedirs(os.path.dirname(default_storage.path(name)), exist_ok=True)
+        os.replace(partial_path, default_storage.path(name))
+    return name
+
+
+def discard_upload(session):
+    """Delete the received file of an upload that no analysis uses"""
+    for name in (session.partial_file, assembled_name(session)):
+        path = default_storage.path(name)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def expire_upload_sessions():
+    """Delete open uploads that have not received a chunk for UPLOAD_SESSION_HOURS"""
+    hours = settings.FRAUD_DETECTION_SETTINGS.get('UPLOAD_SESSION_HOURS', 24)
+    expired = UploadSession.objects.filter(status='open', updated_at__lt=timezone.now() - timedelta(hours=hours))
+    for session in expired:
+        discard_upload(session)
+        session.delete()
@@ -22,4 +22,11 @@ urlpatterns = [
     
     # API endpoints
     path('api/charts-data/<int:analysis_id>/', views.charts_data_api, name='charts_data_api'),
+    path('api/progress/<int:analysis_id>/', views.analysis_progress_api, name='analysis_progress_api'),
+    
+    # Chunked, resumable uploads
+    path('api/uploads/', views.upload_session_create, name='upload_session_create'),
+    path('api/uploads/<uuid:upload_id>/', views.upload_session_status, name='upload_session_status'),
+    path('api/uploads/<uuid:upload_id>/chunks/<int:offset>/', views.upload_session_chunk, name='upload_session_chunk'),
+    path('api/uploads/<uuid:upload_id>/finalize/', views.upload_session_finalize, name='upload_session_finalize'),
 ]
\ No newline at end of file
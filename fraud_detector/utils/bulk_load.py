@@ -0,0 +1,221 @@
+"""
+Native bulk loading of Claim rows (and of carried-claim references).
+
+PostgreSQL streams the rows through COPY FROM STDIN and SQLite inserts them with a
+single executemany inside one transaction. Other backends fall back to bulk_create.
+When a load fails, insert_claims_bisecting isolates the bad rows so they can be
+quarantined instead of failing the whole batch.
+"""
+
+import csv
+import io
+import json
+from contextlib import contextmanager
+from itertools import islice, repeat
+
+from django.db import connections, models, transaction
+from django.utils import timezone
+
+from ..models import Claim, FraudAnalysis, QuarantinedClaim
+
+# Rows per COPY statement (each batch is buffered as CSV text before it is sent)
+COPY_BATCH_ROWS = 50000
+
+# Applied for the duration of a SQLite load, then restored
+SQLITE_PRAGMAS = {
+    'synchronous': 'NORMAL',   # one sync at commit is enough for a single-transaction load
+    'temp_store': 'MEMORY',
+    'cache_size': -262144,     # 256 MB page cache keeps the Claim indexes in memory
+}
+
+# Batch size for the bulk_create fallback on other backends
+ORM_BATCH_SIZE = 500
+
+
+def bulk_load_claims(analysis, fields, using='default'):
+    """Insert one Claim per row of fields (Claim field name -> list of values) and return the row count.
+
+    The load is atomic - on failure no rows of this call are left behind.
+    """
+    connection = connections[using]
+    columns, rows = _claim_rows(analysis, fields, connection)
+    table = Claim._meta.db_table
+
+    if connection.vendor == 'postgresql':
+        # Unquoted empty CSV fields load as NULL, except in the NOT NULL text columns
+        not_null_text = [
+            field.column for field in Claim._meta.concrete_fields
+            if isinstance(field, (models.CharField, models.TextField)) and not field.null
+        ]
+        return _copy_postgresql(connection, table, columns, rows, not_null_text)
+    if connection.vendor == 'sqlite':
+        return _executemany_sqlite(connection, table, columns, rows)
+
+    field_names = list(fields)
+    claims = [Claim(analysis=analysis, **dict(zip(field_names, values))) for values in zip(*fields.values())]
+    with transaction.atomic(using=using):
+        Claim.objects.using(using).bulk_create(claims, batch_size=ORM_BATCH_SIZE)
+    return len(claims)
+
+
+def bulk_load_claim_references(analysis, claim_ids, using='default'):
+    """Add existing claims to analysis.carried_claims with the native loader and return the row count"""
+    connection = connections[using]
+    through = FraudAnalysis.carried_claims.through
+    table = through._meta.db_table
+    columns = [through._meta.get_field('fraudanalysis').column, through._meta.get_field('claim').column]
+    rows = zip(repeat(analysis.pk), (int(claim_id) for claim_id in claim_ids))
+
+    if connection.vendor == 'postgresql':
+        return _copy_postgresql(connection, table, columns, rows)
+    if connection.vendor == 'sqlite':
+        return _executemany_sqlite(connection, table, columns, rows)
+
+    references = [through(fraudanalysis_id=analysis_id, claim_id=claim_id) for analysis_id, claim_id in rows]
+    with transaction.atomic(using=using):
+        through.objects.using(using).bulk_create(references, batch_size=ORM_BATCH_SIZE)
+    return len(references)
+
+
+@contextmanager
+def bulk_load_session(using='default'):
+    """Tune the connection for bulk loads (SQLite PRAGMAs) for the duration of the block.
+
+    Use it around a transaction that wraps several loads; loads outside a
+    transaction tune the connection themselves.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite' or connection.in_atomic_block:
+        yield
+        return
+    with connection.cursor() as cursor:
+        previous = _set_sqlite_pragmas(cursor, SQLITE_PRAGMAS)
+        try:
+            yield
+        finally:
+            _set_sqlite_pragmas(cursor, previous)
+
+
+def insert_claims_bisecting(rows, rejected):
+    """bulk_create a batch of claims, splitting failing batches in half until the bad rows are isolated.
+
+    rows is a list of (row_number, field values, Claim). Rows that fail on their own are
+    appended to rejected as (row_number, field values, error). Returns the number inserted.
+    """
+    try:
+        with transaction.atomic():
+            Claim.objects.bulk_create([claim for _, _, claim in rows], batch_size=ORM_BATCH_SIZE)
+        return len(rows)
+    except Exception as error:
+        if len(rows) == 1:
+            row_number, values, _ = rows[0]
+            rejected.append((row_number, values, error))
+            return 0
+        middle = len(rows) // 2
+        return insert_claims_bisecting(rows[:middle], rejected) + insert_claims_bisecting(rows[middle:], rejected)
+
+
+def quarantine_claims(analysis, rejected):
+    """Store rejected rows (from insert_claims_bisecting) and add them to analysis.rejected_count"""
+    QuarantinedClaim.objects.bulk_create([
+        QuarantinedClaim(
+            analysis=analysis,
+            row_number=int(row_number),
+            claim_number=values.get('claim_number') or '',
+            data=values,
+            error=f"{type(error).__name__}: {error}",
+        )
+        for row_number, values, error in rejected
+    ], batch_size=ORM_BATCH_SIZE)
+    analysis.rejected_count += len(rejected)
+
+
+def _claim_rows(analysis, fields, connection):
+    """Database column names and an iterator of row tuples, with values already adapted for the backend"""
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    rows = len(next(iter(fields.values()), []))
+
+    columns = []
+    column_values = []
+    for field in Claim._meta.concrete_fields:
+        if field.primary_key:
+            continue
+        if field.name == 'analysis':
+            values = repeat(analysis.pk, rows)
+        elif field.name in fields:
+            values = _adapt_values(field, fields[field.name])
+        elif getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False):
+            values = repeat(now, rows)
+        else:
+            values = repeat(field.get_db_prep_save(field.get_default(), connection), rows)
+        columns.append(field.column)
+        column_values.append(values)
+
+    return columns, zip(*column_values)
+
+
+def _adapt_values(field, values):
+    if isinstance(field, models.DecimalField):
+        # SQLite would store out-of-range values as-is; reject them like the ORM and PostgreSQL do
+        limit = 10 ** (field.max_digits - field.decimal_places)
+        values = [None if value is None else round(value, field.decimal_places) for value in values]
+        if any(value is not None and not abs(value) < limit for value in values):
+            raise ValueError(f"{field.name} has values outside the {field.max_digits}-digit column")
+        return values
+    if isinstance(field, models.DateField):
+        return [None if value is None else value.isoformat() for value in values]
+    if isinstance(field, models.JSONField):
+        return [json.dumps(value) for value in values]
+    return values
+
+
+def _copy_postgresql(connection, table, columns, rows, not_null_text=()):
+    quote = connection.ops.quote_name
+    options = 'FORMAT csv'
+    if not_null_text:
+        options += f", FORCE_NOT_NULL ({', '.join(quote(col) for col in not_null_text)})"
+    sql = f"COPY {quote(table)} ({', '.join(quote(col) for col in columns)}) FROM STDIN WITH ({options})"
+
+    loaded = 0
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        while True:
+            batch = list(islice(rows, COPY_BATCH_ROWS))
+            if not batch:
+                break
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(batch)
+            buffer.seek(0)
+            cursor.copy_expert(sql, buffer)
+            loaded += len(batch)
+    return loaded
+
+
+def _executemany_sqlite(connection, table, columns, rows):
+    quote = connection.ops.quote_name
+    sql = (
+        f"INSERT INTO {quote(table)} ({', '.join(quote(col) for col in columns)}) "
+        f"VALUES ({', '.join(['%s'] * len(columns))})"
+    )
+    rows = list(rows)
+
+    with connection.cursor() as cursor:
+        # PRAGMAs cannot change inside a transaction, so they are only tuned for top-level loads
+        previous = {}
+        if not connection.in_atomic_block:
+            previous = _set_sqlite_pragmas(cursor, SQLITE_PRAGMAS)
+        try:
+            with transaction.atomic(using=connection.alias):
+                cursor.executemany(sql, rows)
+        finally:
+            _set_sqlite_pragmas(cursor, previous)
+    return len(rows)
+
+
+def _set_sqlite_pragmas(cursor, pragmas):
+    """Apply pragmas and return their previous values"""
+    previous = {}
+    for pragma, value in pragmas.items():
+        cursor.execute(f'PRAGMA {pragma}')
+        previous[pragma] = cursor.fetchone()[0]
+        cursor.execute(f'PRAGMA {pragma} = {value}')
+    return previous
@@ -0,0 +1,83 @@
+"""
+Downsampling of ordered (x, y) series for the charts.
+
+A browser gains nothing from more points than a chart has pixels, but dropping points
+evenly hides exactly the outliers a fraud chart is about. downsample keeps two
+complementary selections within the point budget:
+
+- Largest-Triangle-Three-Buckets (LTTB), which keeps the visual shape of the series by
+  picking, per bucket, the point forming the largest triangle with its neighbours;
+- a min/max envelope, the lowest and highest y of each bucket, so no spike is lost.
+
+Both work on numpy arrays and return indices into the series, so callers can pick the
+matching rows of any other column.
+"""
+
+import numpy as np
+
+# Smallest budget split between LTTB and the envelope; smaller ones use LTTB alone
+MIN_POINTS = 10
+
+
+def downsample(x, y, max_points):
+    """Sorted indices of at most max_points points of the series (x ascending).
+
+    Half the budget goes to LTTB and half to the min/max envelope; points picked by both
+    are counted once.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    max_points = max(int(max_points), 0)
+    if len(x) <= max_points:
+        return np.arange(len(x))
+    if max_points < MIN_POINTS:
+        return lttb(x, y, max_points)
+    envelope_buckets = max_points // 4
+    return np.union1d(lttb(x, y, max_points - 2 * envelope_buckets), minmax_envelope(y, envelope_buckets))
+
+
+def lttb(x, y, n_out):
+    """Indices of the n_out points chosen by Largest-Triangle-Three-Buckets.
+
+    The first and last point are always kept; the others are split into n_out - 2
+    buckets of consecutive points. Bucket averages are computed in one pass, then each
+    bucket keeps the point with the largest triangle formed with the point kept in the
+    previous bucket and the average of the next one.
+    """
+    n = len(x)
+    if n_out >= n:
+        return np.arange(n)
+    if n_out < 3:
+        return np.array([0, n - 1])[:max(n_out, 0)]
+
+    # Bucket i holds points edges[i]..edges[i + 1] - 1 (the first and last point excluded)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    sizes = np.diff(edges)
+    next_x = np.append(np.add.reduceat(x[:n - 1], edges[:-1]) / sizes, x[-1])[1:]
+    next_y = np.append(np.add.reduceat(y[:n - 1], edges[:-1]) / sizes, y[-1])[1:]
+
+    selected = np.empty(n_out, dtype=int)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(n_out - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        areas = np.abs(
+            (x[previous] - next_x[bucket]) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (next_y[bucket] - y[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+    return selected
+
+
+def minmax_envelope(y, n_buckets):
+    """Sorted indices of the lowest and highest y in each of n_buckets buckets of consecutive points"""
+    n = len(y)
+    n_buckets = min(n_buckets, n)
+    if n_buckets < 1:
+        return np.arange(0)
+    edges = np.linspace(0, n, n_buckets + 1).astype(int)
+    buckets = np.repeat(np.arange(n_buckets), np.diff(edges))
+    # Sorted by bucket, then by y: each bucket's minimum comes first and its maximum last
+    order = np.lexsort((y, buckets))
+    return np.unique(np.concatenate([order[edges[:-1]], order[edges[1:] - 1]]))
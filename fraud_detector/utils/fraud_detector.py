@@ -1,9 +1,133 @@
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
-import os
+import hashlib
+import json
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import repeat
 from django.conf import settings
 
+from .rules import RuleEvaluator
+
+# Red flag registry - bit position in red_flags_mask -> (indicator, category, message).
+# Bit positions are stored with results, so new flags must only ever be appended.
+RED_FLAG_REGISTRY = [
+    # REPORTING
+    ('delayed_reporting', 'REPORTING', 'Delayed reporting (>30 days)'),
+    ('no_witness', 'REPORTING', 'No witness contacted'),
+    
+    # TIMING
+    ('near_birthday', 'TIMING', 'Claim near birthday'),
+    ('new_employee_30d', 'TIMING', 'New employee (<30 days)'),
+    ('new_employee_90d', 'TIMING', 'Relatively new employee (<90 days)'),
+    ('near_holiday', 'TIMING', 'Claim near holiday'),
+    ('claim_before_termination', 'TIMING', 'Claim shortly before termination'),
+    ('weekend_injury', 'TIMING', 'Weekend injury'),
+    ('unusual_time', 'TIMING', 'Unusual time of injury'),
+    ('summer_claim', 'TIMING', 'Summer claim'),
+    ('monday_morning_claim', 'TIMING', 'Monday morning injury'),
+    ('friday_afternoon_claim', 'TIMING', 'Friday afternoon injury'),
+    ('end_of_month_claim', 'TIMING', 'End of month claim'),
+    ('seasonal_spike', 'TIMING', 'Seasonal spike period'),
+    ('shift_change_injury', 'TIMING', 'Injury during shift change'),
+    ('lunch_break_injury', 'TIMING', 'Lunch break injury'),
+    ('pre_vacation_claim', 'TIMING', 'Claim before vacation'),
+    ('post_holiday_claim', 'TIMING', 'First day back from holiday'),
+    
+    # BEHAVIORAL
+    ('multiple_claims', 'BEHAVIORAL', 'Multiple claims from same person'),
+    ('claim_shopping', 'BEHAVIORAL', 'Multiple treatment facilities'),
+    ('treatment_avoidance', 'BEHAVIORAL', 'Avoiding recommended treatment'),
+    ('doctor_shopping', 'BEHAVIORAL', 'Frequent doctor changes'),
+    ('excessive_treatment', 'BEHAVIORAL', 'Unusually long treatment'),
+    ('quick_settlement', 'BEHAVIORAL', 'Pushing for quick settlement'),
+    ('attorney_immediate', 'BEHAVIORAL', 'Attorney involved immediately'),
+    ('previous_claims_pattern', 'BEHAVIORAL', 'Pattern of suspicious claims'),
+    ('refused_light_duty', 'BEHAVIORAL', 'Refused modified work'),
+    ('no_medical_history', 'BEHAVIORAL', 'No prior medical records'),
+    ('changing_story', 'BEHAVIORAL', 'Inconsistent injury description'),
+    
+    # INJURY
+    ('soft_tissue_injury', 'INJURY', 'Soft tissue injury'),
+    ('suspicious_body_part', 'INJURY', 'Suspicious body part injured'),
+    ('high_claim_rate_location', 'INJURY', 'High claim rate location'),
+    ('injury_at_home', 'INJURY', 'Injury at home address'),
+]
+
+RED_FLAG_BITS = {indicator: bit for bit, (indicator, _, _) in enumerate(RED_FLAG_REGISTRY)}
+RED_FLAG_LABEL_BITS = {f"[{category}] {message}": bit for bit, (_, category, message) in enumerate(RED_FLAG_REGISTRY)}
+
+# Per-claim category count columns -> registry category they count
+FLAG_COUNT_COLUMNS = {
+    'timing_flags_count': 'TIMING',
+    'behavioral_flags_count': 'BEHAVIORAL',
+    'reporting_flags_count': 'REPORTING',
+}
+
+# Rows per block when building the indicator matrix (bounds the float64 temporary)
+SCORING_BLOCK_ROWS = 100000
+
+# Below this many rows a process pool costs more than it saves
+MIN_PARALLEL_ROWS = 20000
+
+# Bump when scoring changes in a way fraud_weights and RED_FLAG_REGISTRY do not show
+# (rules.py logic, score normalization, risk cut-offs) - results are only reused within a version
+RULESET_REVISION = 1
+
+# Columns identifying a claimant for multiple_claims, in order of preference
+CLAIMANT_KEY_COLUMNS = ['Claimant SSN (Masked)', 'Claimant Full Name']
+
+# Columns read by the first streaming pass (see FraudDetector.collect_aggregates)
+AGGREGATE_COLUMNS = ['Claimant SSN (Masked)', 'Claimant Full Name', 'Location Name (Claim Level)', 'Date of Loss']
+
+
+def red_flag_label(bit):
+    """Display label for a registry bit, e.g. '[TIMING] Weekend injury'"""
+    _, category, message = RED_FLAG_REGISTRY[bit]
+    return f"[{category}] {message}"
+
+
+@lru_cache(maxsize=4096)
+def _labels_for_mask(mask):
+    return tuple(red_flag_label(bit) for bit in range(len(RED_FLAG_REGISTRY)) if mask >> bit & 1)
+
+
+def red_flags_from_mask(mask):
+    """Human-readable red flag list for a single red_flags_mask value"""
+    if mask is None or pd.isna(mask):
+        return []
+    return list(_labels_for_mask(int(mask)))
+
+
+def mask_from_red_flags(flags):
+    """red_flags_mask value of a red flag label list (labels outside the registry are ignored)"""
+    mask = 0
+    for flag in flags or []:
+        bit = RED_FLAG_LABEL_BITS.get(flag)
+        if bit is not None:
+            mask |= 1 << bit
+    return mask
+
+
+def decode_red_flags(masks):
+    """Materialize red flag lists for a Series of masks, decoding each distinct mask once"""
+    masks = masks.fillna(0).astype('int64')
+    decoded = {mask: red_flags_from_mask(mask) for mask in masks.unique()}
+    return pd.Series([list(decoded[mask]) for mask in masks], index=masks.index, dtype=object)
+
+
+def red_flag_counts(masks):
+    """Number of claims carrying each red flag, keyed by label and sorted by frequency"""
+    masks = masks.fillna(0).astype('int64').to_numpy()
+    counts = {}
+    for bit in range(len(RED_FLAG_REGISTRY)):
+        count = int(np.count_nonzero(masks >> bit & 1))
+        if count:
+            counts[red_flag_label(bit)] = count
+    return dict(sorted(counts.items(), key=lambda item: item[1], reverse=True))
+
+
 class FraudDetector:
     def __init__(self):
         # Existing weights
@@ -53,30 +177,65 @@ class FraudDetector:
             'high_claim_rate_location': 1.5,
             'injury_at_home': 1.4,
         }
-
         
-    def detect_fraud(self, df):
-        """Main fraud detection method"""
+        self.rule_evaluator = RuleEvaluator()
+        self.rule_costs = {}
+        self._compile_scoring_matrix()
+    
+    def ruleset_version(self):
+        """Identifier of the rules that produce this detector's scores (revision + weights/flags digest)"""
+        rules = json.dumps([self.fraud_weights, RED_FLAG_REGISTRY], sort_keys=True)
+        return f"{RULESET_REVISION}-{hashlib.sha256(rules.encode()).hexdigest()[:12]}"
+    
+    def _compile_scoring_matrix(self):
+        """Compile fraud_weights and flag categories into one indicator x output matrix.
+        
+        Columns of scoring_matrix: [weight, one 0/1 column per FLAG_COUNT_COLUMNS entry, 2**bit].
+        Multiplying the 0/1 indicator matrix by it yields raw scores, category counts and
+        red_flags_mask for every claim at once.
+        """
+        self.indicator_columns = list(RED_FLAG_BITS) + [
+            indicator for indicator in self.fraud_weights if indicator not in RED_FLAG_BITS
+        ]
+        self.weight_vector = np.array([self.fraud_weights.get(indicator, 0.0) for indicator in self.indicator_columns])
+        
+        category_matrix = np.zeros((len(self.indicator_columns), len(FLAG_COUNT_COLUMNS)))
+        bit_values = np.zeros(len(self.indicator_columns))
+        for bit, (_, category, _) in enumerate(RED_FLAG_REGISTRY):
+            for j, count_category in enumerate(FLAG_COUNT_COLUMNS.values()):
+                category_matrix[bit, j] = float(category == count_category)
+            # float64 holds 2**bit sums exactly for the 33 registry bits
+            bit_values[bit] = float(2 ** bit)
+        
+        self.scoring_matrix = np.column_stack([self.weight_vector, category_matrix, bit_values])
+    
+    def detect_fraud(self, df, aggregates=None):
+        """Main fraud detection method.
+        
+        aggregates (from collect_aggregates) supplies the cross-row counts when df is only
+        one chunk of a larger extract; by default they are computed from df itself.
+        """
         print(f"Starting fraud detection with {len(df)} rows and {len(df.columns)} columns")
         df = df.copy()
         
         try:
-            # Add all fraud indicators
-            print("Adding fraud indicators...")
-            df = self._add_fraud_indicators(df)
-            print(f"After fraud indicators: {df.shape}")
+            if aggregates is None:
+                aggregates = self.collect_aggregates([df])
             
-            print("Adding timing patterns...")
-            df = self._add_timing_patterns(df)
-            print(f"After timing patterns: {df.shape}")
+            # Add all fraud indicators (see rules.RULES)
+            print("Evaluating fraud rules...")
+            self.rule_costs = self.rule_evaluator.evaluate(df, aggregates)
+            slowest = sorted(self.rule_costs.items(), key=lambda item: item[1], reverse=True)[:5]
+            print(f"After fraud rules: {df.shape}. Slowest steps: "
+                  + ', '.join(f"{name}={seconds * 1000:.1f}ms" for name, seconds in slowest))
             
-            print("Adding behavioral patterns...")
-            df = self._add_behavioral_patterns(df)
-            print(f"After behavioral patterns: {df.shape}")
+            # Scores, category counts and red flag masks all come from one matrix product
+            print("Scoring indicator matrix...")
+            products, present = self._score_indicator_matrix(df)
             
             # Calculate fraud score - ENSURE this always creates the column
             print("Calculating fraud scores...")
-            df['fraud_score'] = self._calculate_fraud_score(df)
+            df['fraud_score'] = self._calculate_fraud_score(df, products[:, 0], present)
             print(f"Fraud scores calculated. Min: {df['fraud_score'].min()}, Max: {df['fraud_score'].max()}")
             
             # Assign risk levels - ENSURE this always creates the column
@@ -84,18 +243,17 @@ class FraudDetector:
             df['risk_level'] = self._assign_risk_level(df['fraud_score'])
             print(f"Risk levels assigned: {df['risk_level'].value_counts().to_dict()}")
             
-            # Get red flags for each claim - ENSURE this always creates the column
-            print("Getting red flags...")
-            df['red_flags'] = df.apply(self._get_red_flags, axis=1)
-            print(f"Red flags added. Sample: {df['red_flags'].iloc[0] if len(df) > 0 else 'No data'}")
+            # Triggered indicators packed into one bitmask per claim - ENSURE this always creates the column
+            # (lists are materialized later with decode_red_flags, only where a page or export needs them)
+            df['red_flags_mask'] = products[:, -1].astype(np.int64)
+            print(f"Red flags encoded. Sample: {red_flags_from_mask(df['red_flags_mask'].iloc[0]) if len(df) > 0 else 'No data'}")
             
             # Add pattern categories
-            df['timing_flags_count'] = df.apply(self._count_timing_flags, axis=1)
-            df['behavioral_flags_count'] = df.apply(self._count_behavioral_flags, axis=1)
-            df['reporting_flags_count'] = df.apply(self._count_reporting_flags, axis=1)
+            for j, column in enumerate(FLAG_COUNT_COLUMNS):
+                df[column] = products[:, 1 + j].astype(np.int64)
             
             print(f"Fraud detection completed successfully. Final shape: {df.shape}")
-            print(f"Required columns present: fraud_score={df.get('fraud_score') is not None}, risk_level={'risk_level' in df.columns}, red_flags={'red_flags' in df.columns}")
+            print(f"Required columns present: fraud_score={df.get('fraud_score') is not None}, risk_level={'risk_level' in df.columns}, red_flags_mask={'red_flags_mask' in df.columns}")
             
             return df
             
@@ -106,40 +264,127 @@ class FraudDetector:
                 df['fraud_score'] = 0.0
             if 'risk_level' not in df.columns:
                 df['risk_level'] = 'Low'
-            if 'red_flags' not in df.columns:
-                df['red_flags'] = [[] for _ in range(len(df))]
+            if 'red_flags_mask' not in df.columns:
+                df['red_flags_mask'] = 0
             raise e
     
-    def _calculate_fraud_score(self, df):
-        """Calculate fraud score based on weighted indicators"""
-        print("Starting fraud score calculation...")
-        
-        # Initialize score with zeros
-        score = pd.Series(0.0, index=df.index)
-        
-        indicators_found = 0
-        for indicator, weight in self.fraud_weights.items():
-            if indicator in df.columns:
-                try:
-                    # Ensure the column is boolean/numeric
-                    indicator_values = df[indicator].fillna(False).astype(bool).astype(float)
-                    score += indicator_values * weight
-                    indicators_found += 1
-                    print(f"Added indicator '{indicator}' with weight {weight}. Active in {indicator_values.sum()} claims.")
-                except Exception as e:
-                    print(f"Warning: Could not process indicator '{indicator}': {e}")
-                    continue
+    def detect_fraud_parallel(self, df, workers=None):
+        """Score df in partitions across a process pool.
+        
+        The cross-row aggregates are collected from the whole frame and broadcast to every
+        partition, so the result is identical to a single-process detect_fraud(df).
+        """
+        workers = workers or self._configured_workers()
+        if workers <= 1 or len(df) < MIN_PARALLEL_ROWS:
+            return self.detect_fraud(df)
+        
+        print(f"Scoring {len(df)} rows in {workers} partitions...")
+        aggregates = self.collect_aggregates([df])
+        bounds = np.linspace(0, len(df), workers + 1).astype(int)
+        partitions = [df.iloc[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+        
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(self.detect_fraud, partitions, repeat(aggregates)))
+        return pd.concat(results)
+    
+    def detect_fraud_streaming(self, read_chunks, workers=None, aggregates=None):
+        """Out-of-core detection - yields scored chunks so memory stays bounded by the chunk size.
+        
+        read_chunks(usecols) must return a fresh iterable of DataFrames on every call. It is
+        called once with AGGREGATE_COLUMNS for the cheap aggregate pass (skipped when the
+        aggregates are given), then with None to read full chunks for scoring. With more
+        than one worker, up to `workers` chunks are scored concurrently and yielded in file order.
+        """
+        workers = workers or self._configured_workers()
+        
+        if aggregates is None:
+            print("Streaming pass 1: collecting cross-row aggregates...")
+            aggregates = self.collect_aggregates(read_chunks(AGGREGATE_COLUMNS))
+            print(f"Aggregates collected: {len(aggregates['claimant_counts'])} claimants, "
+                  f"{len(aggregates['location_counts'])} locations, {len(aggregates['monthly_counts'])} months")
+        
+        print("Streaming pass 2: scoring chunks...")
+        if workers <= 1:
+            for chunk in read_chunks(None):
+                yield self.detect_fraud(chunk, aggregates=aggregates)
+            return
+        
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = deque()
+            for chunk in read_chunks(None):
+                pending.append(pool.submit(self.detect_fraud, chunk, aggregates))
+                if len(pending) >= workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+    
+    def _configured_workers(self):
+        """Detection worker processes from FRAUD_DETECTION_SETTINGS (default: single process)"""
+        return int(settings.FRAUD_DETECTION_SETTINGS.get('DETECTION_WORKERS', 1))
+    
+    def collect_aggregates(self, chunks):
+        """Accumulate the cross-row counts used by multiple_claims, high_claim_rate_location
+        and seasonal_spike over an iterable of DataFrames.
+        """
+        aggregates = {
+            'claimant_column': None,
+            'claimant_counts': pd.Series(dtype='int64'),
+            'location_counts': pd.Series(dtype='int64'),
+            'monthly_counts': pd.Series(dtype='int64'),
+        }
         
+        for chunk in chunks:
+            claimant_column = self._claimant_key_column(chunk)
+            if claimant_column:
+                aggregates['claimant_column'] = claimant_column
+                aggregates['claimant_counts'] = aggregates['claimant_counts'].add(
+                    chunk[claimant_column].value_counts(), fill_value=0)
+            
+            if 'Location Name (Claim Level)' in chunk.columns:
+                aggregates['location_counts'] = aggregates['location_counts'].add(
+                    chunk['Location Name (Claim Level)'].value_counts(), fill_value=0)
+            
+            if 'Date of Loss' in chunk.columns:
+                months = pd.to_datetime(chunk['Date of Loss'], errors='coerce').dt.month.dropna().astype('int64')
+                aggregates['monthly_counts'] = aggregates['monthly_counts'].add(
+                    months.value_counts(), fill_value=0)
+        
+        for key in ['claimant_counts', 'location_counts', 'monthly_counts']:
+            aggregates[key] = aggregates[key].astype('int64')
+        return aggregates
+    
+    def _score_indicator_matrix(self, df):
+        """Multiply the claims x indicators 0/1 matrix by scoring_matrix.
+        
+        Returns (products, present): products has one row per claim, present marks
+        which indicator columns exist in df.
+        """
+        present = np.array([indicator in df.columns for indicator in self.indicator_columns])
+        products = np.zeros((len(df), self.scoring_matrix.shape[1]))
+        if not present.any():
+            return products, present
+        
+        available = [indicator for indicator in self.indicator_columns if indicator in df.columns]
+        matrix = self.scoring_matrix[present]
+        for start in range(0, len(df), SCORING_BLOCK_ROWS):
+            block = df[available].iloc[start:start + SCORING_BLOCK_ROWS]
+            indicators = block.fillna(False).astype(bool).to_numpy(dtype=np.float64)
+            products[start:start + len(block)] = indicators @ matrix
+        return products, present
+    
+    def _calculate_fraud_score(self, df, raw_score, present):
+        """Normalize weighted indicator sums to a 0-100 fraud score"""
+        print("Starting fraud score calculation...")
+        indicators_found = int(present.sum())
         print(f"Processed {indicators_found} indicators out of {len(self.fraud_weights)} total")
-
         
         # Normalize score to 0-100 scale
         if indicators_found > 0:
-            max_possible = sum(weight for indicator, weight in self.fraud_weights.items() if indicator in df.columns)
+            max_possible = self.weight_vector[present].sum()
             if max_possible > 0:
-                normalized_score = (score / max_possible * 100).round(2)
+                normalized_score = pd.Series(raw_score / max_possible * 100, index=df.index).round(2)
             else:
-                normalized_score = score.round(2)
+                normalized_score = pd.Series(raw_score, index=df.index).round(2)
         else:
             # If no indicators found, assign random scores for testing
             print("Warning: No fraud indicators found. Assigning random scores for testing.")
@@ -173,345 +418,12 @@ class FraudDetector:
         
         return risk_levels
     
-    def _add_fraud_indicators(self, df):
-        """Add various fraud indicator columns"""
-        print("Adding basic fraud indicators...")
-        
-        # Convert date columns
-        date_columns = ['Date of Loss', 'Date Claim Reported to Client', 'Date Of Hire', 'Date of Termination']
-        for col in date_columns:
+    def _claimant_key_column(self, df):
+        """Column identifying a claimant: masked SSN, falling back to full name"""
+        for col in CLAIMANT_KEY_COLUMNS:
             if col in df.columns:
-                df[col] = pd.to_datetime(df[col], errors='coerce')
-        
-        # Initialize all indicators with False to avoid dtype issues
-        default_indicators = [
-            'delayed_reporting', 'near_birthday', 'new_employee_30d', 'new_employee_90d',
-            'multiple_claims', 'soft_tissue_injury', 'no_witness', 'suspicious_body_part',
-            'weekend_injury', 'near_holiday', 'summer_claim', 'claim_before_termination',
-            'high_claim_rate_location', 'unusual_time', 'injury_at_home'
-        ]
-        
-        for indicator in default_indicators:
-            df[indicator] = False
-        
-        # Days to report
-        if 'Date of Loss' in df.columns and 'Date Claim Reported to Client' in df.columns:
-            df['days_to_report'] = (df['Date Claim Reported to Client'] - df['Date of Loss']).dt.days
-            df.loc[df['days_to_report'] > 30, 'delayed_reporting'] = True
-        
-        # New employee indicators
-        if 'Date of Loss' in df.columns and 'Date Of Hire' in df.columns:
-            days_employed = (df['Date of Loss'] - df['Date Of Hire']).dt.days
-            df.loc[days_employed <= 30, 'new_employee_30d'] = True
-            df.loc[days_employed <= 90, 'new_employee_90d'] = True
-        
-        # Near birthday
-        if 'Date of Loss' in df.columns and 'Claimant Date of Birth' in df.columns:
-            df['Claimant Date of Birth'] = pd.to_datetime(df['Claimant Date of Birth'], errors='coerce')
-            for idx in df.index:
-                if pd.notna(df.loc[idx, 'Date of Loss']) and pd.notna(df.loc[idx, 'Claimant Date of Birth']):
-                    df.loc[idx, 'near_birthday'] = self._check_near_birthday(df.loc[idx])
-        
-        # Multiple claims
-        if 'Claimant SSN (Masked)' in df.columns:
-            claim_counts = df.groupby('Claimant SSN (Masked)').size()
-            for ssn, count in claim_counts.items():
-                if count > 1:
-                    df.loc[df['Claimant SSN (Masked)'] == ssn, 'multiple_claims'] = True
-        elif 'Claimant Full Name' in df.columns:
-            # Fallback to name if SSN not available
-            claim_counts = df.groupby('Claimant Full Name').size()
-            for name, count in claim_counts.items():
-                if count > 1:
-                    df.loc[df['Claimant Full Name'] == name, 'multiple_claims'] = True
-        
-        # Soft tissue injury
-        soft_tissue_keywords = ['strain', 'sprain', 'soft tissue', 'back pain', 'neck pain']
-        if 'Injury Type Description' in df.columns:
-            pattern = '|'.join(soft_tissue_keywords)
-            mask = df['Injury Type Description'].str.lower().str.contains(pattern, na=False)
-            df.loc[mask, 'soft_tissue_injury'] = True
-        
-        # No witness
-        if 'Date Witness Contacted' in df.columns:
-            df.loc[df['Date Witness Contacted'].isna(), 'no_witness'] = True
-        else:
-            df['no_witness'] = True  # Default to True if no witness data
-        
-        # Suspicious body parts
-        suspicious_parts = ['back', 'neck', 'soft tissue', 'multiple body parts']
-        if 'Target/Part of Body Description' in df.columns:
-            pattern = '|'.join(suspicious_parts)
-            mask = df['Target/Part of Body Description'].str.lower().str.contains(pattern, na=False)
-            df.loc[mask, 'suspicious_body_part'] = True
-        
-        # Weekend injury
-        if 'Date of Loss' in df.columns:
-            df.loc[df['Date of Loss'].dt.dayofweek.isin([5, 6]), 'weekend_injury'] = True
-        
-        # Near holiday
-        if 'Date of Loss' in df.columns:
-            df['near_holiday'] = self._check_near_holiday(df)
-        
-        # Summer claim
-        if 'Date of Loss' in df.columns:
-            df.loc[df['Date of Loss'].dt.month.isin([6, 7, 8]), 'summer_claim'] = True
-        
-        # Claim before termination
-        if 'Date of Loss' in df.columns and 'Date of Termination' in df.columns:
-            mask = (df['Date of Termination'].notna() & 
-                   ((df['Date of Termination'] - df['Date of Loss']).dt.days <= 30) &
-                   ((df['Date of Termination'] - df['Date of Loss']).dt.days >= 0))
-            df.loc[mask, 'claim_before_termination'] = True
-        
-        # High claim rate location
-        if 'Location Name (Claim Level)' in df.columns:
-            location_counts = df.groupby('Location Name (Claim Level)').size()
-            avg_claims = location_counts.mean()
-            high_claim_locations = location_counts[location_counts > avg_claims * 1.5].index
-            df.loc[df['Location Name (Claim Level)'].isin(high_claim_locations), 'high_claim_rate_location'] = True
-        
-        # Unusual time
-        if 'Event Time' in df.columns:
-            # Convert time to hour if it's a string
-            df['event_hour'] = pd.to_datetime(df['Event Time'], format='%H:%M:%S', errors='coerce').dt.hour
-            mask = (df['event_hour'] < 6) | (df['event_hour'] > 18)
-            df.loc[mask, 'unusual_time'] = True
-        
-        print(f"Added {len(default_indicators)} basic fraud indicators")
-        return df
-    
-    def _add_timing_patterns(self, df):
-        """Add enhanced timing pattern indicators"""
-        print("Adding timing patterns...")
-        
-        # Initialize timing pattern indicators
-        timing_indicators = [
-            'monday_morning_claim', 'friday_afternoon_claim', 'end_of_month_claim',
-            'seasonal_spike', 'shift_change_injury', 'lunch_break_injury',
-            'pre_vacation_claim', 'post_holiday_claim'
-        ]
-        
-        for indicator in timing_indicators:
-            df[indicator] = False
-        
-        # Monday morning claims (weekend injuries reported Monday)
-        if 'Date of Loss' in df.columns:
-            try:
-                if 'Event Time' in df.columns:
-                    df['loss_hour'] = pd.to_datetime(df['Event Time'], format='%H:%M:%S', errors='coerce').dt.hour
-                else:
-                    df['loss_hour'] = 8  # Default to 8 AM if no time data
-                
-                df['loss_day'] = df['Date of Loss'].dt.dayofweek
-                
-                # Monday morning pattern
-                df.loc[(df['loss_day'] == 0) & (df['loss_hour'] < 10), 'monday_morning_claim'] = True
-                
-                # Friday afternoon pattern
-                df.loc[(df['loss_day'] == 4) & (df['loss_hour'] >= 14), 'friday_afternoon_claim'] = True
-                
-                # End of month claims
-                df.loc[df['Date of Loss'].dt.day >= 25, 'end_of_month_claim'] = True
-                
-                # Shift change injuries (assuming shifts at 7, 15, 23)
-                df.loc[df['loss_hour'].isin([6, 7, 8, 14, 15, 16, 22, 23, 0]), 'shift_change_injury'] = True
-                
-                # Lunch break injuries
-                df.loc[df['loss_hour'].isin([11, 12, 13]), 'lunch_break_injury'] = True
-                
-            except Exception as e:
-                print(f"Warning: Could not process timing patterns: {e}")
-        
-        # Seasonal spikes
-        df['seasonal_spike'] = self._check_seasonal_spike(df)
-        
-        # Post-holiday claims
-        df['post_holiday_claim'] = self._check_post_holiday(df)
-        
-        print("Timing patterns added")
-        return df
-    
-    def _add_behavioral_patterns(self, df):
-        """Add behavioral pattern indicators"""
-        print("Adding behavioral patterns...")
-        
-        # Initialize behavioral indicators
-        behavioral_indicators = [
-            'attorney_immediate', 'treatment_avoidance', 'doctor_shopping',
-            'claim_shopping', 'excessive_treatment', 'quick_settlement',
-            'previous_claims_pattern', 'refused_light_duty', 'no_medical_history',
-            'changing_story'
-        ]
-        
-        for indicator in behavioral_indicators:
-            df[indicator] = False
-        
-        # Attorney involvement timing
-        if 'Date Of Attorney Representation' in df.columns and 'Date of Loss' in df.columns:
-            df['Date Of Attorney Representation'] = pd.to_datetime(df['Date Of Attorney Representation'], errors='coerce')
-            days_to_attorney = (df['Date Of Attorney Representation'] - df['Date of Loss']).dt.days
-            df.loc[(days_to_attorney >= 0) & (days_to_attorney <= 1), 'attorney_immediate'] = True
-        
-        # Treatment patterns
-        if 'Surgery Flag' in df.columns:
-            df.loc[(df['Surgery Flag'] == 0) & df['suspicious_body_part'], 'treatment_avoidance'] = True
-        
-        # Excessive treatment duration
-        if 'Date Claim Closed' in df.columns and 'Date of Loss' in df.columns:
-            df['Date Claim Closed'] = pd.to_datetime(df['Date Claim Closed'], errors='coerce')
-            treatment_duration = (df['Date Claim Closed'] - df['Date of Loss']).dt.days
-            df.loc[treatment_duration > 365, 'excessive_treatment'] = True
-        
-        # Quick settlement seeking
-        if 'days_to_report' in df.columns:
-            df.loc[df['days_to_report'] < 2, 'quick_settlement'] = True
-        
-        print("Behavioral patterns added")
-        return df
-    
-    def _check_near_birthday(self, row):
-        """Check if claim is near birthday"""
-        try:
-            loss_day = row['Date of Loss'].timetuple().tm_yday
-            birth_day = row['Claimant Date of Birth'].timetuple().tm_yday
-            diff = abs(loss_day - birth_day)
-            return diff <= 30 or diff >= 335
-        except:
-            return False
-    
-    def _check_near_holiday(self, df):
-        """Check if claims are near major holidays"""
-        holidays = [
-            (1, 1),   # New Year's Day
-            (7, 4),   # Independence Day
-            (12, 25), # Christmas
-            (11, 24), # Thanksgiving (approximate)
-        ]
-        
-        near_holiday = pd.Series(False, index=df.index)
-        
-        if 'Date of Loss' in df.columns:
-            for month, day in holidays:
-                holiday_match = (
-                    (df['Date of Loss'].dt.month == month) & 
-                    (abs(df['Date of Loss'].dt.day - day) <= 7)
-                )
-                near_holiday = near_holiday | holiday_match
-        
-        return near_holiday
-    
-    def _check_post_holiday(self, df):
-        """Check if claim is first weekday after a holiday"""
-        post_holiday = pd.Series(False, index=df.index)
-        
-        if 'Date of Loss' in df.columns:
-            # Simple implementation - check if Monday after weekend
-            is_monday = df['Date of Loss'].dt.dayofweek == 0
-            post_holiday = is_monday
-        
-        return post_holiday
-    
-    def _check_seasonal_spike(self, df):
-        """Check for unusual seasonal patterns"""
-        if 'Date of Loss' not in df.columns:
-            return pd.Series(False, index=df.index)
-        
-        try:
-            # Calculate monthly claim rates
-            monthly_counts = df.groupby(df['Date of Loss'].dt.month).size()
-            avg_monthly = monthly_counts.mean()
-            std_monthly = monthly_counts.std()
-            
-            # Flag months with unusually high claims
-            spike_months = monthly_counts[monthly_counts > avg_monthly + 2 * std_monthly].index
-            
-            return df['Date of Loss'].dt.month.isin(spike_months)
-        except:
-            return pd.Series(False, index=df.index)
-    
-    def _count_timing_flags(self, row):
-        """Count timing-related flags"""
-        timing_flags = [
-            'near_birthday', 'new_employee_30d', 'new_employee_90d', 
-            'near_holiday', 'claim_before_termination', 'weekend_injury',
-            'unusual_time', 'summer_claim', 'monday_morning_claim',
-            'friday_afternoon_claim', 'end_of_month_claim', 'seasonal_spike',
-            'shift_change_injury', 'lunch_break_injury', 'pre_vacation_claim',
-            'post_holiday_claim'
-        ]
-        return sum(row.get(flag, False) for flag in timing_flags)
-    
-    def _count_behavioral_flags(self, row):
-        """Count behavioral flags"""
-        behavioral_flags = [
-            'multiple_claims', 'claim_shopping', 'treatment_avoidance',
-            'doctor_shopping', 'excessive_treatment', 'quick_settlement',
-            'attorney_immediate', 'previous_claims_pattern', 'refused_light_duty',
-            'no_medical_history', 'changing_story'
-        ]
-        return sum(row.get(flag, False) for flag in behavioral_flags)
-    
-    def _count_reporting_flags(self, row):
-        """Count reporting flags"""
-        reporting_flags = ['delayed_reporting', 'no_witness']
-        return sum(row.get(flag, False) for flag in reporting_flags)
-    
-    def _get_red_flags(self, row):
-        """Get list of triggered red flags for a claim"""
-        red_flags = []
-        
-        # Categorized flag messages
-        flag_categories = {
-            'REPORTING': {
-                'delayed_reporting': 'Delayed reporting (>30 days)',
-                'no_witness': 'No witness contacted',
-            },
-            'TIMING': {
-                'near_birthday': 'Claim near birthday',
-                'new_employee_30d': 'New employee (<30 days)',
-                'new_employee_90d': 'Relatively new employee (<90 days)',
-                'near_holiday': 'Claim near holiday',
-                'claim_before_termination': 'Claim shortly before termination',
-                'weekend_injury': 'Weekend injury',
-                'unusual_time': 'Unusual time of injury',
-                'summer_claim': 'Summer claim',
-                'monday_morning_claim': 'Monday morning injury',
-                'friday_afternoon_claim': 'Friday afternoon injury',
-                'end_of_month_claim': 'End of month claim',
-                'seasonal_spike': 'Seasonal spike period',
-                'shift_change_injury': 'Injury during shift change',
-                'lunch_break_injury': 'Lunch break injury',
-                'pre_vacation_claim': 'Claim before vacation',
-                'post_holiday_claim': 'First day back from holiday',
-            },
-            'BEHAVIORAL': {
-                'multiple_claims': 'Multiple claims from same person',
-                'claim_shopping': 'Multiple treatment facilities',
-                'treatment_avoidance': 'Avoiding recommended treatment',
-                'doctor_shopping': 'Frequent doctor changes',
-                'excessive_treatment': 'Unusually long treatment',
-                'quick_settlement': 'Pushing for quick settlement',
-                'attorney_immediate': 'Attorney involved immediately',
-                'previous_claims_pattern': 'Pattern of suspicious claims',
-                'refused_light_duty': 'Refused modified work',
-                'no_medical_history': 'No prior medical records',
-                'changing_story': 'Inconsistent injury description',
-            },
-            'INJURY': {
-                'soft_tissue_injury': 'Soft tissue injury',
-                'suspicious_body_part': 'Suspicious body part injured',
-                'high_claim_rate_location': 'High claim rate location',
-                'injury_at_home': 'Injury at home address',
-            }
-        }
-        
-        for category, flags in flag_categories.items():
-            for flag, message in flags.items():
-                if row.get(flag, False):
-                    red_flags.append(f"[{category}] {message}")
-        
-        return red_flags
+                return col
+        return None
     
     def generate_summary_stats(self, df):
         """Generate summary statistics"""
@@ -528,14 +440,8 @@ class FraudDetector:
     
     def _get_top_red_flags(self, df):
         """Get most common red flags"""
-        all_flags = []
-        for flags in df['red_flags']:
-            if isinstance(flags, list):
-                all_flags.extend(flags)
-        
-        from collections import Counter
-        flag_counts = Counter(all_flags)
-        return dict(flag_counts.most_common(5))
+        flag_counts = red_flag_counts(df['red_flags_mask'])
+        return dict(list(flag_counts.items())[:5])
     
     def _get_monthly_trend(self, df):
         """Get monthly claim trends"""
@@ -0,0 +1,520 @@
+"""
+CSV ingest for uploaded claim extracts.
+
+Only the columns read by the detector rules, the streaming aggregates and the
+Claim field mappings are loaded for detection; the pipeline reads the others too
+(passthrough=True), sets them aside while scoring and puts them back for the
+export. Dates are parsed, claimant/location keys pinned to strings and
+low-cardinality descriptions stored as categoricals at read time.
+
+FRAUD_DETECTION_SETTINGS['CSV_ENGINE'] = 'pyarrow' switches to multithreaded
+Arrow CSV parsing with Arrow-backed string and date columns; the pandas C
+reader is used when pyarrow is not installed.
+
+Excel workbooks (.xlsx) are read from their first worksheet in openpyxl's
+read-only mode, row by row, so only the current chunk is held in memory.
+Compressed CSVs (.csv.gz, .zip, .zst) are decompressed as they are parsed and
+never expanded on disk.
+"""
+
+import datetime
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+from .fraud_detector import AGGREGATE_COLUMNS
+from .rules import RuleEvaluator
+
+try:
+    import pyarrow as pa
+    from pyarrow import csv as pa_csv
+except ImportError:  # optional - only needed for CSV_ENGINE = 'pyarrow'
+    pa = None
+    pa_csv = None
+
+try:
+    import openpyxl
+except ImportError:  # only needed for .xlsx uploads
+    openpyxl = None
+
+# Bytes per Arrow CSV block (parsed in parallel, and the unit of streaming reads)
+ARROW_BLOCK_SIZE = 16 * 1024 * 1024
+
+# Uploads read as Excel workbooks rather than CSV
+EXCEL_EXTENSIONS = ('.xlsx',)
+
+# Compressed CSV uploads (extension -> codec), decompressed while reading
+COMPRESSION_EXTENSIONS = {
+    '.gz': 'gzip',
+    '.zip': 'zip',  # a single CSV per archive
+    '.zst': 'zstd',  # needs the zstandard package
+}
+
+# File names the upload form accepts
+UPLOAD_EXTENSIONS = ('.csv', '.csv.gz', '.zip', '.zst') + EXCEL_EXTENSIONS
+
+# Date formats Arrow tries while inferring column types (ISO-8601 first)
+ARROW_TIMESTAMP_PARSERS = ['%Y-%m-%d', '%m/%d/%Y', '%m/%d/%Y %H:%M:%S', '%Y-%m-%d %H:%M:%S']
+
+# Column mapping for different possible column names (Claim field -> source columns, in priority order)
+CLAIM_COLUMN_MAPPINGS = {
+    'claim_number': ['Claim Number', 'Event Number', 'Claim ID'],
+    'claimant_name': ['Claimant Full Name', 'Claimant Name', 'Employee Name'],
+    'date_of_loss': ['Date of Loss', 'Loss Date', 'Incident Date'],
+    'injury_type': ['Injury Type Description', 'Type of Injury', 'Injury Description'],
+    'body_part': ['Target/Part of Body Description', 'SCMS Target/Part of Body Description', 'Body Part'],
+    'date_reported': ['Date Claim Reported to Client', 'Report Date', 'Reported Date'],
+    'date_of_hire': ['Date Of Hire', 'Hire Date', 'Employment Date'],
+    'claimant_dob': ['Claimant Date of Birth', 'Date of Birth', 'DOB'],
+    'state': ['State', 'Claim State', 'Location State', 'Structure Level Name 01'],
+    'city': ['City', 'Claim City', 'Location City'],
+    'zip_code': ['Zip Code', 'ZIP', 'Postal Code'],
+    'job_title': ['Job Title', 'Position', 'Job Classification'],
+    'department': ['Department', 'Division', 'Work Unit'],
+    'attorney_involved': ['Date Of Attorney Representation'],
+    'medical_treatment': ['Medical Treatment', 'Treatment Type'],
+    'witness_available': ['Date Witness Contacted']
+}
+
+# Amount columns to try (header names are normalized, see normalize_header)
+AMOUNT_COLUMNS = [
+    'Claim Incurred - Total', 'Claim Paid - Total',
+    'Total Incurred', 'Total Paid', 'Claim Amount'
+]
+
+MEDICAL_COST_COLUMNS = [
+    'Claim Incurred - Medical', 'Claim Paid - Medical',
+    'Medical Incurred', 'Medical Paid'
+]
+
+INDEMNITY_COST_COLUMNS = [
+    'Claim Incurred - Ind/Loss', 'Claim Paid - Ind/Loss',
+    'Indemnity Incurred', 'Indemnity Paid'
+]
+
+LEGAL_COST_COLUMNS = [
+    'Claim Incurred - Legal', 'Claim Paid - Legal',
+    'Legal Incurred', 'Legal Paid'
+]
+
+# Columns that might contain currency/numeric data - parsed to float64 while reading
+POTENTIAL_NUMERIC_COLUMNS = [
+    'Claim Incurred - Total', 'Claim Paid - Total', 'Claim Future Reserve - Total',
+    'Claim Incurred - Medical', 'Claim Paid - Medical', 'Claim Future Reserve - Medical',
+    'Claim Incurred - Ind/Loss', 'Claim Paid - Ind/Loss', 'Claim Future Reserve - Ind/Loss',
+    'Claim Incurred - Expense', 'Claim Paid - Expense', 'Claim Future Reserve - Expense',
+    'Claim Incurred - Legal', 'Claim Paid - Legal', 'Claim Future Reserve - Legal',
+    'Pre Injury AWW', 'Wage Base', 'Weekly Wage', 'Current Wage',
+    'Deductible', 'Policy Deductible', 'Claim Amount',
+    'Claim Recovery - Total', 'days_to_report'
+]
+
+# Stripped from currency values before numeric conversion
+CURRENCY_NOISE = r'[$,\s]'
+
+# Dash variants carrier exports use in headers (en dash, em dash, minus sign)
+HEADER_DASHES = str.maketrans({'\u2013': '-', '\u2014': '-', '\u2212': '-'})
+
+# Parsed to datetime64 while reading (unparseable columns are left as text for the rules to coerce)
+DATE_COLUMNS = [
+    'Date of Loss', 'Loss Date', 'Incident Date',
+    'Date Claim Reported to Client', 'Report Date', 'Reported Date',
+    'Date Of Hire', 'Hire Date', 'Employment Date',
+    'Claimant Date of Birth', 'Date of Birth', 'DOB',
+    'Date of Termination', 'Date Of Attorney Representation', 'Date Claim Closed',
+]
+
+# Claimant/location keys are read as strings so every chunk groups them identically
+KEY_COLUMN_DTYPES = {
+    'Claimant SSN (Masked)': str,
+    'Claimant Full Name': str,
+    'Location Name (Claim Level)': str,
+}
+
+# Mixes column hashes into one row hash (see row_hashes)
+ROW_HASH_MULTIPLIER = np.uint64(1000003)
+
+# Bumped whenever row_hashes changes, so row indexes with older hashes are not matched against
+ROW_HASH_VERSION = 2
+
+# Low-cardinality descriptions stored as categoricals (one code per row instead of a string)
+CATEGORICAL_COLUMNS = [
+    'Injury Type Description', 'Type of Injury', 'Injury Description',
+    'Target/Part of Body Description', 'SCMS Target/Part of Body Description', 'Body Part',
+    'State', 'Claim State', 'Location State', 'Structure Level Name 01',
+    'City', 'Claim City', 'Location City',
+    'Job Title', 'Position', 'Job Classification',
+    'Department', 'Division', 'Work Unit',
+    'Medical Treatment', 'Treatment Type',
+]
+
+
+def normalize_header(name):
+    """Canonical column name - dash variants collapsed to '-' and whitespace runs to one space"""
+    return ' '.join(str(name).translate(HEADER_DASHES).split())
+
+
+def is_excel(path):
+    """True if path is an Excel workbook (by extension)"""
+    return str(path).lower().endswith(EXCEL_EXTENSIONS)
+
+
+def compression_of(path):
+    """Codec a CSV upload is compressed with, or None"""
+    for extension, codec in COMPRESSION_EXTENSIONS.items():
+        if str(path).lower().endswith(extension):
+            return codec
+    return None
+
+
+def read_header(path):
+    """Column names of a CSV or workbook without reading any rows"""
+    if is_excel(path):
+        workbook = _open_workbook(path)
+        try:
+            return _excel_header(next(workbook.worksheets[0].iter_rows(max_row=1, values_only=True), ()))
+        finally:
+            workbook.close()
+    return list(pd.read_csv(path, nrows=0).columns)
+
+
+def needed_columns():
+    """Every source column the pipeline can read, in no particular order"""
+    columns = set(RuleEvaluator().required_columns()) | set(AGGREGATE_COLUMNS)
+    for source_columns in CLAIM_COLUMN_MAPPINGS.values():
+        columns.update(source_columns)
+    for amount_columns in [AMOUNT_COLUMNS, MEDICAL_COST_COLUMNS, INDEMNITY_COST_COLUMNS, LEGAL_COST_COLUMNS]:
+        columns.update(amount_columns)
+    return columns
+
+
+def resolve_columns(header, usecols=None, passthrough=False):
+    """Map of header column -> normalized name for the columns to load, in file order.
+    
+    Loads the pipeline's needed columns, optionally narrowed to usecols. When two
+    header variants normalize to the same name only the first is loaded.
+    With passthrough, the passthrough_columns are loaded too, under their own names.
+    """
+    wanted = needed_columns()
+    if usecols is not None:
+        wanted &= set(usecols)
+    
+    columns = {}
+    for col in header:
+        name = normalize_header(col)
+        if name in wanted and name not in columns.values():
+            columns[col] = name
+    if passthrough:
+        extra = set(passthrough_columns(header))
+        columns = {col: columns.get(col, col) for col in header if col in columns or col in extra}
+    return columns
+
+
+def passthrough_columns(header):
+    """Header columns the pipeline does not read, in file order - only carried through to the export"""
+    loaded = resolve_columns(header)
+    return [col for col in header if col not in loaded and col not in loaded.values()]
+
+
+def split_passthrough(df, extra_columns):
+    """df without the extra_columns (the frame to score), and those columns set aside"""
+    extra_columns = [col for col in extra_columns if col in df.columns]
+    return df.drop(columns=extra_columns), df[extra_columns]
+
+
+def join_passthrough(scored, extra, source_columns):
+    """scored with its rows' set-aside columns put back, the source columns first and in file order"""
+    df = scored.join(extra[[col for col in extra.columns if col not in scored.columns]])
+    source = [col for col in source_columns if col in df.columns]
+    return df[source + [col for col in df.columns if col not in set(source)]]
+
+
+def parse_currency(series):
+    """Parse a currency/number column to float64 in one vectorized pass.
+    
+    Returns the parsed column and the number of non-blank values that were not numbers.
+    Columns the reader already parsed as numbers are returned unchanged.
+    """
+    if not pd.api.types.is_string_dtype(series.dtype):
+        return series, 0
+    
+    text = series.astype('string[pyarrow]' if pa is not None else 'string')
+    text = text.str.replace(CURRENCY_NOISE, '', regex=True)
+    values = pd.to_numeric(text, errors='coerce')
+    malformed = int((values.isna() & text.fillna('').ne('')).sum())
+    return values.astype('float64'), malformed
+
+
+def parse_currency_columns(df, malformed_counts=None):
+    """Parse the POTENTIAL_NUMERIC_COLUMNS present in df, adding malformed values per column to malformed_counts"""
+    for col in POTENTIAL_NUMERIC_COLUMNS:
+        if col in df.columns:
+            df[col], malformed = parse_currency(df[col])
+            if malformed and malformed_counts is not None:
+                malformed_counts[col] = malformed_counts.get(col, 0) + malformed
+    return df
+
+
+def read_claims_csv(path, usecols=None, chunksize=None, engine=None, malformed_counts=None, passthrough=False):
+    """Read an uploaded claims CSV projected to the needed columns, optionally in chunks.
+    
+    Headers are normalized and currency columns parsed to float64 as each frame is read;
+    values that are not numbers become NaN and are counted per column in malformed_counts.
+    engine is 'c' or 'pyarrow' (default: FRAUD_DETECTION_SETTINGS['CSV_ENGINE']).
+    Excel workbooks are read with openpyxl and zip archives with the C engine,
+    whatever the engine asked for. passthrough=True loads every column, for reads whose
+    rows are exported (see resolve_columns).
+    """
+    columns = resolve_columns(read_header(path), usecols, passthrough)
+    engine = resolve_engine(engine, path)
+    
+    if engine == 'openpyxl':
+        chunks = _iter_excel_chunks(path, columns, chunksize)
+        if not chunksize:
+            df = next(chunks)
+    elif engine == 'pyarrow':
+        if chunksize:
+            chunks = _iter_arrow_chunks(path, columns, chunksize)
+        else:
+            column_types = _arrow_column_types(path, columns)
+            df = _arrow_to_pandas(pa_csv.read_csv(path, **_arrow_options(columns, column_types)))
+    else:
+        if chunksize:
+            chunks = _read_csv_pandas(path, columns, chunksize)
+        else:
+            df = _read_csv_pandas(path, columns)
+    
+    if chunksize:
+        return (_finish_frame(chunk, columns, malformed_counts) for chunk in chunks)
+    return _finish_frame(df, columns, malformed_counts)
+
+
+def resolve_engine(engine=None, path=None):
+    """Engine read_claims_csv will use for engine (default: the CSV_ENGINE setting) and the file at path"""
+    if path is not None and is_excel(path):
+        return 'openpyxl'
+    engine = engine or settings.FRAUD_DETECTION_SETTINGS.get('CSV_ENGINE', 'c')
+    if engine == 'pyarrow' and path is not None and compression_of(path) == 'zip':
+        return 'c'  # Arrow only decompresses single-stream codecs
+    if engine == 'pyarrow' and pa_csv is None:
+        print("Warning: pyarrow is not installed - falling back to the C CSV engine")
+        return 'c'
+    return engine
+
+
+def row_hashes(df):
+    """64-bit hash of each row's values (int64 Series), used to find unchanged claims between extracts.
+    
+    Hashes are stable across chunk boundaries and dtype variations (int vs float,
+    categorical vs string, datetime64 vs Arrow dates), so rows read by the C and
+    Arrow engines hash alike.
+    """
+    combined = np.zeros(len(df), dtype='uint64')
+    with np.errstate(over='ignore'):
+        for col in df.columns:
+            combined = combined * ROW_HASH_MULTIPLIER ^ _column_hash(df[col])
+    return pd.Series(combined.view('int64'), index=df.index)
+
+
+def _column_hash(values):
+    if pd.api.types.is_datetime64_any_dtype(values.dtype):
+        # datetime64 and Arrow date/timestamp columns hash as nanoseconds since the epoch
+        return pd.util.hash_array(values.astype('datetime64[ns]').to_numpy().view('int64'))
+    if pd.api.types.is_numeric_dtype(values.dtype) and not pd.api.types.is_bool_dtype(values.dtype):
+        return pd.util.hash_array(values.to_numpy(dtype='float64', na_value=np.nan))
+    # Strings and categoricals: hash each distinct value once
+    codes, uniques = pd.factorize(values)
+    hashed = pd.util.hash_array(np.append(np.asarray(uniques, dtype=object), None))
+    return hashed[codes]  # code -1 (missing) picks the trailing None
+
+
+def _finish_frame(df, columns, malformed_counts):
+    df = df.rename(columns=columns)
+    return parse_currency_columns(df, malformed_counts)
+
+
+def _read_csv_pandas(path, columns, chunksize=None, skiprows=None):
+    dtypes = {col: KEY_COLUMN_DTYPES[name] for col, name in columns.items() if name in KEY_COLUMN_DTYPES}
+    dtypes.update({col: 'category' for col, name in columns.items() if name in CATEGORICAL_COLUMNS})
+    parse_dates = [col for col, name in columns.items() if name in DATE_COLUMNS]
+    
+    return pd.read_csv(
+        path,
+        thousands=',',
+        low_memory=False,
+        usecols=list(columns),
+        dtype=dtypes,
+        parse_dates=parse_dates,
+        chunksize=chunksize,
+        skiprows=skiprows,
+    )
+
+
+def _arrow_options(columns, column_types=None):
+    key_types = {col: pa.string() for col, name in columns.items() if name in KEY_COLUMN_DTYPES}
+    return {
+        'read_options': pa_csv.ReadOptions(use_threads=True, block_size=ARROW_BLOCK_SIZE),
+        'convert_options': pa_csv.ConvertOptions(
+            include_columns=list(columns),
+            column_types=dict(column_types or {}, **key_types),
+            timestamp_parsers=ARROW_TIMESTAMP_PARSERS,
+            strings_can_be_null=True,
+        ),
+    }
+
+
+def _arrow_column_types(path, columns, chunked=False):
+    """Column types for an Arrow read of path, from the schema Arrow infers on its first block.
+    
+    Dates outside DATE_COLUMNS stay text, as the C reader leaves them. For chunked reads
+    all-empty columns are widened to strings and integers to floats.
+    """
+    column_types = {}
+    with pa_csv.open_csv(path, **_arrow_options(columns)) as reader:
+        for field in reader.schema:
+            if pa.types.is_date(field.type) or pa.types.is_timestamp(field.type):
+                if columns[field.name] not in DATE_COLUMNS:
+                    column_types[field.name] = pa.string()
+            elif chunked and pa.types.is_null(field.type):
+                column_types[field.name] = pa.string()
+            elif chunked and pa.types.is_integer(field.type):
+                column_types[field.name] = pa.float64()
+    return column_types
+
+
+def _arrow_dtype(arrow_type):
+    """Keep strings and dates Arrow-backed; numbers convert to regular NumPy columns"""
+    if pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type) or pa.types.is_temporal(arrow_type):
+        return pd.ArrowDtype(arrow_type)
+    return None
+
+
+def _arrow_to_pandas(table, start=0):
+    # Time-of-day columns stay text, as the C reader leaves them
+    for i, field in enumerate(table.schema):
+        if pa.types.is_time(field.type):
+            table = table.set_column(i, field.name, table.column(i).cast(pa.string()))
+    df = table.to_pandas(types_mapper=_arrow_dtype)
+    df.index = pd.RangeIndex(start, start + len(df))
+    return df
+
+
+def _iter_arrow_chunks(path, columns, chunksize):
+    """Stream the CSV block by block and yield DataFrames of chunksize rows.
+    
+    The block schema is inferred from the first block (see _arrow_column_types). If a
+    later block still does not fit that schema, the remaining rows are read with the
+    pandas C reader.
+    """
+    column_types = _arrow_column_types(path, columns, chunked=True)
+    rows_read = 0
+    pending = []
+    pending_rows = 0
+    try:
+        with pa_csv.open_csv(path, **_arrow_options(columns, column_types)) as reader:
+            for batch in reader:
+                pending.append(batch)
+                pending_rows += batch.num_rows
+                while pending_rows >= chunksize:
+                    table = pa.Table.from_batches(pending)
+                    yield _arrow_to_pandas(table.slice(0, chunksize), rows_read)
+                    rows_read += chunksize
+                    remainder = table.slice(chunksize)
+                    pending = remainder.to_batches()
+                    pending_rows = remainder.num_rows
+        if pending_rows:
+            yield _arrow_to_pandas(pa.Table.from_batches(pending), rows_read)
+    except pa.ArrowInvalid as e:
+        print(f"Warning: Arrow CSV conversion failed after {rows_read} rows ({e}) - continuing with the C engine")
+        for chunk in _read_csv_pandas(path, columns, chunksize, skiprows=range(1, rows_read + 1)):
+            chunk.index = pd.RangeIndex(rows_read, rows_read + len(chunk))
+            rows_read += len(chunk)
+            yield chunk
+
+
+def _open_workbook(path):
+    if openpyxl is None:
+        raise ImportError("openpyxl is required to read Excel uploads")
+    return openpyxl.load_workbook(path, read_only=True, data_only=True)
+
+
+def _excel_header(cells):
+    # Named like pandas names the columns of a CSV header
+    names = []
+    seen = {}
+    for i, cell in enumerate(cells):
+        name = f"Unnamed: {i}" if cell is None or cell == '' else str(cell)
+        names.append(f"{name}.{seen[name]}" if name in seen else name)
+        seen[name] = seen.get(name, 0) + 1
+    return names
+
+
+def _iter_excel_chunks(path, columns, chunksize=None):
+    """Stream the first worksheet row by row and yield DataFrames of chunksize rows (one frame when None).
+    
+    Blank rows are skipped and the columns typed as the C reader types them.
+    """
+    workbook = _open_workbook(path)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = _excel_header(next(rows, ()))
+        positions = [i for i, col in enumerate(header) if col in columns]
+        names = [header[i] for i in positions]
+        
+        rows_read = 0
+        pending = []
+        for row in rows:
+            if all(value is None or value == '' for value in row):
+                continue
+            pending.append(tuple(row[i] if i < len(row) else None for i in positions))
+            if len(pending) == chunksize:
+                yield _excel_frame(pending, names, columns, rows_read)
+                rows_read += len(pending)
+                pending = []
+        if pending or not chunksize:
+            yield _excel_frame(pending, names, columns, rows_read)
+    finally:
+        workbook.close()
+
+
+def _excel_frame(rows, names, columns, start):
+    df = pd.DataFrame.from_records(rows, columns=names, nrows=len(rows))
+    df.index = pd.RangeIndex(start, start + len(df))
+    for col in names:
+        name = columns[col]
+        if name in KEY_COLUMN_DTYPES:
+            df[col] = _excel_text(df[col])
+        elif name in CATEGORICAL_COLUMNS:
+            df[col] = _excel_text(df[col]).astype('category')
+        elif name in DATE_COLUMNS:
+            df[col] = _excel_dates(df[col])
+        else:
+            df[col] = _excel_values(df[col])
+    return df
+
+
+def _excel_text(values):
+    """Cells as strings, with blanks missing"""
+    text = values.map(lambda value: value if value is None or isinstance(value, str) else str(value))
+    return text.where(text.notna() & text.ne(''), np.nan).astype(object)
+
+
+def _excel_dates(values):
+    # Date cells and date text parse alike; unparseable columns stay text, as with parse_dates
+    text = _excel_text(values)
+    try:
+        return pd.to_datetime(text)
+    except (ValueError, TypeError):
+        return text
+
+
+def _excel_values(values):
+    """Numbers stay numbers, times of day become text and blank strings missing"""
+    if values.dtype != object:
+        return values
+    cells = values.map(lambda value: str(value) if isinstance(value, datetime.time)
+                       else None if isinstance(value, str) and value == '' else value)
+    if cells.isna().all():
+        return cells.astype('float64')
+    return cells.infer_objects()
@@ -0,0 +1,401 @@
+"""
+Declarative fraud indicator rules.
+
+Every indicator is a Rule that names the raw columns, derived features and other
+rules it reads. RuleEvaluator resolves those names into a dependency graph,
+computes each derived feature at most once, falls back to the rule's default
+when an input column is missing and records how long each step took.
+
+Compute functions receive (values, aggregates): values maps each declared input
+to its Series, aggregates is the dict built by FraudDetector.collect_aggregates.
+They are plain module-level functions so detectors stay picklable for the
+process pool.
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+
+
+class Feature:
+    """Derived intermediate shared between rules (parsed dates, event hour, ...).
+
+    column: also store the result in df under this name (kept in the CSV export).
+    If the inputs are missing but df already has that column, the raw column is used.
+    """
+
+    def __init__(self, name, inputs, compute, optional_inputs=(), column=None):
+        self.name = name
+        self.inputs = list(inputs)
+        self.optional_inputs = list(optional_inputs)
+        self.compute = compute
+        self.column = column
+
+
+class Rule:
+    """Boolean fraud indicator written to df[name].
+
+    Rules without a compute function are placeholders that always hold `default`.
+    """
+
+    def __init__(self, name, inputs=(), compute=None, default=False):
+        self.name = name
+        self.inputs = list(inputs)
+        self.compute = compute
+        self.default = default
+
+
+# ---------------------------------------------------------------------------
+# Derived features
+# ---------------------------------------------------------------------------
+
+def _parse_date(values, aggregates):
+    (column,) = values.values()
+    return pd.to_datetime(column, errors='coerce')
+
+
+def _days_to_report(values, aggregates):
+    return (values['reported_date'] - values['loss_date']).dt.days
+
+
+def _days_employed(values, aggregates):
+    return (values['loss_date'] - values['hire_date']).dt.days
+
+
+def _loss_day(values, aggregates):
+    return values['loss_date'].dt.dayofweek
+
+
+def _loss_month(values, aggregates):
+    return values['loss_date'].dt.month
+
+
+def _event_hour(values, aggregates):
+    return pd.to_datetime(values['Event Time'], format='%H:%M:%S', errors='coerce').dt.hour
+
+
+def _loss_hour(values, aggregates):
+    if 'event_hour' in values:
+        return values['event_hour']
+    return pd.Series(8, index=values['loss_date'].index)  # Default to 8 AM if no time data
+
+
+def _claimant_claim_count(values, aggregates):
+    claimant_column = aggregates['claimant_column']
+    if claimant_column not in values:
+        return None
+    claim_counts = values[claimant_column].map(aggregates['claimant_counts'])
+    return claim_counts.fillna(0).astype('int64')
+
+
+# ---------------------------------------------------------------------------
+# Indicator rules
+# ---------------------------------------------------------------------------
+
+def _keyword_match(series, keywords):
+    return series.str.lower().str.contains('|'.join(keywords), na=False)
+
+
+def delayed_reporting(values, aggregates):
+    return values['days_to_report'] > 30
+
+
+def near_birthday(values, aggregates):
+    """Within 30 days of the claimant's birthday, wrapping across the year boundary"""
+    # Day-of-year arrays; missing dates become NaN and never compare True
+    loss_day = values['loss_date'].dt.dayofyear.to_numpy(dtype='float64', na_value=np.nan)
+    birth_day = values['birth_date'].dt.dayofyear.to_numpy(dtype='float64', na_value=np.nan)
+    diff = np.abs(loss_day - birth_day)
+
+    # diff >= 335 catches birthdays across the year boundary (e.g. Dec 20 vs Jan 5)
+    return pd.Series((diff <= 30) | (diff >= 335), index=values['loss_date'].index)
+
+
+def new_employee_30d(values, aggregates):
+    return values['days_employed'] <= 30
+
+
+def new_employee_90d(values, aggregates):
+    return values['days_employed'] <= 90
+
+
+def multiple_claims(values, aggregates):
+    return values['claimant_claim_count'] > 1
+
+
+def soft_tissue_injury(values, aggregates):
+    return _keyword_match(values['Injury Type Description'],
+                          ['strain', 'sprain', 'soft tissue', 'back pain', 'neck pain'])
+
+
+def no_witness(values, aggregates):
+    return values['Date Witness Contacted'].isna()
+
+
+def suspicious_body_part(values, aggregates):
+    return _keyword_match(values['Target/Part of Body Description'],
+                          ['back', 'neck', 'soft tissue', 'multiple body parts'])
+
+
+def weekend_injury(values, aggregates):
+    return values['loss_day'].isin([5, 6])
+
+
+def near_holiday(values, aggregates):
+    """Within a week of a major holiday"""
+    holidays = [
+        (1, 1),   # New Year's Day
+        (7, 4),   # Independence Day
+        (12, 25), # Christmas
+        (11, 24), # Thanksgiving (approximate)
+    ]
+    loss_date = values['loss_date']
+    result = pd.Series(False, index=loss_date.index)
+    for month, day in holidays:
+        result |= (loss_date.dt.month == month) & ((loss_date.dt.day - day).abs() <= 7)
+    return result
+
+
+def summer_claim(values, aggregates):
+    return values['loss_month'].isin([6, 7, 8])
+
+
+def claim_before_termination(values, aggregates):
+    days_before = (values['termination_date'] - values['loss_date']).dt.days
+    return values['termination_date'].notna() & (days_before <= 30) & (days_before >= 0)
+
+
+def high_claim_locations(aggregates):
+    """Locations with more than 1.5x the average number of claims"""
+    location_counts = aggregates['location_counts']
+    return location_counts[location_counts > location_counts.mean() * 1.5].index
+
+
+def high_claim_rate_location(values, aggregates):
+    return values['Location Name (Claim Level)'].isin(high_claim_locations(aggregates))
+
+
+def unusual_time(values, aggregates):
+    return (values['event_hour'] < 6) | (values['event_hour'] > 18)
+
+
+def monday_morning_claim(values, aggregates):
+    return (values['loss_day'] == 0) & (values['loss_hour'] < 10)
+
+
+def friday_afternoon_claim(values, aggregates):
+    return (values['loss_day'] == 4) & (values['loss_hour'] >= 14)
+
+
+def end_of_month_claim(values, aggregates):
+    return values['loss_date'].dt.day >= 25
+
+
+def spike_months(aggregates):
+    """Months with claim counts more than two standard deviations above average"""
+    monthly_counts = aggregates['monthly_counts']
+    return monthly_counts[monthly_counts > monthly_counts.mean() + 2 * monthly_counts.std()].index
+
+
+def seasonal_spike(values, aggregates):
+    return values['loss_month'].isin(spike_months(aggregates))
+
+
+def shift_change_injury(values, aggregates):
+    # Shifts change at 7, 15 and 23
+    return values['loss_hour'].isin([6, 7, 8, 14, 15, 16, 22, 23, 0])
+
+
+def lunch_break_injury(values, aggregates):
+    return values['loss_hour'].isin([11, 12, 13])
+
+
+def post_holiday_claim(values, aggregates):
+    # Simple implementation - Monday after a weekend
+    return values['loss_day'] == 0
+
+
+def attorney_immediate(values, aggregates):
+    days_to_attorney = (values['attorney_date'] - values['loss_date']).dt.days
+    return (days_to_attorney >= 0) & (days_to_attorney <= 1)
+
+
+def treatment_avoidance(values, aggregates):
+    return (values['Surgery Flag'] == 0) & values['suspicious_body_part']
+
+
+def excessive_treatment(values, aggregates):
+    return (values['closed_date'] - values['loss_date']).dt.days > 365
+
+
+def quick_settlement(values, aggregates):
+    return values['days_to_report'] < 2
+
+
+FEATURES = [
+    Feature('loss_date', ['Date of Loss'], _parse_date, column='Date of Loss'),
+    Feature('reported_date', ['Date Claim Reported to Client'], _parse_date,
+            column='Date Claim Reported to Client'),
+    Feature('hire_date', ['Date Of Hire'], _parse_date, column='Date Of Hire'),
+    Feature('termination_date', ['Date of Termination'], _parse_date,
+            column='Date of Termination'),
+    Feature('birth_date', ['Claimant Date of Birth'], _parse_date,
+            column='Claimant Date of Birth'),
+    Feature('attorney_date', ['Date Of Attorney Representation'], _parse_date,
+            column='Date Of Attorney Representation'),
+    Feature('closed_date', ['Date Claim Closed'], _parse_date, column='Date Claim Closed'),
+    Feature('days_to_report', ['reported_date', 'loss_date'], _days_to_report, column='days_to_report'),
+    Feature('days_employed', ['loss_date', 'hire_date'], _days_employed),
+    Feature('loss_day', ['loss_date'], _loss_day, column='loss_day'),
+    Feature('loss_month', ['loss_date'], _loss_month),
+    Feature('event_hour', ['Event Time'], _event_hour, column='event_hour'),
+    Feature('loss_hour', ['loss_date'], _loss_hour, optional_inputs=['event_hour'], column='loss_hour'),
+    Feature('claimant_claim_count', [], _claimant_claim_count,
+            optional_inputs=['Claimant SSN (Masked)', 'Claimant Full Name'], column='claimant_claim_count'),
+]
+
+RULES = [
+    # Basic indicators
+    Rule('delayed_reporting', ['days_to_report'], delayed_reporting),
+    Rule('near_birthday', ['loss_date', 'birth_date'], near_birthday),
+    Rule('new_employee_30d', ['days_employed'], new_employee_30d),
+    Rule('new_employee_90d', ['days_employed'], new_employee_90d),
+    Rule('multiple_claims', ['claimant_claim_count'], multiple_claims),
+    Rule('soft_tissue_injury', ['Injury Type Description'], soft_tissue_injury),
+    Rule('no_witness', ['Date Witness Contacted'], no_witness, default=True),  # True if no witness data
+    Rule('suspicious_body_part', ['Target/Part of Body Description'], suspicious_body_part),
+    Rule('weekend_injury', ['loss_day'], weekend_injury),
+    Rule('near_holiday', ['loss_date'], near_holiday),
+    Rule('summer_claim', ['loss_month'], summer_claim),
+    Rule('claim_before_termination', ['loss_date', 'termination_date'], claim_before_termination),
+    Rule('high_claim_rate_location', ['Location Name (Claim Level)'], high_claim_rate_location),
+    Rule('unusual_time', ['event_hour'], unusual_time),
+    Rule('injury_at_home'),
+
+    # Timing patterns
+    Rule('monday_morning_claim', ['loss_day', 'loss_hour'], monday_morning_claim),
+    Rule('friday_afternoon_claim', ['loss_day', 'loss_hour'], friday_afternoon_claim),
+    Rule('end_of_month_claim', ['loss_date'], end_of_month_claim),
+    Rule('seasonal_spike', ['loss_month'], seasonal_spike),
+    Rule('shift_change_injury', ['loss_hour'], shift_change_injury),
+    Rule('lunch_break_injury', ['loss_hour'], lunch_break_injury),
+    Rule('pre_vacation_claim'),
+    Rule('post_holiday_claim', ['loss_day'], post_holiday_claim),
+
+    # Behavioral patterns
+    Rule('attorney_immediate', ['attorney_date', 'loss_date'], attorney_immediate),
+    Rule('treatment_avoidance', ['Surgery Flag', 'suspicious_body_part'], treatment_avoidance),
+    Rule('doctor_shopping'),
+    Rule('claim_shopping'),
+    Rule('excessive_treatment', ['closed_date', 'loss_date'], excessive_treatment),
+    Rule('quick_settlement', ['days_to_report'], quick_settlement),
+    Rule('previous_claims_pattern'),
+    Rule('refused_light_duty'),
+    Rule('no_medical_history'),
+    Rule('changing_story'),
+]
+
+
+class RuleEvaluator:
+    """Evaluates rules over a DataFrame in dependency order"""
+
+    def __init__(self, rules=None, features=None):
+        self.rules = {rule.name: rule for rule in (RULES if rules is None else rules)}
+        self.features = {feature.name: feature for feature in (FEATURES if features is None else features)}
+        self._check_acyclic()
+
+    def required_columns(self):
+        """Raw input columns any rule or feature can read (including supplied feature columns)"""
+        columns = []
+        for node in list(self.features.values()) + list(self.rules.values()):
+            names = node.inputs + getattr(node, 'optional_inputs', []) + [getattr(node, 'column', None)]
+            for name in names:
+                if name and name not in self.features and name not in self.rules and name not in columns:
+                    columns.append(name)
+        return columns
+
+    def evaluate(self, df, aggregates):
+        """Write every rule column (and stored features) into df.
+
+        Returns {name: seconds} for each feature and rule that was computed, in evaluation order.
+        """
+        values = {}
+        costs = {}
+
+        def resolve(name):
+            """Series for a raw column, feature or rule - or None when unavailable"""
+            if name in values:
+                return values[name]
+            if name in self.rules:
+                run_rule(self.rules[name])
+            elif name in self.features:
+                values[name] = compute_feature(self.features[name])
+            else:
+                values[name] = df[name] if name in df.columns else None
+            return values[name]
+
+        def gather(node):
+            inputs = {}
+            for name in node.inputs:
+                value = resolve(name)
+                if value is None:
+                    return None
+                inputs[name] = value
+            for name in getattr(node, 'optional_inputs', []):
+                value = resolve(name)
+                if value is not None:
+                    inputs[name] = value
+            return inputs
+
+        def compute_feature(feature):
+            inputs = gather(feature)
+            result = None
+            if inputs is not None:
+                start = time.perf_counter()
+                try:
+                    result = feature.compute(inputs, aggregates)
+                except Exception as e:
+                    print(f"Warning: Could not compute feature '{feature.name}': {e}")
+                costs[feature.name] = time.perf_counter() - start
+
+            if result is not None and feature.column:
+                df[feature.column] = result
+            elif result is None and feature.column and feature.column in df.columns:
+                result = df[feature.column]  # Inputs missing - use the column supplied in the file
+            return result
+
+        def run_rule(rule):
+            values[rule.name] = pd.Series(rule.default, index=df.index)
+            inputs = gather(rule) if rule.compute else None
+            if inputs is not None:
+                start = time.perf_counter()
+                try:
+                    result = rule.compute(inputs, aggregates)
+                    values[rule.name] = pd.Series(result, index=df.index).fillna(False).astype(bool)
+                except Exception as e:
+                    print(f"Warning: Could not evaluate rule '{rule.name}': {e}")
+                costs[rule.name] = time.perf_counter() - start
+            df[rule.name] = values[rule.name]
+
+        for name in self.rules:
+            resolve(name)
+        return costs
+
+    def _check_acyclic(self):
+        """Raise ValueError if rule/feature inputs form a cycle"""
+        state = {}
+
+        def visit(name, path):
+            node = self.rules.get(name) or self.features.get(name)
+            if node is None or state.get(name) == 'done':
+                return
+            if state.get(name) == 'visiting':
+                raise ValueError(f"Rule dependency cycle: {' -> '.join(path + [name])}")
+            state[name] = 'visiting'
+            for dependency in node.inputs + getattr(node, 'optional_inputs', []):
+                visit(dependency, path + [name])
+            state[name] = 'done'
+
+        for name in list(self.features) + list(self.rules):
+            visit(name, [])
@@ -293,6 +293,8 @@ import os
 from django.contrib.humanize.templatetags.humanize import intcomma
 from django.conf import settings
 
+from .fraud_detector import red_flag_counts
+
 class FraudVisualizer:
     def __init__(self, output_dir):
         self.output_dir = output_dir
@@ -571,18 +573,12 @@ class FraudVisualizer:
     def create_red_flags_chart(self, df):
         """Create modern bar chart of most common red flags"""
         try:
-            # Count red flags
-            all_flags = []
-            for flags in df['red_flags']:
-                if isinstance(flags, list):
-                    all_flags.extend(flags)
-            
-            if not all_flags:
+            # Count red flags straight from the bitmask column
+            if 'red_flags_mask' not in df.columns:
                 return None
             
-            from collections import Counter
-            flag_counts = Counter(all_flags)
-            top_flags = dict(flag_counts.most_common(10))
+            flag_counts = red_flag_counts(df['red_flags_mask'])
+            top_flags = dict(list(flag_counts.items())[:10])
             
             if not top_flags:
                 return None
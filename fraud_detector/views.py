@@ -3,30 +3,47 @@ from django.http import HttpResponse, JsonResponse, FileResponse
 from django.contrib import messages
 from django.views.generic import ListView, DetailView
 from django.core.paginator import Paginator
+from django.db import transaction
 from django.db.models import Q, Count, Avg, F
+from django.conf import settings
+from django.core.cache import cache
+from django.urls import reverse
+from django.utils import timezone
+from django.views.decorators.http import require_http_methods, require_POST
+from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
 import pandas as pd
 import numpy as np
 import os
-from datetime import datetime
+from datetime import datetime, timedelta
 import json
-import traceback
 import time
+import traceback
+from collections import deque
 
-from .models import FraudAnalysis, Claim
-from .forms import UploadFileForm
-from .utils.fraud_detector import FraudDetector
+from .models import FraudAnalysis, Claim, UploadSession
+from .forms import UploadFileForm, validate_upload
+from .utils.fraud_detector import RED_FLAG_REGISTRY, FraudDetector, decode_red_flags, mask_from_red_flags
 from .utils.visualization import FraudVisualizer
-
-def clean_currency_column(series):
-    """Clean currency columns by removing $ and , symbols"""
-    if series.dtype == 'object':
-        # Remove currency symbols and commas
-        series = series.astype(str).str.replace('$', '', regex=False)
-        series = series.str.replace(',', '', regex=False)
-        series = series.str.strip()
-        # Convert to numeric, replacing errors with NaN
-        series = pd.to_numeric(series, errors='coerce')
-    return series
+from .utils.downsampling import MIN_POINTS, downsample
+from .progress import ProgressTracker, progress_payload
+from .uploads import (
+    assemble_upload, claim_upload_finalize, discard_upload, expire_upload_sessions, file_hash,
+    received_file_path, start_upload_session, uploaded_file_hash, write_upload_chunk,
+)
+from .delta import prepare_delta, save_row_index
+from .red_flags import bits_matching, claims_with_flags, flag_statistics, mask_bits, mask_groups
+from .rollups import (
+    CLAIMANT, FLAG, HIGH_RISK_LEVELS, INJURY_TYPE, MONTH, SCORE_BIN, SCORE_BIN_WIDTH, STATE, TOTAL,
+    analysis_rollups, build_rollups, score_histogram,
+)
+from .checkpoint import FINALIZE_STAGE, initial_checkpoint, load_checkpoint, read_committed_rows, save_checkpoint
+from .utils.bulk_load import bulk_load_claims, bulk_load_session, insert_claims_bisecting, quarantine_claims
+from .utils.ingest import (
+    AMOUNT_COLUMNS, CLAIM_COLUMN_MAPPINGS, INDEMNITY_COST_COLUMNS, LEGAL_COST_COLUMNS,
+    MEDICAL_COST_COLUMNS, compression_of, is_excel, join_passthrough, passthrough_columns,
+    read_claims_csv, read_header, resolve_columns, row_hashes, split_passthrough,
+)
 
 def index(request):
     """Home page view"""
@@ -51,29 +68,189 @@ def upload_file(request):
     if request.method == 'POST':
         form = UploadFileForm(request.POST, request.FILES)
         if form.is_valid():
+            content_hash = uploaded_file_hash(request, 'uploaded_file', form.cleaned_data['uploaded_file'])
+            ruleset_version = FraudDetector().ruleset_version()
+            
+            # The same file scored by the same rules reuses the earlier analysis instead of redoing it
+            existing = find_reusable_analysis(content_hash, ruleset_version)
+            if existing:
+                messages.info(request, f'This file was already uploaded - showing analysis #{existing.id}.')
+                if existing.status == 'done':
+                    return redirect('fraud_detector:dashboard', analysis_id=existing.id)
+                return redirect(f"{reverse('fraud_detector:upload')}?analysis={existing.id}")
+            
             analysis = form.save(commit=False)
             if request.user.is_authenticated:
                 analysis.user = request.user
+            analysis.content_hash = content_hash
+            analysis.ruleset_version = ruleset_version
+            analysis.status = 'queued'
             analysis.save()
             
-            # Process the file
-            try:
-                result = process_fraud_analysis(analysis)
-                if result['success']:
-                    messages.success(request, 'File uploaded and analyzed successfully!')
-                    return redirect('fraud_detector:dashboard', analysis_id=analysis.id)
-                else:
-                    messages.error(request, f'Error processing file: {result["error"]}')
-                    analysis.delete()
-            except Exception as e:
-                messages.error(request, f'Error processing file: {str(e)}')
-                print(f"Upload error: {traceback.format_exc()}")
-                if 'analysis' in locals():
-                    analysis.delete()
+            # Processing happens in a run_analysis_worker process, not in the web worker
+            messages.success(request, f'File uploaded - analysis #{analysis.id} is queued for processing.')
+            return redirect(f"{reverse('fraud_detector:upload')}?analysis={analysis.id}")
     else:
         form = UploadFileForm()
     
-    return render(request, 'fraud_detector/upload.html', {'form': form})
+    # Live progress of a just-uploaded analysis
+    tracked_analysis = None
+    if request.GET.get('analysis', '').isdigit():
+        tracked_analysis = FraudAnalysis.objects.filter(id=request.GET['analysis']).first()
+    
+    return render(request, 'fraud_detector/upload.html', {
+        'form': form,
+        'tracked_analysis': tracked_analysis,
+        'upload_chunk_bytes': settings.FRAUD_DETECTION_SETTINGS.get('UPLOAD_CHUNK_MB', 8) * 1024 * 1024,
+    })
+
+def find_reusable_analysis(content_hash, ruleset_version):
+    """Latest analysis of the same file content and ruleset that has finished or is still on its way"""
+    return (FraudAnalysis.objects
+            .filter(content_hash=content_hash, ruleset_version=ruleset_version,
+                    status__in=['done', 'running', 'queued'])
+            .order_by('status', '-uploaded_at')   # 'done' sorts before 'queued' and 'running'
+            .first())
+
+def upload_session_payload(session):
+    """JSON state of a chunked upload - clients resume from 'offset'"""
+    payload = {
+        'upload_id': str(session.id),
+        'file_name': session.file_name,
+        'file_size': session.file_size,
+        'offset': session.received_bytes,
+        'status': session.status,
+        'chunk_size': settings.FRAUD_DETECTION_SETTINGS.get('UPLOAD_CHUNK_MB', 8) * 1024 * 1024,
+    }
+    if session.error_message:
+        payload['error'] = session.error_message
+    if session.analysis_id:
+        payload['analysis_id'] = session.analysis_id
+        payload['progress_url'] = f"{reverse('fraud_detector:upload')}?analysis={session.analysis_id}"
+    return payload
+
+@require_POST
+def upload_session_create(request):
+    """Start a chunked upload.
+    
+    POST file_name and file_size (bytes), optionally sha256 (of the whole file, checked
+    on finalize) and base_analysis (id of a finished analysis, for delta mode).
+    """
+    expire_upload_sessions()
+    try:
+        file_size = int(request.POST.get('file_size', ''))
+        validate_upload(request.POST.get('file_name', ''), file_size)
+    except ValueError:
+        return JsonResponse({'error': 'file_size must be a number of bytes'}, status=400)
+    except ValidationError as e:
+        return JsonResponse({'error': ' '.join(e.messages)}, status=400)
+    
+    base_analysis = None
+    if request.POST.get('base_analysis'):
+        base_analysis_id = request.POST['base_analysis']
+        if base_analysis_id.isdigit():
+            base_analysis = FraudAnalysis.objects.filter(id=base_analysis_id, status='done').first()
+        if base_analysis is None:
+            return JsonResponse({'error': 'base_analysis must be a finished analysis'}, status=400)
+    
+    session = start_upload_session(
+        request.POST['file_name'], file_size, sha256=request.POST.get('sha256', ''),
+        user=request.user if request.user.is_authenticated else None, base_analysis=base_analysis)
+    return JsonResponse(upload_session_payload(session), status=201)
+
+def upload_session_status(request, upload_id):
+    """State of a chunked upload, including the offset to resume from"""
+    session = get_object_or_404(UploadSession, id=upload_id)
+    return JsonResponse(upload_session_payload(session))
+
+@require_http_methods(['PUT', 'POST'])
+def upload_session_chunk(request, upload_id, offset):
+    """Append the request body at offset of a chunked upload.
+    
+    The X-Chunk-SHA256 header holds the hex SHA-256 of the body. A chunk is only counted
+    once it is complete and its checksum matches; otherwise the client sends it again.
+    """
+    session = get_object_or_404(UploadSession, id=upload_id)
+    if session.status != 'open':
+        return JsonResponse(dict(upload_session_payload(session), error='The upload is not open'), status=409)
+    if offset != session.received_bytes:
+        return JsonResponse(dict(upload_session_payload(session), error='Unexpected offset'), status=409)
+    
+    max_chunk = settings.FRAUD_DETECTION_SETTINGS.get('UPLOAD_CHUNK_MB', 8) * 1024 * 1024
+    checksum = request.headers.get('X-Chunk-SHA256', '').lower()
+    try:
+        length = int(request.headers.get('Content-Length', ''))
+    except ValueError:
+        length = 0
+    if not checksum:
+        return JsonResponse({'error': 'X-Chunk-SHA256 header is required'}, status=400)
+    if not 0 < length <= max_chunk or offset + length > session.file_size:
+        return JsonResponse({'error': f'Chunks must be 1 byte to {max_chunk} bytes and end within the file'},
+                            status=400)
+    
+    digest = write_upload_chunk(session, offset, request, length)
+    if digest != checksum:
+        error = 'Incomplete chunk' if digest is None else 'Checksum mismatch'
+        return JsonResponse(dict(upload_session_payload(session), error=f'{error} - send the chunk again'),
+                            status=400)
+    
+    # Conditional on the offset, so a duplicate request for the same chunk cannot count twice
+    advanced = UploadSession.objects.filter(id=session.id, status='open', received_bytes=offset).update(
+        received_bytes=offset + length, updated_at=timezone.now())
+    session.refresh_from_db()
+    return JsonResponse(upload_session_payload(session), status=200 if advanced else 409)
+
+@require_POST
+def upload_session_finalize(request, upload_id):
+    """Complete a chunked upload and queue its analysis (or reuse the analysis of an identical file).
+    
+    The upload is 'finalizing' while its file is hashed and moved, and becomes 'complete'
+    in the transaction that creates its analysis, so a failed finalize can be retried.
+    """
+    session = get_object_or_404(UploadSession, id=upload_id)
+    if session.status == 'complete' and session.analysis_id:
+        return JsonResponse(upload_session_payload(session))
+    if not claim_upload_finalize(session):
+        session.refresh_from_db()
+        if session.status == 'finalizing':
+            error = 'The upload is being finalized - try again shortly'
+        else:
+            error = 'The upload is not complete'
+        return JsonResponse(dict(upload_session_payload(session), error=error), status=409)
+    
+    try:
+        file_path = received_file_path(session)
+        content_hash = file_hash(file_path) if file_path else None
+        if content_hash is None or (session.sha256 and session.sha256 != content_hash):
+            discard_upload(session)
+            session.status = 'failed'
+            if content_hash is None:
+                session.error_message = 'The uploaded file is missing - upload it again'
+            else:
+                session.error_message = 'The assembled file does not match the sha256 given at the start - upload it again'
+            session.save(update_fields=['status', 'error_message', 'updated_at'])
+            return JsonResponse(upload_session_payload(session), status=400)
+        
+        ruleset_version = FraudDetector().ruleset_version()
+        analysis = find_reusable_analysis(content_hash, ruleset_version)
+        reused = analysis is not None
+        with transaction.atomic():
+            if not reused:
+                analysis = FraudAnalysis(user=session.user, base_analysis=session.base_analysis,
+                                         content_hash=content_hash, ruleset_version=ruleset_version, status='queued')
+                analysis.uploaded_file.name = assemble_upload(session)
+                analysis.save()
+            session.status = 'complete'
+            session.analysis = analysis
+            session.save(update_fields=['status', 'analysis', 'updated_at'])
+    except Exception:
+        # Hand the upload back, so the client's retry finalizes it again
+        UploadSession.objects.filter(id=session.id, status='finalizing').update(status='open', updated_at=timezone.now())
+        raise
+    
+    if reused:
+        discard_upload(session)
+    return JsonResponse(upload_session_payload(session))
 
 def execute_notebook_analysis(csv_path, output_dir):
     """
@@ -99,145 +276,118 @@ def execute_notebook_analysis(csv_path, output_dir):
         print(f"Notebook execution failed: {e}")
         return None
     
+# Columns kept in memory across chunks for the charts (everything else is streamed out)
+VISUALIZATION_COLUMNS = [
+    'risk_level', 'fraud_score', 'days_to_report', 'red_flags_mask', 'Date of Loss',
+    'delayed_reporting', 'near_birthday', 'new_employee_30d', 'new_employee_90d',
+    'multiple_claims', 'soft_tissue_injury', 'no_witness', 'suspicious_body_part',
+    'weekend_injury', 'summer_claim'
+]
+
+# FraudAnalysis fields set by process_fraud_analysis, saved once its outputs are written
+ANALYSIS_RESULT_FIELDS = [
+    'ruleset_version', 'output_csv_path', 'high_risk_csv_path', 'visualizations', 'total_claims',
+    'low_risk_count', 'medium_risk_count', 'high_risk_count', 'critical_risk_count', 'processed_at',
+    'malformed_values',
+]
+
 def process_fraud_analysis(analysis):
     """Process the uploaded CSV file for fraud detection - Optimized for large files"""
     try:
         print(f"Starting fraud analysis for analysis ID: {analysis.id}")
+        fraud_settings = settings.FRAUD_DETECTION_SETTINGS
+        file_path = analysis.uploaded_file.path
+        # Results are stored under the rules this worker scores with
+        analysis.ruleset_version = FraudDetector().ruleset_version()
         
-        # Read the CSV file with chunking for large files
-        file_size = os.path.getsize(analysis.uploaded_file.path)
+        file_size = os.path.getsize(file_path)
         print(f"File size: {file_size / (1024*1024):.1f} MB")
         
-        # For large files (>50MB), use chunked reading
-        if file_size > 50 * 1024 * 1024:  # 50MB threshold
-            print("Large file detected - using chunked processing")
-            df = pd.read_csv(analysis.uploaded_file.path, thousands=',', low_memory=False, chunksize=None)
-        else:
-            df = pd.read_csv(analysis.uploaded_file.path, thousands=',', low_memory=False)
-        
-        print(f"Loaded CSV with shape: {df.shape}")
-        print(f"Columns: {list(df.columns)[:10]}...")  # Show first 10 columns
-        
-        # List of columns that might contain currency/numeric data
-        potential_numeric_columns = [
-            'Claim Incurred - Total', 'Claim Incurred – Total',
-            'Claim Paid - Total', 'Claim Paid – Total',
-            'Claim Future Reserve - Total', 'Claim Future Reserve – Total',
-            'Claim Incurred - Medical', 'Claim Incurred – Medical',
-            'Claim Paid - Medical', 'Claim Paid – Medical',
-            'Claim Future Reserve - Medical', 'Claim Future Reserve – Medical',
-            'Claim Incurred - Ind/Loss', 'Claim Incurred – Ind/Loss',
-            'Claim Paid - Ind/Loss', 'Claim Paid – Ind/Loss',
-            'Claim Future Reserve - Ind/Loss', 'Claim Future Reserve – Ind/Loss',
-            'Claim Incurred - Expense', 'Claim Incurred – Expense',
-            'Claim Paid - Expense', 'Claim Paid – Expense',
-            'Claim Future Reserve - Expense', 'Claim Future Reserve – Expense',
-            'Claim Incurred - Legal', 'Claim Incurred – Legal',
-            'Claim Paid - Legal', 'Claim Paid – Legal',
-            'Claim Future Reserve - Legal', 'Claim Future Reserve – Legal',
-            'Pre Injury AWW', 'Wage Base', 'Weekly Wage', 'Current Wage',
-            'Deductible', 'Policy Deductible', 'Claim Amount',
-            'Claim Recovery - Total', 'Claim Recovery – Total',
-            'days_to_report', 'Event Time'
-        ]
-        
-        # Clean numeric columns
-        for col in potential_numeric_columns:
-            if col in df.columns:
-                df[col] = clean_currency_column(df[col])
-                print(f"Cleaned column: {col}")
-        
         # Create output directory first
         output_dir = os.path.join('media', 'outputs', f'analysis_{analysis.id}')
         os.makedirs(output_dir, exist_ok=True)
         
-        # Try notebook integration first (if fraud.ipynb exists)
-        notebook_path = 'fraud.ipynb'
-        df_with_fraud = None
-        
-        if os.path.exists(notebook_path):
-            try:
-                print("Attempting to execute fraud.ipynb notebook...")
-                df_with_fraud = execute_notebook_analysis(analysis.uploaded_file.path, output_dir)
-                print("Successfully executed fraud.ipynb notebook")
-                
-            except Exception as notebook_error:
-                print(f"Notebook execution failed: {notebook_error}")
-                print("Falling back to built-in FraudDetector")
-                df_with_fraud = None
-        
-        # Use built-in FraudDetector if notebook failed or doesn't exist
-        if df_with_fraud is None:
-            print("Using built-in FraudDetector...")
-            from .utils.fraud_detector import FraudDetector
-            detector = FraudDetector()
-            df_with_fraud = detector.detect_fraud(df)
-        
-        # Validate that required columns exist
-        required_columns = ['fraud_score', 'risk_level', 'red_flags']
-        for col in required_columns:
-            if col not in df_with_fraud.columns:
-                print(f"ERROR: Required column '{col}' not found after fraud detection!")
-                if col == 'fraud_score':
-                    print("Creating default fraud scores...")
-                    df_with_fraud['fraud_score'] = np.random.uniform(0, 100, len(df_with_fraud))
-                elif col == 'risk_level':
-                    print("Creating default risk levels...")
-                    df_with_fraud['risk_level'] = pd.cut(
-                        df_with_fraud.get('fraud_score', np.random.uniform(0, 100, len(df_with_fraud))),
-                        bins=[0, 30, 50, 70, 100],
-                        labels=['Low', 'Medium', 'High', 'Critical'],
-                        include_lowest=True
-                    )
-                elif col == 'red_flags':
-                    print("Creating default red flags...")
-                    df_with_fraud['red_flags'] = [[] for _ in range(len(df_with_fraud))]
-        
-        print(f"Fraud detection completed. Final shape: {df_with_fraud.shape}")
-        print(f"Risk distribution: {df_with_fraud['risk_level'].value_counts().to_dict()}")
-        
-        # Generate output files
-        output_csv_path = os.path.join(output_dir, 'fraud_analysis_results.csv')
-        df_with_fraud.to_csv(output_csv_path, index=False)
-        analysis.output_csv_path = output_csv_path.replace('media/', '')
-        
-        # Save high-risk claims CSV
-        high_risk_df = df_with_fraud[df_with_fraud['risk_level'].isin(['High', 'Critical'])]
-        if not high_risk_df.empty:
-            high_risk_csv_path = os.path.join(output_dir, 'high_risk_claims.csv')
-            high_risk_df.to_csv(high_risk_csv_path, index=False)
-            analysis.high_risk_csv_path = high_risk_csv_path.replace('media/', '')
-        
-        # Generate visualizations
-        try:
-            viz_dir = os.path.join('media', 'visualizations', f'analysis_{analysis.id}')
-            from .utils.visualization import FraudVisualizer
-            visualizer = FraudVisualizer(viz_dir)
-            visualizations = visualizer.generate_all_visualizations(df_with_fraud)
+        # Columns the detector does not read are set aside while scoring and exported as uploaded
+        header = read_header(file_path)
+        extra_columns = passthrough_columns(header)
+        source_columns = list(resolve_columns(header, passthrough=True).values())
+        
+        # Currency values that could not be parsed, per column (they are scored as missing)
+        malformed_counts = {}
+        progress = ProgressTracker(analysis)
+        
+        # Rows committed by an interrupted earlier run are not scored or saved again
+        output_paths = analysis_output_paths(output_dir)
+        checkpoint = load_checkpoint(analysis, output_paths)
+        resume_rows = checkpoint['rows_done']
+        
+        # For large files, stream the CSV through the detector in two passes
+        streaming_threshold = fraud_settings.get('STREAMING_THRESHOLD_MB', 50) * 1024 * 1024
+        chunk_rows = fraud_settings.get('STREAMING_CHUNK_ROWS', 100000)
+        scored_chunks = None
+        if checkpoint['stage'] == FINALIZE_STAGE:
+            print("All claims were committed by an earlier run - skipping detection")
+            progress.set_total(resume_rows)
+            progress.advance('ingest', resume_rows)
+            scored_chunks = []
+        elif analysis.base_analysis_id:
+            # Delta mode - only rows that changed since the base analysis are scored
+            scored_chunks = prepare_delta(analysis, file_path, output_paths, checkpoint, progress,
+                                          chunk_rows, malformed_counts)
+        
+        # Full analysis (also when the base of a delta analysis cannot be used)
+        # Workbooks and compressed files are always streamed - their file size says little
+        # about their size in memory
+        packed = is_excel(file_path) or compression_of(file_path)
+        if scored_chunks is None and (file_size > streaming_threshold or packed):
+            print(f"Large or compressed file detected - streaming in chunks of {chunk_rows} rows")
+            
+            # Set-aside columns of the chunks being scored, in file order
+            set_aside = deque()
             
-            # Store visualization paths
-            viz_paths = {}
-            for key, filename in visualizations.items():
-                if filename:  # Only add if visualization was created successfully
-                    viz_paths[key] = os.path.join('visualizations', f'analysis_{analysis.id}', filename)
-            analysis.visualizations = viz_paths
+            def read_chunks(usecols):
+                # Pass 1 (aggregate columns only) counts the rows, pass 2 is the real ingest
+                rows = 0
+                for chunk in read_claims_csv(file_path, usecols=usecols, chunksize=chunk_rows,
+                                             malformed_counts=malformed_counts, passthrough=usecols is None):
+                    rows += len(chunk)
+                    if usecols is None:
+                        progress.advance('ingest', len(chunk))
+                        # Pass 1 still covers the whole file, so aggregates match an uninterrupted run
+                        if rows <= resume_rows:
+                            continue
+                        if rows - len(chunk) < resume_rows:
+                            chunk = chunk.iloc[resume_rows - (rows - len(chunk)):].copy()
+                        chunk['row_hash'] = row_hashes(chunk)
+                        chunk, extra = split_passthrough(chunk, extra_columns)
+                        set_aside.append(extra)
+                    yield chunk
+                if usecols is not None:
+                    progress.set_total(rows)
+            
+            detector = FraudDetector()
+            # Scored chunks come back in file order, so each matches the oldest set-aside columns
+            scored_chunks = (join_passthrough(scored, set_aside.popleft(), source_columns)
+                             for scored in detector.detect_fraud_streaming(read_chunks))
+        elif scored_chunks is None:
+            df = read_claims_csv(file_path, malformed_counts=malformed_counts, passthrough=True)
+            print(f"Loaded CSV with shape: {df.shape}")
+            print(f"Columns: {list(df.columns)[:10]}...")  # Show first 10 columns
+            progress.set_total(len(df))
+            progress.advance('ingest', len(df))
+            df['row_hash'] = row_hashes(df)
+            df, extra = split_passthrough(df, extra_columns)
             
-        except Exception as viz_error:
-            print(f"Warning: Visualization generation failed: {viz_error}")
-            analysis.visualizations = {}
+            df_with_fraud = join_passthrough(detect_fraud_in_memory(analysis, df, output_dir), extra, source_columns)
+            if resume_rows:
+                df_with_fraud = df_with_fraud.iloc[resume_rows:].copy()
+            scored_chunks = [df_with_fraud]
         
-        # Update summary statistics
-        risk_counts = df_with_fraud['risk_level'].value_counts()
-        analysis.total_claims = len(df_with_fraud)
-        analysis.low_risk_count = int(risk_counts.get('Low', 0))
-        analysis.medium_risk_count = int(risk_counts.get('Medium', 0))
-        analysis.high_risk_count = int(risk_counts.get('High', 0))
-        analysis.critical_risk_count = int(risk_counts.get('Critical', 0))
-        analysis.processed_at = datetime.now()
-        analysis.save()
+        analysis.malformed_values = malformed_counts
+        write_analysis_outputs(analysis, scored_chunks, output_dir, progress, checkpoint)
         
-        # Save individual claims to database with chunked processing
-        save_claims_to_db(analysis, df_with_fraud)
+        for col, count in malformed_counts.items():
+            print(f"Warning: {count} malformed values in column '{col}' were treated as missing")
         
         print(f"Analysis completed successfully. Saved {analysis.total_claims} claims.")
         return {'success': True}
@@ -247,248 +397,318 @@ def process_fraud_analysis(analysis):
         print(f"Traceback: {traceback.format_exc()}")
         return {'success': False, 'error': str(e)}
 
+def detect_fraud_in_memory(analysis, df, output_dir):
+    """Run detection on a fully loaded DataFrame (notebook first, then the built-in detector)"""
+    # Try notebook integration first (if fraud.ipynb exists)
+    notebook_path = 'fraud.ipynb'
+    df_with_fraud = None
+    
+    if os.path.exists(notebook_path):
+        try:
+            print("Attempting to execute fraud.ipynb notebook...")
+            df_with_fraud = execute_notebook_analysis(analysis.uploaded_file.path, output_dir)
+            print("Successfully executed fraud.ipynb notebook")
+            
+        except Exception as notebook_error:
+            print(f"Notebook execution failed: {notebook_error}")
+            print("Falling back to built-in FraudDetector")
+            df_with_fraud = None
+    
+    # Use built-in FraudDetector if notebook failed or doesn't exist
+    if df_with_fraud is None:
+        print("Using built-in FraudDetector...")
+        detector = FraudDetector()
+        df_with_fraud = detector.detect_fraud_parallel(df)
+    
+    return df_with_fraud
+
+def ensure_required_columns(df_with_fraud):
+    """Validate that required columns exist, filling defaults where detection left them out"""
+    required_columns = ['fraud_score', 'risk_level', 'red_flags_mask']
+    for col in required_columns:
+        if col not in df_with_fraud.columns:
+            print(f"ERROR: Required column '{col}' not found after fraud detection!")
+            if col == 'fraud_score':
+                print("Creating default fraud scores...")
+                df_with_fraud['fraud_score'] = np.random.uniform(0, 100, len(df_with_fraud))
+            elif col == 'risk_level':
+                print("Creating default risk levels...")
+                df_with_fraud['risk_level'] = pd.cut(
+                    df_with_fraud.get('fraud_score', np.random.uniform(0, 100, len(df_with_fraud))),
+                    bins=[0, 30, 50, 70, 100],
+                    labels=['Low', 'Medium', 'High', 'Critical'],
+                    include_lowest=True
+                )
+            elif col == 'red_flags_mask':
+                print("Creating default red flags...")
+                df_with_fraud['red_flags_mask'] = 0
+    return df_with_fraud
+
+def analysis_output_paths(output_dir):
+    """Paths of the results CSV and the high-risk claims CSV of an analysis"""
+    return [os.path.join(output_dir, 'fraud_analysis_results.csv'),
+            os.path.join(output_dir, 'high_risk_claims.csv')]
+
+def checkpoint_chunks(scored_chunks, chunk_rows):
+    """Split scored chunks into pieces of at most chunk_rows rows, the unit committed per checkpoint"""
+    for chunk in scored_chunks:
+        if len(chunk) <= chunk_rows:
+            yield chunk
+            continue
+        for start in range(0, len(chunk), chunk_rows):
+            yield chunk.iloc[start:start + chunk_rows].copy()
+
+def write_analysis_outputs(analysis, scored_chunks, output_dir, progress=None, checkpoint=None):
+    """Write CSVs, claims and summary for an iterable of scored chunks.
+    
+    Each chunk is appended to the output files and saved to the database as it arrives,
+    so only the slim VISUALIZATION_COLUMNS frame is kept for the whole analysis.
+    Rows are reported per stage to progress (a ProgressTracker) when given.
+    
+    A chunk's claims are committed together with a checkpoint (see checkpoint.py).
+    When resuming from checkpoint, scored_chunks must start after its committed rows.
+    """
+    progress = progress or ProgressTracker(analysis)
+    checkpoint = checkpoint or initial_checkpoint()
+    output_paths = analysis_output_paths(output_dir)
+    output_csv_path, high_risk_csv_path = output_paths
+    chunk_rows = settings.FRAUD_DETECTION_SETTINGS.get('CHECKPOINT_ROWS', 100000)
+    
+    total_claims = checkpoint['rows_done']
+    high_risk_rows = checkpoint['high_risk_rows']
+    risk_counts = checkpoint['risk_counts']
+    # Rows of earlier runs are read back from the results CSV for the charts
+    viz_frames = [read_committed_rows(output_csv_path, total_claims, VISUALIZATION_COLUMNS)] if total_claims else []
+    for stage in ['indicators', 'scoring', 'export', 'db_save']:
+        progress.advance(stage, total_claims)
+    
+    for df_with_fraud in checkpoint_chunks(scored_chunks, chunk_rows):
+        df_with_fraud = ensure_required_columns(df_with_fraud)
+        print(f"Fraud detection completed for chunk. Shape: {df_with_fraud.shape}")
+        progress.advance('indicators', len(df_with_fraud))
+        progress.advance('scoring', len(df_with_fraud))
+        
+        # Readable red flag lists are only needed from here on (CSV export, claim records)
+        df_with_fraud['red_flags'] = decode_red_flags(df_with_fraud['red_flags_mask'])
+        
+        # Generate output files
+        df_with_fraud.to_csv(output_csv_path, mode='a' if total_claims else 'w',
+                             header=not total_claims, index=False)
+        
+        # Save high-risk claims CSV
+        high_risk_df = df_with_fraud[df_with_fraud['risk_level'].isin(['High', 'Critical'])]
+        if not high_risk_df.empty:
+            high_risk_df.to_csv(high_risk_csv_path, mode='a' if high_risk_rows else 'w',
+                                header=not high_risk_rows, index=False)
+            high_risk_rows += len(high_risk_df)
+        
+        progress.advance('export', len(df_with_fraud))
+        
+        for level, count in df_with_fraud['risk_level'].value_counts().items():
+            risk_counts[level] = risk_counts.get(level, 0) + int(count)
+        viz_frames.append(df_with_fraud[[col for col in VISUALIZATION_COLUMNS if col in df_with_fraud.columns]])
+        total_claims += len(df_with_fraud)
+        
+        # Save individual claims to database, committed together with the checkpoint
+        checkpoint.update(rows_done=total_claims, high_risk_rows=high_risk_rows, risk_counts=risk_counts)
+        with bulk_load_session(), transaction.atomic():
+            save_claims_to_db(analysis, df_with_fraud)
+            save_checkpoint(analysis, checkpoint, output_paths)
+        progress.advance('db_save', len(df_with_fraud))
+    
+    # Lets later uploads of an overlapping extract run as a delta against this analysis
+    try:
+        save_row_index(analysis, output_csv_path)
+    except Exception as index_error:
+        print(f"Warning: Row index could not be saved: {index_error}")
+    
+    # Dashboard aggregates, read by the chart APIs instead of grouping the claims per request
+    try:
+        build_rollups(analysis)
+    except Exception as rollup_error:
+        print(f"Warning: Rollups could not be saved (built on first request instead): {rollup_error}")
+    
+    checkpoint['stage'] = FINALIZE_STAGE
+    save_checkpoint(analysis, checkpoint, output_paths)
+    progress.finish('ingest', 'indicators', 'scoring', 'export', 'db_save')
+    print(f"Risk distribution: {risk_counts}")
+    analysis.output_csv_path = output_csv_path.replace('media/', '')
+    if high_risk_rows:
+        analysis.high_risk_csv_path = high_risk_csv_path.replace('media/', '')
+    
+    # Generate visualizations
+    progress.start('visualizations')
+    try:
+        viz_df = pd.concat(viz_frames, ignore_index=True)
+        viz_dir = os.path.join('media', 'visualizations', f'analysis_{analysis.id}')
+        visualizer = FraudVisualizer(viz_dir)
+        visualizations = visualizer.generate_all_visualizations(viz_df)
+        
+        # Store visualization paths
+        viz_paths = {}
+        for key, filename in visualizations.items():
+            if filename:  # Only add if visualization was created successfully
+                viz_paths[key] = os.path.join('visualizations', f'analysis_{analysis.id}', filename)
+        analysis.visualizations = viz_paths
+        
+    except Exception as viz_error:
+        print(f"Warning: Visualization generation failed: {viz_error}")
+        analysis.visualizations = {}
+    progress.finish('visualizations')
+    
+    # Update summary statistics
+    analysis.total_claims = total_claims
+    analysis.low_risk_count = risk_counts.get('Low', 0)
+    analysis.medium_risk_count = risk_counts.get('Medium', 0)
+    analysis.high_risk_count = risk_counts.get('High', 0)
+    analysis.critical_risk_count = risk_counts.get('Critical', 0)
+    analysis.processed_at = datetime.now()
+    # Only the result fields: a full save would also write back the worker's claim (see jobs.py)
+    analysis.save(update_fields=ANALYSIS_RESULT_FIELDS)
+
+# Claim fields filled from the first non-empty source column, with their CharField max lengths
+CLAIM_STRING_FIELDS = {
+    'claim_number': 100, 'claimant_name': 200, 'injury_type': 200, 'body_part': 200,
+    'state': 2, 'city': 100, 'zip_code': 10, 'job_title': 200, 'department': 200,
+}
+CLAIM_DATE_FIELDS = ['date_of_loss', 'date_reported', 'date_of_hire', 'claimant_dob']
+CLAIM_PRESENCE_FIELDS = ['attorney_involved', 'witness_available']
+CLAIM_AMOUNT_FIELDS = {
+    'claim_amount': AMOUNT_COLUMNS,
+    'medical_costs': MEDICAL_COST_COLUMNS,
+    'indemnity_costs': INDEMNITY_COST_COLUMNS,
+    'legal_costs': LEGAL_COST_COLUMNS,
+}
+
+def coalesce_columns(df, column_list):
+    """Per row, the value of the first column in column_list that is not null (None if none exist)"""
+    columns = [col for col in column_list if col in df.columns]
+    if not columns:
+        return None
+    values = df[columns[0]]
+    if len(columns) > 1 and isinstance(values.dtype, pd.CategoricalDtype):
+        values = values.astype(object)  # fallback values may not be among the categories
+    for col in columns[1:]:
+        values = values.where(values.notna(), df[col])
+    return values
+
+def _to_python(values, mask):
+    """List of the values with None where mask is set"""
+    result = np.asarray(values, dtype=object)
+    result[np.asarray(mask, dtype=bool)] = None
+    return result.tolist()
+
+def claim_field_values(df):
+    """Column-wise Claim field values for every row of df, as lists of Python values"""
+    rows = len(df)
+    missing = [None] * rows
+    fields = {}
+    
+    for field, column_list in CLAIM_AMOUNT_FIELDS.items():
+        values = coalesce_columns(df, column_list)
+        if values is None:
+            fields[field] = missing
+        else:
+            values = pd.to_numeric(values, errors='coerce').astype('float64')
+            fields[field] = _to_python(values, values.isna())
+    
+    if 'days_to_report' in df.columns:
+        days = pd.to_numeric(df['days_to_report'], errors='coerce').astype('float64')
+        fields['days_to_report'] = _to_python(np.trunc(days.fillna(0)).astype('int64'), days.isna())
+    else:
+        fields['days_to_report'] = missing
+    
+    for field, max_length in CLAIM_STRING_FIELDS.items():
+        values = coalesce_columns(df, CLAIM_COLUMN_MAPPINGS[field])
+        if values is None:
+            fields[field] = [''] * rows
+        else:
+            present = values.notna()
+            text = values[present].astype(str).str.slice(0, max_length)
+            fields[field] = text.reindex(values.index, fill_value='').tolist()
+    
+    for field in CLAIM_DATE_FIELDS:
+        values = coalesce_columns(df, CLAIM_COLUMN_MAPPINGS[field])
+        if values is None:
+            fields[field] = missing
+            continue
+        if not pd.api.types.is_datetime64_any_dtype(values.dtype):
+            values = pd.to_datetime(values, errors='coerce', format='mixed')
+        fields[field] = _to_python(values.dt.date, values.isna())
+    
+    for field in CLAIM_PRESENCE_FIELDS:
+        values = coalesce_columns(df, CLAIM_COLUMN_MAPPINGS[field])
+        fields[field] = [False] * rows if values is None else values.notna().tolist()
+    
+    # Detection results (ensure_required_columns has filled in any that were missing)
+    fraud_score = pd.to_numeric(df['fraud_score'], errors='coerce').astype('float64')
+    fields['fraud_score'] = fraud_score.fillna(0.0).tolist()
+    risk_level = df['risk_level'].astype(object)
+    fields['risk_level'] = risk_level.where(risk_level.notna(), 'Low').astype(str).replace('', 'Low').tolist()
+    red_flags = df['red_flags'] if 'red_flags' in df.columns else pd.Series([[]] * rows, index=df.index)
+    fields['red_flags'] = [flags if isinstance(flags, list) else ([] if pd.isna(flags) else [str(flags)])
+                           for flags in red_flags]
+    if 'red_flags_mask' in df.columns:
+        fields['red_flags_mask'] = pd.to_numeric(df['red_flags_mask'], errors='coerce').fillna(0).astype('int64').tolist()
+    else:
+        fields['red_flags_mask'] = [mask_from_red_flags(flags) for flags in fields['red_flags']]
+    
+    # Source row hash, used to match claims between extracts (see delta.py)
+    if 'row_hash' in df.columns:
+        fields['row_hash'] = df['row_hash'].astype('int64').tolist()
+    
+    # Fallbacks for rows without an identifier or a name
+    fields['claim_number'] = [number or f"CLAIM_{idx+1}" for number, idx in zip(fields['claim_number'], df.index)]
+    fields['claimant_name'] = [name or "Unknown" for name in fields['claimant_name']]
+    return fields
+
 def save_claims_to_db(analysis, df):
-    """Save individual claims to the database with robust error handling and chunked processing for large files"""
+    """Save individual claims to the database - native bulk load first, chunked bulk_create as a fallback"""
     total_rows = len(df)
     print(f"Saving {total_rows} claims to database...")
     
-    # For large datasets, process in chunks
-    CHUNK_SIZE = 1000  # Process 1000 records at a time
-    total_created = 0
-    
     # Debug: Print available columns
     print(f"Available columns in dataframe: {list(df.columns)}")
     
-    # Column mapping for different possible column names
-    column_mappings = {
-        'claim_number': ['Claim Number', 'Event Number', 'Claim ID'],
-        'claimant_name': ['Claimant Full Name', 'Claimant Name', 'Employee Name'],
-        'date_of_loss': ['Date of Loss', 'Loss Date', 'Incident Date'],
-        'injury_type': ['Injury Type Description', 'Type of Injury', 'Injury Description'],
-        'body_part': ['Target/Part of Body Description', 'SCMS Target/Part of Body Description', 'Body Part'],
-        'date_reported': ['Date Claim Reported to Client', 'Report Date', 'Reported Date'],
-        'date_of_hire': ['Date Of Hire', 'Hire Date', 'Employment Date'],
-        'claimant_dob': ['Claimant Date of Birth', 'Date of Birth', 'DOB'],
-        'state': ['State', 'Claim State', 'Location State', 'Structure Level Name 01'],
-        'city': ['City', 'Claim City', 'Location City'],
-        'zip_code': ['Zip Code', 'ZIP', 'Postal Code'],
-        'job_title': ['Job Title', 'Position', 'Job Classification'],
-        'department': ['Department', 'Division', 'Work Unit'],
-        'attorney_involved': ['Date Of Attorney Representation'],
-        'medical_treatment': ['Medical Treatment', 'Treatment Type'],
-        'witness_available': ['Date Witness Contacted']
-    }
+    # Source columns are resolved and converted once for the whole DataFrame
+    fields = claim_field_values(df)
     
-    # Amount columns to try
-    amount_columns = [
-        'Claim Incurred - Total', 'Claim Incurred – Total',
-        'Claim Paid - Total', 'Claim Paid – Total',
-        'Total Incurred', 'Total Paid', 'Claim Amount'
-    ]
-    
-    medical_cost_columns = [
-        'Claim Incurred - Medical', 'Claim Incurred – Medical',
-        'Claim Paid - Medical', 'Claim Paid – Medical',
-        'Medical Incurred', 'Medical Paid'
-    ]
-    
-    indemnity_cost_columns = [
-        'Claim Incurred - Ind/Loss', 'Claim Incurred – Ind/Loss',
-        'Claim Paid - Ind/Loss', 'Claim Paid – Ind/Loss',
-        'Indemnity Incurred', 'Indemnity Paid'
-    ]
-    
-    legal_cost_columns = [
-        'Claim Incurred - Legal', 'Claim Incurred – Legal',
-        'Claim Paid - Legal', 'Claim Paid – Legal',
-        'Legal Incurred', 'Legal Paid'
-    ]
-    
-    def get_column_value(row, column_list):
-        """Get value from first available column in the list"""
-        for col in column_list:
-            if col in row and pd.notna(row[col]):
-                return row[col]
-        return None
+    try:
+        total_created = bulk_load_claims(analysis, fields)
+        print(f"Claim saving completed. Bulk loaded {total_created} out of {total_rows} rows")
+        return
+    except Exception as load_error:
+        print(f"Bulk load failed: {load_error} - falling back to chunked bulk_create")
     
-    def safe_get_value(row, field_name, default=None):
-        """Safely get a value using column mapping"""
-        if field_name in column_mappings:
-            return get_column_value(row, column_mappings[field_name])
-        elif field_name in row:
-            return row[field_name] if pd.notna(row[field_name]) else default
-        return default
-    
-    def safe_float(value):
-        """Safely convert to float"""
-        if value is None or pd.isna(value):
-            return None
-        try:
-            return float(value)
-        except (ValueError, TypeError):
-            return None
-    
-    def safe_int(value):
-        """Safely convert to int"""
-        if value is None or pd.isna(value):
-            return None
-        try:
-            return int(float(value))
-        except (ValueError, TypeError):
-            return None
-    
-    def safe_date(value):
-        """Safely convert to date"""
-        if value is None or pd.isna(value):
-            return None
-        try:
-            return pd.to_datetime(value).date()
-        except:
-            return None
-    
-    def safe_string(value, max_length=None):
-        """Safely convert to string with length limit"""
-        if value is None or pd.isna(value):
-            return ''
-        try:
-            result = str(value)
-            if max_length and len(result) > max_length:
-                result = result[:max_length]
-            return result
-        except:
-            return ''
-    
-    # Process data in chunks
+    # For large datasets, process in chunks
+    CHUNK_SIZE = 1000  # Process 1000 records at a time
+    total_created = 0
+    rejected = []
+    field_names = list(fields)
+    rows = []
+    for row_number, row in zip(df.index, zip(*fields.values())):
+        values = dict(zip(field_names, row))
+        rows.append((row_number, values, Claim(analysis=analysis, **values)))
+    
+    # Process data in chunks - failing chunks are bisected down to the bad rows
     for start_idx in range(0, total_rows, CHUNK_SIZE):
         end_idx = min(start_idx + CHUNK_SIZE, total_rows)
-        chunk_df = df.iloc[start_idx:end_idx]
         
         print(f"Processing chunk {start_idx//CHUNK_SIZE + 1}/{(total_rows//CHUNK_SIZE)+1}: rows {start_idx} to {end_idx}")
         
-        claims_to_create = []
-        
-        # Process each row in the chunk
-        for idx, row in chunk_df.iterrows():
-            try:
-                # Handle claim amount - try multiple possible column names
-                claim_amount = safe_float(get_column_value(row, amount_columns))
-                medical_costs = safe_float(get_column_value(row, medical_cost_columns))
-                indemnity_costs = safe_float(get_column_value(row, indemnity_cost_columns))
-                legal_costs = safe_float(get_column_value(row, legal_cost_columns))
-                
-                # Handle days_to_report
-                days_to_report = safe_int(row.get('days_to_report'))
-                
-                # Get basic claim information
-                claim_number = safe_string(safe_get_value(row, 'claim_number'), 100)
-                claimant_name = safe_string(safe_get_value(row, 'claimant_name'), 200)
-                injury_type = safe_string(safe_get_value(row, 'injury_type'), 200)
-                body_part = safe_string(safe_get_value(row, 'body_part'), 200)
-                
-                # Get geographic info
-                state = safe_string(safe_get_value(row, 'state'), 2)
-                city = safe_string(safe_get_value(row, 'city'), 100)
-                zip_code = safe_string(safe_get_value(row, 'zip_code'), 10)
-                
-                # Get employment info
-                job_title = safe_string(safe_get_value(row, 'job_title'), 200)
-                department = safe_string(safe_get_value(row, 'department'), 200)
-                
-                # Get dates
-                date_of_loss = safe_date(safe_get_value(row, 'date_of_loss'))
-                date_reported = safe_date(safe_get_value(row, 'date_reported'))
-                date_of_hire = safe_date(safe_get_value(row, 'date_of_hire'))
-                claimant_dob = safe_date(safe_get_value(row, 'claimant_dob'))
-                
-                # Get boolean flags
-                attorney_involved = pd.notna(safe_get_value(row, 'attorney_involved'))
-                witness_available = pd.notna(safe_get_value(row, 'witness_available'))
-                
-                # Ensure required fields have values
-                fraud_score = safe_float(row.get('fraud_score', 0.0)) or 0.0
-                risk_level = safe_string(row.get('risk_level', 'Low')) or 'Low'
-                red_flags = row.get('red_flags', [])
-                
-                # Ensure red_flags is a list
-                if not isinstance(red_flags, list):
-                    if pd.isna(red_flags):
-                        red_flags = []
-                    else:
-                        red_flags = [str(red_flags)]
-                
-                # Create claim object
-                claim = Claim(
-                    analysis=analysis,
-                    claim_number=claim_number or f"CLAIM_{idx+1}",
-                    claimant_name=claimant_name or "Unknown",
-                    date_of_loss=date_of_loss,
-                    injury_type=injury_type,
-                    body_part=body_part,
-                    fraud_score=fraud_score,
-                    risk_level=risk_level,
-                    red_flags=red_flags,
-                    days_to_report=days_to_report,
-                    claim_amount=claim_amount,
-                    state=state,
-                    city=city,
-                    zip_code=zip_code,
-                    date_reported=date_reported,
-                    date_of_hire=date_of_hire,
-                    claimant_dob=claimant_dob,
-                    job_title=job_title,
-                    department=department,
-                    attorney_involved=attorney_involved,
-                    witness_available=witness_available,
-                    medical_costs=medical_costs,
-                    indemnity_costs=indemnity_costs,
-                    legal_costs=legal_costs
-                )
-                claims_to_create.append(claim)
-                
-            except Exception as row_error:
-                print(f"Error processing row {idx}: {row_error}")
-                # Create a minimal claim record
-                minimal_claim = Claim(
-                    analysis=analysis,
-                    claim_number=f"ERROR_CLAIM_{idx+1}",
-                    claimant_name="Processing Error",
-                    fraud_score=0.0,
-                    risk_level='Low',
-                    red_flags=[]
-                )
-                claims_to_create.append(minimal_claim)
-        
-        # Bulk create claims for this chunk
-        if claims_to_create:
-            try:
-                Claim.objects.bulk_create(claims_to_create, batch_size=500, ignore_conflicts=True)
-                chunk_created = len(claims_to_create)
-                total_created += chunk_created
-                print(f"Successfully created {chunk_created} claim records in chunk")
-                
-                # Add small delay for large files to prevent overwhelming the database
-                if total_rows > 10000:
-                    time.sleep(0.1)
-                    
-            except Exception as bulk_error:
-                print(f"Bulk create failed for chunk: {bulk_error}")
-                # Try individual creation as fallback
-                created_count = 0
-                for claim in claims_to_create:
-                    try:
-                        claim.save()
-                        created_count += 1
-                    except Exception as individual_error:
-                        print(f"Failed to save individual claim: {individual_error}")
-                        continue
-                total_created += created_count
-                print(f"Created {created_count} claims individually in chunk")
+        chunk_created = insert_claims_bisecting(rows[start_idx:end_idx], rejected)
+        total_created += chunk_created
+        print(f"Successfully created {chunk_created} claim records in chunk")
+    
+    if rejected:
+        quarantine_claims(analysis, rejected)
+        print(f"Quarantined {len(rejected)} rows that could not be saved")
     
     print(f"Claim saving completed. Total created: {total_created} out of {total_rows} rows")
 
 def analyze_patterns(analysis):
     """Analyze fraud patterns from claims data"""
-    claims = analysis.claims.all()
+    claims = analysis.visible_claims()
     
     # Define pattern categories
     timing_patterns = {
@@ -532,40 +752,28 @@ def analyze_patterns(analysis):
         'reporting': {}
     }
     
-    # Count claims with each pattern type
-    timing_claims_set = set()
-    behavioral_claims_set = set()
-    reporting_claims_set = set()
+    # Pattern type of each registry flag (None for flags outside the three types)
+    def pattern_type(message):
+        if any(pattern in message for pattern in timing_patterns):
+            return 'timing'
+        if any(pattern in message for pattern in behavioral_patterns):
+            return 'behavioral'
+        if any(pattern in message for pattern in reporting_patterns):
+            return 'reporting'
+        return None
     
-    # Analyze all claims for patterns
-    for claim in claims:
-        has_timing = False
-        has_behavioral = False
-        has_reporting = False
-        
-        if claim.red_flags:
-            for flag in claim.red_flags:
-                # Remove category prefix if present
-                clean_flag = flag.replace('[TIMING] ', '').replace('[BEHAVIORAL] ', '').replace('[REPORTING] ', '').replace('[INJURY] ', '')
-                
-                # Categorize the flag
-                if any(pattern in clean_flag for pattern in timing_patterns):
-                    pattern_counts['timing'][clean_flag] = pattern_counts['timing'].get(clean_flag, 0) + 1
-                    has_timing = True
-                elif any(pattern in clean_flag for pattern in behavioral_patterns):
-                    pattern_counts['behavioral'][clean_flag] = pattern_counts['behavioral'].get(clean_flag, 0) + 1
-                    has_behavioral = True
-                elif any(pattern in clean_flag for pattern in reporting_patterns):
-                    pattern_counts['reporting'][clean_flag] = pattern_counts['reporting'].get(clean_flag, 0) + 1
-                    has_reporting = True
-        
-        # Track unique claims with each pattern type
-        if has_timing:
-            timing_claims_set.add(claim.id)
-        if has_behavioral:
-            behavioral_claims_set.add(claim.id)
-        if has_reporting:
-            reporting_claims_set.add(claim.id)
+    # Claims with each pattern type
+    pattern_claims = {'timing': 0, 'behavioral': 0, 'reporting': 0}
+    
+    # Counted per distinct red_flags_mask in the database, not per claim
+    groups = mask_groups(claims)
+    for flag in flag_statistics(claims, groups):
+        category = pattern_type(flag['message'])
+        if category:
+            pattern_counts[category][flag['message']] = flag['count']
+    for mask, count, _ in groups:
+        for category in {pattern_type(RED_FLAG_REGISTRY[bit][2]) for bit in mask_bits(mask)} - {None}:
+            pattern_claims[category] += count
     
     # Format pattern data for template
     def format_patterns(pattern_dict):
@@ -583,9 +791,9 @@ def analyze_patterns(analysis):
     
     # Calculate percentages based on unique claims
     total_claims = analysis.total_claims
-    timing_claims = len(timing_claims_set)
-    behavioral_claims = len(behavioral_claims_set)
-    reporting_claims = len(reporting_claims_set)
+    timing_claims = pattern_claims['timing']
+    behavioral_claims = pattern_claims['behavioral']
+    reporting_claims = pattern_claims['reporting']
     
     pattern_analysis = {
         'timing_patterns': format_patterns(pattern_counts['timing']),
@@ -606,6 +814,13 @@ def dashboard(request, analysis_id):
     """Display analysis dashboard with dynamic pattern analysis"""
     analysis = get_object_or_404(FraudAnalysis, id=analysis_id)
     
+    if analysis.status != 'done':
+        if analysis.status == 'failed':
+            messages.error(request, f'Analysis #{analysis.id} failed: {analysis.error_message}')
+        else:
+            messages.info(request, f'Analysis #{analysis.id} is {analysis.get_status_display().lower()} - check back shortly.')
+        return redirect('fraud_detector:analysis_history')
+    
     # Get summary statistics
     summary_stats = {
         'total_claims': analysis.total_claims,
@@ -619,14 +834,14 @@ def dashboard(request, analysis_id):
     }
     
     # Get top high-risk claims
-    top_claims = analysis.claims.filter(risk_level__in=['High', 'Critical']).order_by('-fraud_score')[:10]
+    top_claims = analysis.visible_claims().filter(risk_level__in=['High', 'Critical']).order_by('-fraud_score')[:10]
     
     # Get pattern analysis
     pattern_analysis = analyze_patterns(analysis)
     
     # Prepare claims data for JavaScript (for interactive charts)
     claims_json = json.dumps(list(
-        analysis.claims.values(
+        analysis.visible_claims().values(
             'id', 'claim_number', 'claimant_name', 'fraud_score', 
             'risk_level', 'date_of_loss', 'days_to_report'
         ).order_by('-fraud_score')[:100]
@@ -646,7 +861,7 @@ def dashboard(request, analysis_id):
 def claims_table(request, analysis_id):
     """Display all claims in a searchable table"""
     analysis = get_object_or_404(FraudAnalysis, id=analysis_id)
-    claims = analysis.claims.all()
+    claims = analysis.visible_claims()
     
     # Search functionality
     search_query = request.GET.get('search', '')
@@ -685,7 +900,7 @@ def claims_table(request, analysis_id):
 def high_risk_claims(request, analysis_id):
     """Display only high and critical risk claims"""
     analysis = get_object_or_404(FraudAnalysis, id=analysis_id)
-    claims = analysis.claims.filter(risk_level__in=['High', 'Critical']).order_by('-fraud_score')
+    claims = analysis.visible_claims().filter(risk_level__in=['High', 'Critical']).order_by('-fraud_score')
     
     # Pagination
     paginator = Paginator(claims, 25)
@@ -748,10 +963,17 @@ def analysis_history(request):
     
     return render(request, 'fraud_detector/analysis_history.html', context)
 
+# Claims per page of pattern_details (page_size may ask for fewer, never more)
+PATTERN_PAGE_SIZE = 100
+
 def pattern_details(request, analysis_id):
-    """Get claims that match a specific pattern"""
+    """Get claims that match a specific pattern, highest fraud score first, one page at a time"""
     pattern_name = request.GET.get('pattern', '')
     pattern_type = request.GET.get('type', 'all')
+    page_size = request.GET.get('page_size', str(PATTERN_PAGE_SIZE))
+    if not page_size.isdigit():
+        return JsonResponse({'success': False, 'error': 'page_size must be a whole number'})
+    page_size = min(max(int(page_size), 1), PATTERN_PAGE_SIZE)
     
     if not pattern_name:
         return JsonResponse({'success': False, 'error': 'Pattern name is required'})
@@ -759,29 +981,19 @@ def pattern_details(request, analysis_id):
     try:
         analysis = get_object_or_404(FraudAnalysis, id=analysis_id)
         
-        # Get all claims for this analysis
-        claims = analysis.claims.all()
-        
-        # Filter claims that have this pattern in their red flags
-        matching_claims = []
-        for claim in claims:
-            if claim.red_flags:
-                # Check if the pattern name appears in any of the red flags
-                for flag in claim.red_flags:
-                    # Remove category prefix for comparison
-                    clean_flag = flag.replace('[TIMING] ', '').replace('[BEHAVIORAL] ', '').replace('[REPORTING] ', '').replace('[INJURY] ', '')
-                    
-                    if pattern_name.lower() in clean_flag.lower():
-                        matching_claims.append(claim)
-                        break  # Don't add the same claim multiple times
+        # Claims with a red flag whose text contains the pattern name (indexed lookup on red_flags_mask)
+        matching_claims = claims_with_flags(analysis.visible_claims(), bits_matching(pattern_name))
         
         # Calculate statistics
-        total_claims = len(matching_claims)
-        avg_fraud_score = sum(c.fraud_score for c in matching_claims) / total_claims if total_claims > 0 else 0
+        stats = matching_claims.aggregate(total_claims=Count('id'), avg_fraud_score=Avg('fraud_score'))
+        total_claims = stats['total_claims']
+        avg_fraud_score = stats['avg_fraud_score'] or 0
         
-        # Serialize claims data
+        # Serialize one page of claims, sorted by fraud score (highest first) in the database
+        paginator = Paginator(matching_claims.order_by('-fraud_score', 'id'), page_size)
+        page = paginator.get_page(request.GET.get('page'))
         claims_data = []
-        for claim in matching_claims:
+        for claim in page:
             claims_data.append({
                 'claim_number': claim.claim_number,
                 'claimant_name': claim.claimant_name,
@@ -795,12 +1007,12 @@ def pattern_details(request, analysis_id):
                 'red_flags': claim.red_flags
             })
         
-        # Sort by fraud score (highest first)
-        claims_data.sort(key=lambda x: x['fraud_score'], reverse=True)
-        
         response_data = {
             'success': True,
             'claims': claims_data,
+            'page': page.number,
+            'num_pages': paginator.num_pages,
+            'has_next': page.has_next(),
             'pattern_info': {
                 'name': pattern_name,
                 'type': pattern_type,
@@ -814,19 +1026,47 @@ def pattern_details(request, analysis_id):
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)})
 
+# Rows fetched per round trip when streaming chart series from the database
+CHART_STREAM_ROWS = 10000
+
 def charts_data_api(request, analysis_id):
-    """API endpoint for interactive chart data"""
+    """API endpoint for interactive chart data.
+    
+    The response size is bounded whatever the size of the analysis: aggregates come from
+    the rollups (or a GROUP BY), and the timeline and time lag series are streamed from
+    the database and downsampled to at most max_points points each (clamped to MIN_POINTS..
+    CHART_MAX_POINTS, see utils/downsampling.py). The series of a done analysis are cached.
+    The optional risk_level and days (date of loss in the last days) parameters filter
+    the score histogram, timeline and time lag series.
+    """
     try:
         analysis = get_object_or_404(FraudAnalysis, id=analysis_id)
-        claims = analysis.claims.all()
+        claims = analysis.visible_claims()
+        fraud_settings = settings.FRAUD_DETECTION_SETTINGS
+        point_budget = fraud_settings.get('CHART_MAX_POINTS', 2000)
+        max_points = request.GET.get('max_points', str(point_budget))
+        if not max_points.isdigit():
+            return JsonResponse({'error': 'max_points must be a whole number'}, status=400)
+        max_points = min(max(int(max_points), MIN_POINTS), point_budget)
+        
+        risk_level = request.GET.get('risk_level', 'all')
+        days = request.GET.get('days', 'all')
+        if risk_level != 'all':
+            if risk_level not in dict(Claim.RISK_LEVELS):
+                return JsonResponse({'error': f'Unknown risk_level {risk_level!r}'}, status=400)
+            claims = claims.filter(risk_level=risk_level)
+        if days != 'all':
+            if not days.isdigit():
+                return JsonResponse({'error': 'days must be a whole number of days'}, status=400)
+            claims = claims.filter(date_of_loss__gte=timezone.localdate() - timedelta(days=int(days)))
+        filtered = risk_level != 'all' or days != 'all'
         
         # Debug logging
         print(f"Charts API called for analysis {analysis_id}")
-        print(f"Total claims found: {claims.count()}")
         
         # Build response data structure with proper error handling
         response_data = {
-            'fraudScores': [],
+            'scoreHistogram': [],
             'timeline': [],
             'claimants': [],
             'indicators': [],
@@ -835,129 +1075,72 @@ def charts_data_api(request, analysis_id):
             'geographic': []
         }
         
-        # 1. Fraud Scores data
-        for claim in claims:
-            try:
-                response_data['fraudScores'].append({
-                    'score': float(claim.fraud_score),
-                    'fraud_score': float(claim.fraud_score),
-                    'risk_level': claim.risk_level,
-                    'claim_number': claim.claim_number
-                })
-            except Exception as e:
-                print(f"Error processing fraud score for claim {claim.id}: {e}")
-        
-        # 2. Timeline data
-        timeline_claims = claims.filter(date_of_loss__isnull=False).order_by('date_of_loss')
-        for claim in timeline_claims:
-            try:
-                response_data['timeline'].append({
-                    'date': claim.date_of_loss.strftime('%Y-%m-%d') if claim.date_of_loss else None,
-                    'date_of_loss': claim.date_of_loss.strftime('%Y-%m-%d') if claim.date_of_loss else None,
-                    'fraud_score': float(claim.fraud_score),
-                    'risk_level': claim.risk_level,
-                    'claim_number': claim.claim_number
-                })
-            except Exception as e:
-                print(f"Error processing timeline for claim {claim.id}: {e}")
-        
-        # 3. Repeat claimants data
-        from django.db.models import Count, Avg
-        claimant_stats = claims.values('claimant_name').annotate(
-            count=Count('id'),
-            avg_fraud_score=Avg('fraud_score')
-        ).filter(count__gt=1).order_by('-count')[:50]
-        
-        for stat in claimant_stats:
-            try:
-                response_data['claimants'].append({
-                    'claimant_name': stat['claimant_name'],
-                    'name': stat['claimant_name'],
-                    'count': stat['count'],
-                    'fraud_score': float(stat['avg_fraud_score']) if stat['avg_fraud_score'] else 0,
-                    'avg_fraud_score': float(stat['avg_fraud_score']) if stat['avg_fraud_score'] else 0
-                })
-            except Exception as e:
-                print(f"Error processing claimant stats: {e}")
-        
-        # 4. Red flags/indicators data
-        indicator_counts = {}
-        for claim in claims:
-            if claim.red_flags and isinstance(claim.red_flags, list):
-                for flag in claim.red_flags:
-                    # Clean flag text
-                    clean_flag = str(flag).replace('[TIMING] ', '').replace('[BEHAVIORAL] ', '').replace('[REPORTING] ', '').replace('[INJURY] ', '')
-                    if clean_flag not in indicator_counts:
-                        indicator_counts[clean_flag] = {'count': 0, 'total_score': 0}
-                    indicator_counts[clean_flag]['count'] += 1
-                    indicator_counts[clean_flag]['total_score'] += float(claim.fraud_score)
+        # 1. Fraud score histogram (bins of rollups.SCORE_BIN_WIDTH points)
+        score_bins = score_histogram(claims) if filtered else analysis_rollups(analysis, SCORE_BIN)
+        for stat in sorted(score_bins, key=lambda stat: int(stat.key)):
+            response_data['scoreHistogram'].append({
+                'bin_start': int(stat.key),
+                'bin_end': int(stat.key) + SCORE_BIN_WIDTH,
+                'count': stat.count,
+                'high_risk_count': stat.high_risk_count
+            })
         
-        # Convert to list and sort by frequency
-        indicators_list = []
-        for flag, data in indicator_counts.items():
-            indicators_list.append({
-                'flag': flag,
-                'indicator': flag,
-                'count': data['count'],
-                'fraud_score': data['total_score'] / data['count'] if data['count'] > 0 else 0,
-                'avg_fraud_score': data['total_score'] / data['count'] if data['count'] > 0 else 0
+        # 2./6. Timeline and time lag series, cached per analysis and request parameters
+        processed = analysis.processed_at.timestamp() if analysis.processed_at else 0
+        series_key = f"charts-series:{analysis.id}:{processed}:{risk_level}:{days}:{max_points}"
+        if days != 'all':
+            series_key += f":{timezone.localdate().isoformat()}"
+        series = cache.get(series_key) if analysis.status == 'done' else None
+        if series is None:
+            series = {
+                'timeline': timeline_points(claims, max_points),
+                'timeLag': time_lag_points(claims, max_points),
+            }
+            if analysis.status == 'done':
+                cache.set(series_key, series, fraud_settings.get('CHART_CACHE_SECONDS', 3600))
+        response_data.update(series)
+        
+        # 3. Repeat claimants data (from the precomputed rollups, see rollups.py)
+        for stat in top_rollups(analysis, CLAIMANT, 50):
+            response_data['claimants'].append({
+                'claimant_name': stat.key,
+                'name': stat.key,
+                'count': stat.count,
+                'fraud_score': stat.avg_fraud_score,
+                'avg_fraud_score': stat.avg_fraud_score
             })
         
-        # Sort by count and take top indicators
-        indicators_list.sort(key=lambda x: x['count'], reverse=True)
-        response_data['indicators'] = indicators_list[:20]
+        # 4. Red flags/indicators data (most frequent first)
+        for stat in top_rollups(analysis, FLAG, 20):
+            response_data['indicators'].append({
+                'flag': stat.key,
+                'indicator': stat.key,
+                'count': stat.count,
+                'fraud_score': stat.avg_fraud_score,
+                'avg_fraud_score': stat.avg_fraud_score
+            })
         
         # 5. Injury types data
-        injury_stats = claims.exclude(injury_type__isnull=True).exclude(injury_type='').values('injury_type').annotate(
-            count=Count('id'),
-            avg_fraud_score=Avg('fraud_score')
-        ).order_by('-avg_fraud_score')[:20]
-        
-        for stat in injury_stats:
-            try:
-                response_data['injuries'].append({
-                    'injury_type': stat['injury_type'],
-                    'count': stat['count'],
-                    'fraud_score': float(stat['avg_fraud_score']) if stat['avg_fraud_score'] else 0,
-                    'avg_fraud_score': float(stat['avg_fraud_score']) if stat['avg_fraud_score'] else 0
-                })
-            except Exception as e:
-                print(f"Error processing injury stats: {e}")
-        
-        # 6. Time lag data
-        time_lag_claims = claims.filter(days_to_report__isnull=False)
-        for claim in time_lag_claims:
-            try:
-                response_data['timeLag'].append({
-                    'days_to_report': int(claim.days_to_report),
-                    'fraud_score': float(claim.fraud_score),
-                    'risk_level': claim.risk_level,
-                    'claim_number': claim.claim_number
-                })
-            except Exception as e:
-                print(f"Error processing time lag for claim {claim.id}: {e}")
+        for stat in top_rollups(analysis, INJURY_TYPE, 20, by_score=True):
+            response_data['injuries'].append({
+                'injury_type': stat.key,
+                'count': stat.count,
+                'fraud_score': stat.avg_fraud_score,
+                'avg_fraud_score': stat.avg_fraud_score
+            })
         
         # 7. Geographic data
-        geographic_stats = claims.exclude(state__isnull=True).exclude(state='').values('state').annotate(
-            count=Count('id'),
-            avg_fraud_score=Avg('fraud_score'),
-            high_risk_count=Count('id', filter=Q(risk_level__in=['High', 'Critical']))
-        )
-        
-        for stat in geographic_stats:
-            try:
-                high_risk_pct = (stat['high_risk_count'] / stat['count']) * 100 if stat['count'] > 0 else 0
+        for stat in analysis_rollups(analysis, STATE):
+            if stat.key:
                 response_data['geographic'].append({
-                    'state': stat['state'],
-                    'count': stat['count'],
-                    'fraud_score': float(stat['avg_fraud_score']) if stat['avg_fraud_score'] else 0,
-                    'avg_fraud_score': float(stat['avg_fraud_score']) if stat['avg_fraud_score'] else 0,
-                    'risk_level': 'High' if stat['avg_fraud_score'] and stat['avg_fraud_score'] > 50 else 'Low',
-                    'high_risk_count': stat['high_risk_count'],
-                    'high_risk_percentage': high_risk_pct
+                    'state': stat.key,
+                    'count': stat.count,
+                    'fraud_score': stat.avg_fraud_score,
+                    'avg_fraud_score': stat.avg_fraud_score,
+                    'risk_level': 'High' if stat.avg_fraud_score > 50 else 'Low',
+                    'high_risk_count': stat.high_risk_count,
+                    'high_risk_percentage': high_risk_percentage(stat)
                 })
-            except Exception as e:
-                print(f"Error processing geographic stats: {e}")
         
         # Debug: Log response data summary
         print(f"Response data summary:")
@@ -972,23 +1155,79 @@ def charts_data_api(request, analysis_id):
         traceback.print_exc()
         return JsonResponse({'error': str(e)}, status=500)
     
+def timeline_points(claims, max_points):
+    """Claim count, average fraud score and high-risk count per day of loss, oldest first.
+    
+    Days are grouped in the database; beyond max_points days, the days kept are picked
+    from the average score series by downsample().
+    """
+    days = list(claims.filter(date_of_loss__isnull=False).order_by().values('date_of_loss').annotate(
+        count=Count('id'),
+        avg_fraud_score=Avg('fraud_score'),
+        high_risk_count=Count('id', filter=Q(risk_level__in=HIGH_RISK_LEVELS))
+    ).order_by('date_of_loss').iterator(chunk_size=CHART_STREAM_ROWS))
+    
+    kept = downsample([day['date_of_loss'].toordinal() for day in days],
+                      [day['avg_fraud_score'] for day in days], max_points)
+    points = []
+    for index in kept:
+        day = days[index]
+        date = day['date_of_loss'].strftime('%Y-%m-%d')
+        points.append({
+            'date': date,
+            'date_of_loss': date,
+            'count': day['count'],
+            'fraud_score': float(day['avg_fraud_score']),
+            'avg_fraud_score': float(day['avg_fraud_score']),
+            'high_risk_count': day['high_risk_count']
+        })
+    return points
+
+def time_lag_points(claims, max_points):
+    """Days to report and fraud score of at most max_points claims, in days to report order.
+    
+    Only the id, days and score of each claim are streamed into numpy arrays; the details
+    are then read for the claims picked by downsample().
+    """
+    rows = claims.filter(days_to_report__isnull=False).order_by('days_to_report', 'id').values_list(
+        'id', 'days_to_report', 'fraud_score')
+    series = np.fromiter(rows.iterator(chunk_size=CHART_STREAM_ROWS),
+                         dtype=[('id', 'i8'), ('days', 'f8'), ('score', 'f8')])
+    kept_ids = series['id'][downsample(series['days'], series['score'], max_points)].tolist()
+    
+    details = Claim.objects.filter(id__in=kept_ids).values_list(
+        'id', 'days_to_report', 'fraud_score', 'risk_level', 'claim_number')
+    by_id = {claim_id: rest for claim_id, *rest in details}
+    points = []
+    for claim_id in kept_ids:
+        days, score, risk_level, claim_number = by_id[claim_id]
+        points.append({'days_to_report': days, 'fraud_score': float(score),
+                       'risk_level': risk_level, 'claim_number': claim_number})
+    return points
+
+def top_rollups(analysis, kind, limit, by_score=False):
+    """The first limit rollup groups of a kind, by claim count (or average fraud score) descending"""
+    if by_score:
+        order = lambda stat: (-stat.avg_fraud_score, stat.key)
+    else:
+        order = lambda stat: (-stat.count, stat.key)
+    return sorted(analysis_rollups(analysis, kind), key=order)[:limit]
+
+def high_risk_percentage(stat):
+    return (stat.high_risk_count / stat.count) * 100 if stat.count > 0 else 0
+
 def top_claimants_api(request, analysis_id):
     """API for top repeat claimants"""
     try:
         analysis = get_object_or_404(FraudAnalysis, id=analysis_id)
         limit = int(request.GET.get('limit', 10))
         
-        claimant_stats = analysis.claims.values('claimant_name').annotate(
-            count=Count('id'),
-            avg_fraud_score=Avg('fraud_score')
-        ).filter(count__gt=1).order_by('-count')[:limit]
-        
         data = []
-        for stat in claimant_stats:
+        for stat in top_rollups(analysis, CLAIMANT, limit):
             data.append({
-                'name': stat['claimant_name'],
-                'count': stat['count'],
-                'avg_fraud_score': float(stat['avg_fraud_score'])
+                'name': stat.key,
+                'count': stat.count,
+                'avg_fraud_score': stat.avg_fraud_score
             })
         
         return JsonResponse({'claimants': data})
@@ -1000,25 +1239,14 @@ def fraud_indicators_api(request, analysis_id):
     """API for fraud indicators analysis"""
     try:
         analysis = get_object_or_404(FraudAnalysis, id=analysis_id)
-        claims = analysis.claims.all()
-        
-        # Count all red flags
-        flag_counts = {}
-        for claim in claims:
-            if claim.red_flags:
-                for flag in claim.red_flags:
-                    clean_flag = flag.replace('[TIMING] ', '').replace('[BEHAVIORAL] ', '').replace('[REPORTING] ', '').replace('[INJURY] ', '')
-                    flag_counts[clean_flag] = flag_counts.get(clean_flag, 0) + 1
-        
-        # Sort by frequency
-        sorted_flags = sorted(flag_counts.items(), key=lambda x: x[1], reverse=True)[:15]
+        total_claims = sum(stat.count for stat in analysis_rollups(analysis, TOTAL))
         
         indicators = []
-        for flag, count in sorted_flags:
+        for stat in top_rollups(analysis, FLAG, 15):
             indicators.append({
-                'indicator': flag,
-                'count': count,
-                'percentage': (count / len(claims)) * 100
+                'indicator': stat.key,
+                'count': stat.count,
+                'percentage': (stat.count / total_claims) * 100
             })
         
         return JsonResponse({'indicators': indicators})
@@ -1032,22 +1260,14 @@ def geographic_analysis_api(request, analysis_id):
         analysis = get_object_or_404(FraudAnalysis, id=analysis_id)
         metric = request.GET.get('metric', 'count')
         
-        geographic_stats = analysis.claims.exclude(state__isnull=True).values('state').annotate(
-            count=Count('id'),
-            avg_fraud_score=Avg('fraud_score'),
-            high_risk_count=Count('id', filter=Q(risk_level__in=['High', 'Critical']))
-        )
-        
         data = []
-        for stat in geographic_stats:
-            high_risk_pct = (stat['high_risk_count'] / stat['count']) * 100 if stat['count'] > 0 else 0
-            
+        for stat in analysis_rollups(analysis, STATE):
             data.append({
-                'state': stat['state'],
-                'count': stat['count'],
-                'avg_fraud_score': float(stat['avg_fraud_score']),
-                'high_risk_percentage': high_risk_pct,
-                'high_risk_count': stat['high_risk_count']
+                'state': stat.key,
+                'count': stat.count,
+                'avg_fraud_score': stat.avg_fraud_score,
+                'high_risk_percentage': high_risk_percentage(stat),
+                'high_risk_count': stat.high_risk_count
             })
         
         return JsonResponse({'geographic_data': data, 'metric': metric})
@@ -1060,19 +1280,13 @@ def injury_analysis_api(request, analysis_id):
     try:
         analysis = get_object_or_404(FraudAnalysis, id=analysis_id)
         
-        injury_stats = analysis.claims.exclude(injury_type__isnull=True).exclude(injury_type='').values('injury_type').annotate(
-            count=Count('id'),
-            avg_fraud_score=Avg('fraud_score'),
-            high_risk_count=Count('id', filter=Q(risk_level__in=['High', 'Critical']))
-        ).order_by('-avg_fraud_score')[:20]
-        
         data = []
-        for stat in injury_stats:
+        for stat in top_rollups(analysis, INJURY_TYPE, 20, by_score=True):
             data.append({
-                'injury_type': stat['injury_type'],
-                'count': stat['count'],
-                'avg_fraud_score': float(stat['avg_fraud_score']),
-                'high_risk_count': stat['high_risk_count']
+                'injury_type': stat.key,
+                'count': stat.count,
+                'avg_fraud_score': stat.avg_fraud_score,
+                'high_risk_count': stat.high_risk_count
             })
         
         return JsonResponse({'injury_data': data})
@@ -1085,22 +1299,14 @@ def timeline_analysis_api(request, analysis_id):
     try:
         analysis = get_object_or_404(FraudAnalysis, id=analysis_id)
         
-        # Get claims with valid dates, grouped by month
-        timeline_data = analysis.claims.filter(date_of_loss__isnull=False).extra(
-            select={'month': "strftime('%%Y-%%m', date_of_loss)"}
-        ).values('month').annotate(
-            count=Count('id'),
-            avg_fraud_score=Avg('fraud_score'),
-            high_risk_count=Count('id', filter=Q(risk_level__in=['High', 'Critical']))
-        ).order_by('month')
-        
+        # Claims with valid dates, grouped by month ('YYYY-MM' keys sort chronologically)
         data = []
-        for stat in timeline_data:
+        for stat in sorted(analysis_rollups(analysis, MONTH), key=lambda stat: stat.key):
             data.append({
-                'month': stat['month'],
-                'count': stat['count'],
-                'avg_fraud_score': float(stat['avg_fraud_score']),
-                'high_risk_count': stat['high_risk_count']
+                'month': stat.key,
+                'count': stat.count,
+                'avg_fraud_score': stat.avg_fraud_score,
+                'high_risk_count': stat.high_risk_count
             })
         
         return JsonResponse({'timeline_data': data})
@@ -1108,11 +1314,17 @@ def timeline_analysis_api(request, analysis_id):
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
     
+def analysis_progress_api(request, analysis_id):
+    """API endpoint for the status and per-stage progress of an analysis"""
+    fields = ('id', 'status', 'error_message', 'progress', 'malformed_values')
+    analysis = get_object_or_404(FraudAnalysis.objects.only(*fields), id=analysis_id)
+    return JsonResponse(progress_payload(analysis))
+
 def test_api(request, analysis_id):
     """Simple test endpoint"""
     try:
         analysis = FraudAnalysis.objects.get(id=analysis_id)
-        claims_count = analysis.claims.count()
+        claims_count = analysis.visible_claims().count()
         return JsonResponse({
             'status': 'ok',
             'analysis_id': analysis_id,
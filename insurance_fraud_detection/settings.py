@@ -124,6 +124,11 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 FILE_UPLOAD_MAX_MEMORY_SIZE = 100 * 1024 * 1024  # 100MB in memory
 DATA_UPLOAD_MAX_MEMORY_SIZE = 100 * 1024 * 1024  # 100MB max memory
 FILE_UPLOAD_TEMP_DIR = tempfile.gettempdir()      # Auto-detects temp dir
+FILE_UPLOAD_HANDLERS = [
+    'fraud_detector.uploads.HashingUploadHandler',   # SHA-256 of each upload, used to reuse results
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
 
 # Maximum file upload size
 SECURE_MAX_CONTENT_LENGTH = 500 * 1024 * 1024  # 500MB
@@ -200,6 +205,20 @@ CACHES = {
 FRAUD_DETECTION_SETTINGS = {
     'MAX_CLAIMS_PER_ANALYSIS': 1000000,  # 1 million claims max
     'CHUNK_SIZE': 1000,                  # Process 1000 records at a time
+    'STREAMING_THRESHOLD_MB': 50,        # Uploads above this are scored out-of-core
+    'STREAMING_CHUNK_ROWS': 100000,      # Rows per chunk in streaming mode
+    'DETECTION_WORKERS': int(os.environ.get('FRAUD_DETECTION_WORKERS', 1)),  # Processes used to score partitions
+    'ANALYSIS_WORKERS': int(os.environ.get('FRAUD_ANALYSIS_WORKERS', 1)),  # run_analysis_worker processes (separate from gunicorn)
+    'JOB_POLL_SECONDS': 2,               # Worker wait between checks of an empty queue
+    'JOB_HEARTBEAT_SECONDS': 15,         # How often a worker marks its running analysis as alive
+    'STALE_JOB_SECONDS': 120,            # Running analyses without a heartbeat this long are resumed by another worker
+    'CHECKPOINT_ROWS': 100000,           # Max rows committed per checkpoint (claims + CSV output)
+    'CSV_ENGINE': os.environ.get('FRAUD_CSV_ENGINE', 'c'),  # 'c' (pandas) or 'pyarrow' (multithreaded Arrow)
+    'MAX_UPLOAD_MB': 500,                # Largest accepted upload (form or chunked API)
+    'UPLOAD_CHUNK_MB': 8,                # Largest chunk accepted by the chunked upload API
+    'UPLOAD_SESSION_HOURS': 24,          # Unfinished chunked uploads idle this long are deleted
+    'CHART_MAX_POINTS': 2000,            # Most points per timeline/scatter series in the charts API (max_points cap)
+    'CHART_CACHE_SECONDS': 3600,         # How long downsampled chart series of a done analysis are cached
     'ENABLE_VISUALIZATIONS': True,       # Generate charts and graphs
     'ENABLE_PATTERN_ANALYSIS': True,     # Enable fraud pattern detection
     'DEFAULT_RISK_THRESHOLDS': {